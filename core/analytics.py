@@ -0,0 +1,187 @@
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CATEGORIES, ArchivedTransaction, Budget, Transaction
+from . import caching
+
+# Spending analytics for the dashboard and /analytics/. A user's recent
+# Expense history is loaded with one values_list query (plus one on the
+# transaction archive, empty unless the window reaches it) into three flat arrays
+# (local day, category code, amount) and cached per user under the dashboard
+# version, so any Transaction or Budget change rebuilds it. Daily and weekly
+# series, moving averages, category shares and the month-end forecast are all
+# bincounts and masks over those arrays.
+#
+# The forecast adds to this month's spend what was spent after today's day of
+# the month in the previous FORECAST_MONTHS months, per category. Unlike a
+# daily run rate, that does not count the rent paid on the 1st twice.
+
+DEFAULTS = {
+    'DAILY_DAYS': 30,
+    'WEEKS': 12,
+    'MOVING_AVERAGE_DAYS': 7,
+    'FORECAST_MONTHS': 3,
+    'CACHE_TIMEOUT': 600,
+}
+
+CATEGORY_NAMES = [name for name, _ in CATEGORIES]
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORY_NAMES)}
+OTHER = CATEGORY_CODES['Other']
+
+History = namedtuple('History', ['days', 'codes', 'amounts'])
+
+
+def get_setting(name):
+    return getattr(settings, 'ANALYTICS', {}).get(name, DEFAULTS[name])
+
+
+def _month_start(day, months_back=0):
+    index = day.year * 12 + day.month - 1 - months_back
+    return day.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def history_start(today):
+    """The first local day any of the series or the forecast looks at."""
+    return min(
+        today - timedelta(days=get_setting('DAILY_DAYS') + get_setting('MOVING_AVERAGE_DAYS') - 2),
+        today - timedelta(days=today.weekday() + 7 * (get_setting('WEEKS') - 1)),
+        _month_start(today, get_setting('FORECAST_MONTHS')),
+    )
+
+
+def load_history(user, start):
+    """
+    The user's Expense transactions from local day `start` on, hot and
+    archived, as a History of arrays.
+    """
+    tz = timezone.get_current_timezone()
+    since = timezone.make_aware(datetime.combine(start, time.min))
+    rows = chain.from_iterable(
+        model.objects.filter(user=user, type='Expense', date_time__gte=since)
+        .values_list('date_time', 'category', 'amount').iterator(chunk_size=5000)
+        for model in (Transaction, ArchivedTransaction)
+    )
+    days, codes, amounts = [], [], []
+    for date_time, category, amount in rows:
+        days.append(date_time.astimezone(tz).toordinal())
+        codes.append(CATEGORY_CODES.get(category, OTHER))
+        amounts.append(amount)
+    return History(
+        # datetime64 counts days from 1970-01-01, ordinals from 0001-01-01 (= 1)
+        np.asarray(days, dtype=np.int64).astype('datetime64[D]') - np.timedelta64(719163, 'D'),
+        np.asarray(codes, dtype=np.int8),
+        np.asarray(amounts, dtype=np.float64),
+    )
+
+
+def get_history(user, today):
+    start = history_start(today)
+    return caching.get_or_build(
+        user.pk, caching.DASHBOARD,
+        lambda: load_history(user, start),
+        timeout=get_setting('CACHE_TIMEOUT'),
+        suffix=f'analytics:{start.isoformat()}',
+    )
+
+
+def _round(values):
+    return np.round(values, 2).tolist()
+
+
+def daily_series(history, today, days, window):
+    """Spend per day over the last `days` days and its trailing `window`-day mean."""
+    first = np.datetime64(today, 'D') - (days + window - 2)
+    size = days + window - 1
+    offsets = (history.days - first).astype(np.int64)
+    keep = (offsets >= 0) & (offsets < size)
+    totals = np.bincount(offsets[keep], history.amounts[keep], minlength=size)
+    sums = np.cumsum(np.concatenate(([0.0], totals)))
+    return {
+        'dates': [str(day) for day in np.arange(first + window - 1, np.datetime64(today, 'D') + 1)],
+        'amounts': _round(totals[window - 1:]),
+        'moving_average': _round((sums[window:] - sums[:-window]) / window),
+    }
+
+
+def weekly_series(history, today, weeks):
+    """Spend per Monday-started week over the last `weeks` weeks, current one included."""
+    first = np.datetime64(today - timedelta(days=today.weekday() + 7 * (weeks - 1)), 'D')
+    offsets = (history.days - first).astype(np.int64)
+    keep = (offsets >= 0) & (offsets < 7 * weeks)
+    totals = np.bincount(offsets[keep] // 7, history.amounts[keep], minlength=weeks)
+    return {
+        'weeks': [str(first + 7 * week) for week in range(weeks)],
+        'amounts': _round(totals),
+    }
+
+
+def month_forecast(history, today, budgets, months):
+    """
+    Per-category spent / projected month-end spend against `budgets` (an array
+    of budget amounts by category code) for today's month.
+    """
+    size = len(CATEGORY_NAMES)
+    month = np.datetime64(today, 'M')
+    row_months = history.days.astype('datetime64[M]')
+    day_of_month = (history.days - row_months.astype('datetime64[D]')).astype(np.int64) + 1
+
+    current = row_months == month
+    spent = np.bincount(history.codes[current], history.amounts[current], minlength=size)
+    later = (row_months < month) & (row_months >= month - months) & (day_of_month > today.day)
+    # Average over the months the user actually has history for.
+    observed = int(np.clip((month - row_months.min()).astype(np.int64), 1, months)) if len(row_months) else 1
+    rest = np.bincount(history.codes[later], history.amounts[later], minlength=size) / observed
+    projected = spent + rest
+
+    shown = (spent > 0) | (projected > 0) | (budgets > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.where(spent.sum() > 0, spent / spent.sum(), 0.0)
+    categories = [
+        {
+            'category': CATEGORY_NAMES[code],
+            'spent': round(float(spent[code]), 2),
+            'share': round(float(share[code]), 4),
+            'projected': round(float(projected[code]), 2),
+            'budget': round(float(budgets[code]), 2) if budgets[code] else None,
+            'over_budget': bool(budgets[code]) and bool(projected[code] > budgets[code]),
+        }
+        for code in np.flatnonzero(shown)
+    ]
+    categories.sort(key=lambda entry: entry['projected'], reverse=True)
+    total_budget = float(budgets.sum())
+    return {
+        'month': str(month),
+        'spent': round(float(spent.sum()), 2),
+        'projected': round(float(projected.sum()), 2),
+        'budget': round(total_budget, 2) if total_budget else None,
+        'over_budget': bool(total_budget) and bool(projected.sum() > total_budget),
+        'categories': categories,
+    }
+
+
+def month_budgets(user, today):
+    """This month's Budget amounts summed by category code."""
+    rows = Budget.objects.filter(user=user, year=today.year, month=today.month).values_list('category', 'amount')
+    codes, amounts = [], []
+    for category, amount in rows:
+        codes.append(CATEGORY_CODES.get(category, OTHER))
+        amounts.append(amount)
+    return np.bincount(np.asarray(codes, dtype=np.int64), np.asarray(amounts, dtype=np.float64),
+                       minlength=len(CATEGORY_NAMES))
+
+
+def report(user, today=None):
+    """Every series plus the month-end forecast for `user`, as JSON-ready data."""
+    today = today or timezone.localdate()
+    history = get_history(user, today)
+    return {
+        'as_of': today.isoformat(),
+        'daily': daily_series(history, today, get_setting('DAILY_DAYS'), get_setting('MOVING_AVERAGE_DAYS')),
+        'weekly': weekly_series(history, today, get_setting('WEEKS')),
+        'forecast': month_forecast(history, today, month_budgets(user, today), get_setting('FORECAST_MONTHS')),
+    }
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
@@ -7,3 +8,8 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import core.signals
+        import core.tasks
+
+        if 'core.middleware.InstrumentationMiddleware' in settings.MIDDLEWARE:
+            from core.middleware import install_template_timer
+            install_template_timer()
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.utils import timezone
+
+from .models import ArchivedTransaction, Transaction
+
+# Hot/cold split of transactions. run() moves rows older than HORIZON_DAYS
+# from core_transaction, with its many indexes, into core_archivedtransaction,
+# which has one (user, date_time, id) index. Ids are kept, so a row means the
+# same thing in either table.
+#
+# Reads that can reach past the horizon take both tables with the same
+# filters: list pages and the transactions page merge the two keyset scans
+# (pagination.keyset_paginate), exports merge two ordered streams, and
+# rollups.rebuild, goals.reconcile and the analytics history add the archive
+# in. When a range doesn't reach the archive, its part is an empty index seek.
+#
+# Moving a row changes no aggregate: the DELETE is raw, so no signal handler
+# reverses its rollup or goal allocation, and lists show the same rows. The
+# archive is read-only; API detail, update, delete and bulk edits only see the
+# hot table, and /sync/ only ships hot rows to new clients.
+
+DEFAULTS = {
+    'HORIZON_DAYS': 730,
+    'BATCH_SIZE': 1000,
+}
+
+FIELDS = [field.attname for field in Transaction._meta.concrete_fields]
+
+
+def get_setting(name):
+    return getattr(settings, 'TRANSACTION_ARCHIVE', {}).get(name, DEFAULTS[name])
+
+
+def archived_for(user):
+    return ArchivedTransaction.objects.filter(user=user)
+
+
+def _move(rows):
+    ArchivedTransaction.objects.bulk_create([ArchivedTransaction(**row) for row in rows])
+    Transaction.objects.filter(pk__in=[row['id'] for row in rows])._raw_delete(router.db_for_write(Transaction))
+
+
+def run(days=None, batch_size=None, users=None):
+    """
+    Moves every user's (or just `users`') transactions older than `days`
+    into the archive, a batch per transaction. Returns the number moved.
+    """
+    days = get_setting('HORIZON_DAYS') if days is None else days
+    batch_size = batch_size or get_setting('BATCH_SIZE')
+    cutoff = timezone.now() - timedelta(days=days)
+    user_ids = (users if users is not None else User.objects.all()).values_list('pk', flat=True)
+
+    moved = 0
+    for user_id in user_ids.iterator():
+        # A range scan on (user, date_time, id) per batch, oldest first
+        old = Transaction.objects.filter(user_id=user_id, date_time__lt=cutoff).order_by('date_time', 'id')
+        while True:
+            with transaction.atomic():
+                rows = list(old.select_for_update().values(*FIELDS)[:batch_size])
+                if rows:
+                    _move(rows)
+            moved += len(rows)
+            if len(rows) < batch_size:
+                break
+    return moved
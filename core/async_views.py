@@ -0,0 +1,127 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db import close_old_connections
+from django.shortcuts import redirect, render
+from django.utils import timezone
+
+from . import caching, views
+from .budgets import budget_status, recent_months
+from .goals import goals_with_projection
+from .models import Goal
+from .pagination import decode_cursor, get_page_size
+from .routers import use_replica
+
+# Async versions of the dashboard and listing pages for ASGI deployments
+# (finance_tracker/asgi.py), served under /async/.
+#
+# Django's async ORM methods (aget, async for, ...) still hand every query to
+# one thread-sensitive executor, so gathering them would run the queries one
+# after another. Queries here go through sync_to_async(thread_sensitive=False)
+# instead: each runs on a worker thread with that thread's own connection, so
+# independent queries really overlap. The pool is sized by
+# ASYNC_QUERY_WORKERS, which also caps the connections these threads hold.
+# POSTs go to the synchronous views.
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_QUERY_WORKERS', 16), thread_name_prefix='async-query',
+)
+
+
+def _run_query(query):
+    try:
+        return query()
+    finally:
+        # Worker threads outlive the request; drop their connection once it is
+        # past CONN_MAX_AGE or unusable, as the request cycle would.
+        close_old_connections()
+
+
+async def run_query(query):
+    return await sync_to_async(_run_query, thread_sensitive=False, executor=_executor)(query)
+
+
+async def gather_queries(queries):
+    """Runs {name: callable} queries concurrently and returns {name: result}."""
+    results = await asyncio.gather(*(run_query(query) for query in queries.values()))
+    return dict(zip(queries, results))
+
+
+async def _user(request):
+    user = await request.auser()
+    # request.user is a separate lazy object; without this the auth context
+    # processor would load the user again.
+    request.user = user
+    return user
+
+
+async def _render(request, template, context):
+    # Context processors and the session read the database lazily.
+    return await sync_to_async(render)(request, template, context)
+
+
+@login_required
+@use_replica
+async def dashboard_view(request):
+    user = await _user(request)
+    today = timezone.localtime()
+
+    async def build():
+        return views.assemble_dashboard_context(await gather_queries(views.dashboard_queries(user, today)))
+
+    context = await caching.aget_or_build(
+        user.pk, caching.DASHBOARD, build,
+        timeout=settings.DASHBOARD_CACHE_TIMEOUT,
+        suffix=today.date().isoformat(),
+    )
+    return await _render(request, 'dashboard.html', context)
+
+
+@login_required
+@use_replica
+async def transactions_page(request):
+    if request.method != 'GET':
+        return await sync_to_async(views.transactions_page)(request)
+
+    user = await _user(request)
+    cursor = request.GET.get('cursor', '')
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError:
+        return redirect(request.path)
+
+    # The page query, if the table fragment isn't cached, runs while rendering.
+    version = await caching.aget_version(user.pk, caching.TRANSACTIONS)
+    return await _render(request, 'transactions.html', views.transactions_page_context(
+        user, cursor, get_page_size(request.GET.get('page_size')), version,
+    ))
+
+
+@login_required
+@use_replica
+async def budgets_page(request):
+    if request.method != 'GET':
+        return await sync_to_async(views.budgets_page)(request)
+
+    user = await _user(request)
+    now = timezone.localtime()
+    current, *history = await run_query(lambda: budget_status(user, recent_months(now.year, now.month, 6)))
+    history = [entry for entry in history if entry['budgets']]  # months with nothing budgeted are left out
+    return await _render(request, 'budgets.html', {'current': current, 'history': history})
+
+
+@login_required
+@use_replica
+async def goals_page(request):
+    if request.method != 'GET':
+        return await sync_to_async(views.goals_page)(request)
+
+    user = await _user(request)
+    goals = await run_query(lambda: goals_with_projection(
+        Goal.objects.filter(user=user).order_by('-id'), timezone.localdate(),
+    ))
+    return await _render(request, 'goals.html', {'goals': goals})
@@ -0,0 +1,101 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from . import caching
+
+# Process-local token -> (user, token) cache in front of DRF's
+# TokenAuthentication, which otherwise joins Token and User on every API call.
+# Entries are bounded (least recently used go first) and expire after TTL
+# seconds. The signal handlers in core/signals.py evict a token when it is
+# deleted or replaced, and all of a user's tokens when the user is saved or
+# deleted (which covers deactivation). Those evictions reach only the process
+# that made the change; other worker processes pick it up within TTL.
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 60,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class TokenCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, user, token)
+        self.by_user = {}  # user_id -> {key, ...}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key, user, token):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, user, token)
+            self.by_user.setdefault(user.pk, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def evict(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def evict_user(self, user_id):
+        with self.lock:
+            for key in list(self.by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_user.clear()
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self.by_user.get(entry[1].pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_user[entry[1].pk]
+
+
+token_cache = TokenCache(get_setting('MAX_ENTRIES'), get_setting('TTL'))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that serves repeat lookups from token_cache."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            caching.record('token_auth.hit')
+            user, token = cached
+            # Each request gets its own copy, so per-request state cached on the
+            # instance (related objects, attributes set by views) never leaks.
+            return copy.copy(user), token
+
+        caching.record('token_auth.miss')
+        user, token = super().authenticate_credentials(key)
+        token_cache.put(key, user, token)
+        return user, token
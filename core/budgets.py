@@ -0,0 +1,64 @@
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import DecimalField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Budget, MonthlyRollup
+
+# Budget vs actual. Spending comes from the MonthlyRollup row matching each
+# budget's (user, year, month, category), pulled in as a correlated subquery,
+# so any number of budgets across any number of months is one SQL statement
+# that never touches the Transaction table.
+
+
+def recent_months(year, month, count):
+    """Returns [(year, month), ...] for `count` months ending at (year, month), newest first."""
+    index = year * 12 + month - 1
+    return [((index - offset) // 12, (index - offset) % 12 + 1) for offset in range(count)]
+
+
+def _with_spent(budgets):
+    spent = MonthlyRollup.objects.filter(
+        user=OuterRef('user'),
+        year=OuterRef('year'),
+        month=OuterRef('month'),
+        category=OuterRef('category'),
+        type='Expense',
+    ).values('total')[:1]
+    return budgets.annotate(
+        spent=Coalesce(Subquery(spent), Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    )
+
+
+def budget_status(user, months):
+    """
+    Returns one entry per (year, month) in `months`, in the same order, each
+    with its budgets' spent/remaining/percent_used and month totals.
+    """
+    periods = {period: {'year': period[0], 'month': period[1], 'budgets': [],
+                        'total_budget': Decimal('0'), 'total_spent': Decimal('0')} for period in months}
+    if not periods:
+        return []
+
+    budgets = _with_spent(
+        Budget.objects.filter(user=user).filter(reduce(or_, (Q(year=year, month=month) for year, month in periods)))
+    ).order_by('year', 'month', 'category', 'id')
+
+    for budget in budgets:
+        entry = periods[(budget.year, budget.month)]
+        entry['budgets'].append({
+            'id': budget.id,
+            'category': budget.category,
+            'amount': budget.amount,
+            'spent': budget.spent,
+            'remaining': budget.amount - budget.spent,
+            'percent_used': round(budget.spent / budget.amount * 100, 1) if budget.amount else None,
+        })
+        entry['total_budget'] += budget.amount
+        entry['total_spent'] += budget.spent
+
+    for entry in periods.values():
+        entry['total_remaining'] = entry['total_budget'] - entry['total_spent']
+    return [periods[period] for period in months]
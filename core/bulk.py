@@ -0,0 +1,108 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.http import QueryDict
+from django.utils import timezone
+
+from .filters import PARAMS, filter_transactions
+from .models import Transaction
+from . import caching, goals, rollups, sync, watermarks
+
+# Bulk edits of one user's transactions, for /transactions/bulk-update/ and
+# /transactions/bulk-delete/. A selection is a list of ids and/or the list
+# API's filters, always scoped to the user. The selected rows are read (and
+# locked) once, then changed with a single UPDATE or DELETE by id, so what
+# the derived data is corrected for is exactly what was written: rollups get
+# one delta per affected month/category, goals one per allocated goal.
+#
+# The DELETE is a raw one: queryset.delete() would load every row and send
+# its post_delete signals one by one. Nothing references Transaction, so
+# there is no cascade to miss; the signal handlers' work (rollups, goals,
+# tombstones, watermarks, cache version) is done here in batch instead.
+
+EDITABLE_FIELDS = ('status', 'category')
+
+
+def get_limit():
+    return getattr(settings, 'TRANSACTION_BULK_LIMIT', 5000)
+
+
+def select(user, ids=None, filters=None):
+    """
+    The user's transactions among `ids` and matching `filters` ({param: value
+    or list of values}, see filters.PARAMS). Raises ValueError for an empty or
+    oversized selection or a malformed filter.
+    """
+    if ids is None and not filters:
+        raise ValueError('Select transactions with ids, a filter, or both.')
+    if ids is not None and len(ids) > get_limit():
+        raise ValueError(f'At most {get_limit()} ids per request.')
+
+    queryset = Transaction.objects.filter(user=user)
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    if filters:
+        unknown = set(filters) - set(PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        params = QueryDict(mutable=True)
+        for name, value in filters.items():
+            values = value if isinstance(value, list) else [value]
+            params.setlist(name, [str(item) for item in values if item is not None])
+        queryset = filter_transactions(queryset, params)
+    return queryset
+
+
+def _lock(queryset, fields):
+    # Ordered by id so concurrent bulk requests take row locks in one order.
+    limit = get_limit()
+    rows = list(queryset.select_for_update().order_by('pk').values('id', *fields)[:limit + 1])
+    if len(rows) > limit:
+        raise ValueError(f'More than {limit} transactions match; narrow the selection.')
+    return rows
+
+
+def update(user, queryset, changes):
+    """
+    Sets `changes` ({field: value}, fields from EDITABLE_FIELDS) on the
+    selected transactions in one UPDATE; returns the ids updated.
+    """
+    with transaction.atomic():
+        rows = _lock(queryset, rollups.ROLLUP_FIELDS)
+        ids = [row['id'] for row in rows]
+        if not ids:
+            return ids
+        Transaction.objects.filter(pk__in=ids).update(**changes, updated_at=timezone.now())
+
+        category = changes.get('category')
+        if category is not None:
+            moved = [row for row in rows if row['category'] != category]
+            rollups.apply_many(moved, sign=-1)
+            rollups.apply_many({**row, 'category': category} for row in moved)
+        caching.bump_on_commit(user.pk, caching.DASHBOARD, caching.TRANSACTIONS)
+        watermarks.touch(user.pk, watermarks.TRANSACTIONS)
+    return ids
+
+
+def delete(user, queryset):
+    """Deletes the selected transactions in one DELETE; returns the ids deleted."""
+    with transaction.atomic():
+        rows = _lock(queryset, (*rollups.ROLLUP_FIELDS, 'goal_id'))
+        ids = [row['id'] for row in rows]
+        if not ids:
+            return ids
+        Transaction.objects.filter(pk__in=ids)._raw_delete(queryset.db)
+
+        rollups.apply_many(rows, sign=-1)
+        allocated = defaultdict(Decimal)
+        for row in rows:
+            if row['goal_id'] is not None:
+                allocated[row['goal_id']] += Decimal(row['amount'])
+        for goal_id, amount in allocated.items():
+            goals.apply_allocation(goal_id, -amount)
+        sync.leave_tombstones(Transaction, user.pk, ids)
+        caching.bump_on_commit(user.pk, caching.DASHBOARD, caching.TRANSACTIONS)
+        watermarks.touch(user.pk, watermarks.TRANSACTIONS, *([watermarks.GOALS] if allocated else []))
+    return ids
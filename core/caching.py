@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import routers
+
+# Per-user versioned caching. Each (user, scope) has a version number that the
+# signal handlers in core/signals.py bump whenever data in that scope changes.
+# Cached payloads are stored together with the version they were built from,
+# so a stale entry is simply ignored; nothing has to be deleted by pattern,
+# which keeps this working on locmem and file-based backends alike.
+
+DASHBOARD = 'dashboard'
+TRANSACTIONS = 'transactions'  # the transactions page's table fragments
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def record(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def stats():
+    """Returns a snapshot of this process' cache hit/miss counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def version_key(user_id, scope):
+    return f'v:{scope}:{user_id}'
+
+
+def payload_key(user_id, scope, suffix=''):
+    return f'c:{scope}:{user_id}{":" + suffix if suffix else ""}'
+
+
+def _new_version():
+    # Time-based so a version key that was evicted never restarts at a value an
+    # old payload may still carry.
+    return time.time_ns()
+
+
+def bump_version(user_id, *scopes):
+    # Rebuilds must not read a replica that hasn't seen the change yet.
+    routers.pin(user_id)
+    for scope in scopes:
+        key = version_key(user_id, scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def bump_on_commit(user_id, *scopes):
+    # Bumping before commit would let a concurrent request cache pre-commit data
+    # under the new version.
+    transaction.on_commit(lambda: bump_version(user_id, *scopes))
+
+
+def get_version(user_id, scope):
+    key = version_key(user_id, scope)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_or_build(user_id, scope, build, timeout=300, suffix=''):
+    """
+    Returns the cached value for (user, scope, suffix), calling build() on a
+    miss. A hit costs a single get_many round trip for version and payload.
+    """
+    vkey, pkey = version_key(user_id, scope), payload_key(user_id, scope, suffix)
+    found = cache.get_many([vkey, pkey])
+    version, entry = found.get(vkey), found.get(pkey)
+    if version is not None and entry is not None and entry[0] == version:
+        record(f'{scope}.hit')
+        return entry[1]
+
+    record(f'{scope}.miss')
+    if version is None:
+        version = get_version(user_id, scope)
+    value = build()
+    cache.set(pkey, (version, value), timeout)
+    return value
+
+
+async def aget_version(user_id, scope):
+    key = version_key(user_id, scope)
+    version = await cache.aget(key)
+    if version is None:
+        version = _new_version()
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key, version)
+    return version
+
+
+async def aget_or_build(user_id, scope, build, timeout=300, suffix=''):
+    """get_or_build for async views; build is a coroutine function."""
+    vkey, pkey = version_key(user_id, scope), payload_key(user_id, scope, suffix)
+    found = await cache.aget_many([vkey, pkey])
+    version, entry = found.get(vkey), found.get(pkey)
+    if version is not None and entry is not None and entry[0] == version:
+        record(f'{scope}.hit')
+        return entry[1]
+
+    record(f'{scope}.miss')
+    if version is None:
+        version = await aget_version(user_id, scope)
+    value = await build()
+    await cache.aset(pkey, (version, value), timeout)
+    return value
@@ -0,0 +1,103 @@
+import math
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import caching, watermarks
+from .models import ArchivedTransaction, Goal, Transaction
+
+# Goal progress. Transactions allocated to a goal (Transaction.goal) count
+# towards it, so saved_amount = initial_amount + allocated amounts. The signal
+# handlers in core/signals.py keep it current with F() increments, which the
+# database applies atomically, so concurrent allocations never overwrite each
+# other. reconcile() recomputes it from scratch.
+
+RATE_WINDOW_DAYS = 90
+MAX_PROJECTION_DAYS = 100 * 365
+
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+
+def apply_allocation(goal_id, amount):
+    if goal_id is None or not amount:
+        return
+    Goal.objects.filter(pk=goal_id).update(saved_amount=F('saved_amount') + amount, updated_at=timezone.now())
+
+
+def move_allocation(previous, current):
+    """Applies a change from (goal_id, amount) `previous` to `current`."""
+    (previous_goal, previous_amount), (goal, amount) = previous, current
+    if previous_goal == goal:
+        apply_allocation(goal, Decimal(amount) - Decimal(previous_amount))
+    else:
+        apply_allocation(previous_goal, -Decimal(previous_amount))
+        apply_allocation(goal, Decimal(amount))
+
+
+def reconcile(goals=None):
+    """
+    Resets saved_amount to initial_amount plus allocations for every goal (or
+    the given queryset) whose stored value has drifted, in one UPDATE driven
+    by a per-goal SUM. Returns the number of goals corrected.
+    """
+    goals = Goal.objects.all() if goals is None else goals
+    expected = F('initial_amount')
+    # Archived transactions keep counting towards their goal.
+    for model in (Transaction, ArchivedTransaction):
+        allocated = (
+            model.objects.filter(goal=OuterRef('pk'))
+            .values('goal')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        expected += Coalesce(Subquery(allocated), Value(Decimal('0')), output_field=AMOUNT)
+    drifted = goals.alias(expected=expected).exclude(saved_amount=F('expected'))
+    with transaction.atomic():
+        user_ids = set(drifted.values_list('user_id', flat=True))
+        corrected = drifted.update(saved_amount=expected, updated_at=timezone.now())
+        for user_id in user_ids:
+            # The update skips the Goal signals, so do what they would.
+            watermarks.touch(user_id, watermarks.GOALS)
+            caching.bump_on_commit(user_id, caching.DASHBOARD)
+    return corrected
+
+
+def with_recent_savings(goals, today, window=RATE_WINDOW_DAYS):
+    """Annotates recent_saved: the amount allocated to each goal over the last `window` days."""
+    since = timezone.make_aware(datetime.combine(today - timedelta(days=window), time.min))
+    return goals.annotate(recent_saved=Coalesce(
+        Sum('transactions__amount', filter=Q(transactions__date_time__gte=since)),
+        Value(Decimal('0')),
+        output_field=AMOUNT,
+    ))
+
+
+def projected_completion(goal, today, window=RATE_WINDOW_DAYS):
+    """
+    The date the goal is reached at its recent savings rate: today if it
+    already is, None if nothing was saved recently (or it is a century away).
+    """
+    remaining = goal.target_amount - goal.saved_amount
+    if remaining <= 0:
+        return today
+    recent_saved = getattr(goal, 'recent_saved', None)
+    if recent_saved is None:
+        recent_saved = with_recent_savings(Goal.objects.filter(pk=goal.pk), today, window).values_list(
+            'recent_saved', flat=True,
+        ).first() or 0
+    if recent_saved <= 0:
+        return None
+    days = math.ceil(remaining * window / recent_saved)
+    return today + timedelta(days=days) if days <= MAX_PROJECTION_DAYS else None
+
+
+def goals_with_projection(goals, today):
+    """Evaluates a goal queryset with projected_completion set on each goal, in one query."""
+    goals = list(with_recent_savings(goals, today))
+    for goal in goals:
+        goal.projected_completion = projected_completion(goal, today)
+    return goals
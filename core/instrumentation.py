@@ -0,0 +1,178 @@
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+# In-process latency histograms per URL name. Buckets are fixed and
+# log-spaced (~15% wide, 0.5 ms to ~60 s), so memory per URL is constant,
+# percentiles are accurate to within a bucket, and snapshots from several
+# worker processes can be merged by adding counts. Each process periodically
+# writes its snapshot to INSTRUMENTATION['DUMP_DIR'], where the dump_timings
+# management command picks them up.
+
+BOUNDS = [0.5 * 1.15 ** index for index in range(85)]
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'LOG': False,
+    'DUMP_DIR': None,
+    'FLUSH_INTERVAL': 30,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples (ms)."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(BOUNDS[index], self.max) if index < len(BOUNDS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {'counts': self.counts, 'count': self.count, 'total': self.total, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = list(data['counts'])
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.max = data['max']
+        return histogram
+
+
+class ViewStats:
+    """Per-URL-name histograms of total and DB time, plus query and 304 count totals."""
+
+    def __init__(self):
+        self.total = Histogram()
+        self.db = Histogram()
+        self.queries = 0
+        self.not_modified = 0
+
+    def merge(self, other):
+        self.total.merge(other.total)
+        self.db.merge(other.db)
+        self.queries += other.queries
+        self.not_modified += other.not_modified
+
+    def summary(self):
+        count = self.total.count
+        return {
+            'count': count,
+            'p50': self.total.percentile(0.50),
+            'p95': self.total.percentile(0.95),
+            'p99': self.total.percentile(0.99),
+            'max': self.total.max,
+            'mean': self.total.total / count if count else None,
+            'db_p95': self.db.percentile(0.95),
+            'queries_mean': self.queries / count if count else None,
+            'not_modified_rate': self.not_modified / count if count else None,
+        }
+
+    def as_dict(self):
+        return {
+            'total': self.total.as_dict(),
+            'db': self.db.as_dict(),
+            'queries': self.queries,
+            'not_modified': self.not_modified,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.total = Histogram.from_dict(data['total'])
+        stats.db = Histogram.from_dict(data['db'])
+        stats.queries = data['queries']
+        stats.not_modified = data.get('not_modified', 0)  # absent from older snapshots
+        return stats
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.last_flush = time.monotonic()
+
+    def record(self, name, total_ms, db_ms, queries, not_modified=False):
+        with self.lock:
+            stats = self.views.get(name)
+            if stats is None:
+                stats = self.views[name] = ViewStats()
+            stats.total.add(total_ms)
+            stats.db.add(db_ms)
+            stats.queries += queries
+            stats.not_modified += not_modified
+
+    def snapshot(self):
+        with self.lock:
+            return {name: stats.as_dict() for name, stats in self.views.items()}
+
+    def maybe_flush(self):
+        dump_dir = get_setting('DUMP_DIR')
+        if not dump_dir or time.monotonic() - self.last_flush < get_setting('FLUSH_INTERVAL'):
+            return
+        self.flush(dump_dir)
+
+    def flush(self, dump_dir):
+        self.last_flush = time.monotonic()
+        directory = Path(dump_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'timings-{os.getpid()}.json'
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({'pid': os.getpid(), 'written': time.time(), 'views': self.snapshot()}))
+        os.replace(temporary, path)
+
+
+registry = Registry()
+
+
+def load_dumps(dump_dir):
+    """Merges every process snapshot in dump_dir into {url_name: ViewStats}."""
+    merged = {}
+    for path in sorted(Path(dump_dir).glob('timings-*.json')):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for name, raw in data.get('views', {}).items():
+            stats = ViewStats.from_dict(raw)
+            if name in merged:
+                merged[name].merge(stats)
+            else:
+                merged[name] = stats
+    return merged
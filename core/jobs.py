@@ -0,0 +1,362 @@
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, time, timedelta
+
+import django
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Checkpoint, Job
+
+# Background jobs without a broker. A job is a row in core_job naming a
+# handler registered with @register and the keyword arguments to call it
+# with. `manage.py run_jobs` claims due rows and runs them on a pool of
+# threads (or processes); a failed job is retried after an exponential
+# backoff until it runs out of attempts.
+#
+# Claiming is a conditional UPDATE (status still Queued), so two workers never
+# run the same job; where the database supports SKIP LOCKED, candidates are
+# also selected with it so workers don't contend for the same rows. While a
+# job runs, its worker renews the lease (locked_at) every LEASE / 3 seconds, so
+# however long the job takes it is only requeued once its worker has been
+# silent for LEASE seconds: it died, or lost the database.
+#
+# Periodic jobs are listed in JOBS['SCHEDULE'] with a five-field cron
+# expression (local time). Every worker evaluates the schedules; the last
+# fire time lives in a Checkpoint and is advanced with a compare-and-swap, so
+# one run is queued per due time however many workers there are. Runs missed
+# while no worker was up are collapsed into one.
+
+logger = logging.getLogger('core.jobs')
+
+QUEUED, RUNNING, DONE, FAILED = 'Queued', 'Running', 'Done', 'Failed'
+
+DEFAULTS = {
+    'WORKERS': 4,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'LEASE': 1800,
+    'KEEP_FINISHED_DAYS': 7,
+    'SCHEDULE': {},
+}
+
+MAX_ERROR_LENGTH = 10000
+
+registry = {}
+
+
+def get_setting(name):
+    return getattr(settings, 'JOBS', {}).get(name, DEFAULTS[name])
+
+
+def register(name):
+    """Decorator registering a function as the handler for jobs called `name`."""
+    def decorator(function):
+        registry[name] = function
+        return function
+    return decorator
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=None, unique=False):
+    """
+    Queues a job and returns it. With unique=True nothing is queued (and None
+    is returned) if an identical job is already waiting to run.
+    """
+    if name not in registry:
+        raise LookupError(f"No job registered as '{name}'")
+    payload = payload or {}
+    if unique and payload in Job.objects.filter(name=name, status=QUEUED).values_list('payload', flat=True):
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or get_setting('MAX_ATTEMPTS'),
+    )
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that has failed `attempts` times."""
+    delay = min(get_setting('BACKOFF_BASE') * 2 ** (attempts - 1), get_setting('BACKOFF_MAX'))
+    # Jitter spreads out jobs that failed together (e.g. while the DB was down).
+    return delay * random.uniform(0.75, 1.25)
+
+
+# ──────── Claiming & running ──────── #
+
+def claim(worker_id, limit, now=None):
+    """Marks up to `limit` due jobs as running on `worker_id` and returns their ids."""
+    now = now or timezone.now()
+    due = Job.objects.filter(status=QUEUED, run_at__lte=now).order_by('run_at', 'id')
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = _mark_running(due.select_for_update(skip_locked=True), worker_id, limit, now)
+    else:
+        # No row locks to take (SQLite): a transaction would only turn the
+        # read into a lock upgrade that fails at once under contention.
+        ids = _mark_running(due, worker_id, limit, now)
+    if not ids:
+        return []
+    return list(Job.objects.filter(pk__in=ids, status=RUNNING, locked_by=worker_id).values_list('pk', flat=True))
+
+
+def _mark_running(due, worker_id, limit, now):
+    ids = list(due.values_list('pk', flat=True)[:limit])
+    if ids:
+        Job.objects.filter(pk__in=ids, status=QUEUED).update(
+            status=RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return ids
+
+
+def heartbeat(worker_id, now=None):
+    """Renews the lease on every job `worker_id` is running; returns how many."""
+    now = now or timezone.now()
+    return Job.objects.filter(status=RUNNING, locked_by=worker_id).update(locked_at=now)
+
+
+def requeue_expired(now=None):
+    """Hands jobs whose worker stopped renewing their lease back to the queue."""
+    now = now or timezone.now()
+    expired = Job.objects.filter(status=RUNNING, locked_at__lt=now - timedelta(seconds=get_setting('LEASE')))
+    requeued = expired.filter(attempts__lt=F('max_attempts')).update(
+        status=QUEUED, locked_by='', locked_at=None, run_at=now, last_error='Lease expired',
+    )
+    failed = expired.update(status=FAILED, locked_by='', locked_at=None, finished_at=now, last_error='Lease expired')
+    return requeued + failed
+
+
+def execute(job_id, worker_id):
+    """Runs one claimed job; returns its new status (None if the claim was lost)."""
+    close_old_connections()
+    try:
+        job = Job.objects.filter(pk=job_id, status=RUNNING, locked_by=worker_id).first()
+        if job is None:
+            return None
+        try:
+            handler = registry.get(job.name)
+            if handler is None:
+                raise LookupError(f"No job registered as '{job.name}'")
+            handler(**job.payload)
+        except Exception:
+            return _failed(job, worker_id, traceback.format_exc())
+        Job.objects.filter(pk=job.pk, locked_by=worker_id).update(
+            status=DONE, locked_by='', locked_at=None, finished_at=timezone.now(),
+        )
+        return DONE
+    finally:
+        close_old_connections()
+
+
+def _failed(job, worker_id, error):
+    now = timezone.now()
+    fields = {'locked_by': '', 'locked_at': None, 'last_error': error[-MAX_ERROR_LENGTH:]}
+    if job.attempts >= job.max_attempts:
+        fields.update(status=FAILED, finished_at=now)
+        logger.error("Job %s #%s failed after %s attempts", job.name, job.pk, job.attempts)
+    else:
+        fields.update(status=QUEUED, run_at=now + timedelta(seconds=backoff(job.attempts)))
+        logger.warning("Job %s #%s failed (attempt %s of %s), retrying", job.name, job.pk, job.attempts,
+                       job.max_attempts)
+    Job.objects.filter(pk=job.pk, locked_by=worker_id).update(**fields)
+    return fields['status']
+
+
+def cleanup(days=None):
+    """Deletes finished jobs older than `days` (JOBS['KEEP_FINISHED_DAYS'])."""
+    days = get_setting('KEEP_FINISHED_DAYS') if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status__in=[DONE, FAILED], finished_at__lt=cutoff).delete()
+    return deleted
+
+
+# ──────── Schedules ──────── #
+
+def _parse_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        spec, _, step = part.partition('/')
+        if spec == '*':
+            start, end = low, high
+        elif '-' in spec:
+            start, end = (int(value) for value in spec.split('-', 1))
+        else:
+            start = int(spec)
+            end = high if step else start
+        step = int(step) if step else 1
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Invalid cron field '{text}'")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class Cron:
+    """A five-field cron expression: minute hour day-of-month month day-of-week (0 or 7 = Sunday)."""
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != len(self.FIELDS):
+            raise ValueError(f"Cron expression '{expression}' must have five fields")
+        self.expression = expression
+        self.minutes, self.hours, days, months, weekdays = (
+            _parse_field(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.days, self.months = set(days), set(months)
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron, a day matches either field when both are restricted.
+        self.any_day = parts[2].startswith('*')
+        self.any_weekday = parts[4].startswith('*')
+
+    def matches_day(self, day):
+        if day.month not in self.months:
+            return False
+        in_month = day.day in self.days
+        in_week = day.isoweekday() % 7 in self.weekdays
+        if self.any_day:
+            return in_week
+        if self.any_weekday:
+            return in_month
+        return in_month or in_week
+
+    def next_after(self, moment):
+        """The first fire time strictly after the aware datetime `moment`."""
+        start = timezone.localtime(moment).replace(second=0, microsecond=0, tzinfo=None) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 8):  # Feb 29 on a given weekday can be years away
+            if self.matches_day(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime.combine(day, time(hour, minute))
+                        if candidate >= start:
+                            return timezone.make_aware(candidate)
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
+
+
+_crons = {}
+
+
+def _cron(expression):
+    cron = _crons.get(expression)
+    if cron is None:
+        cron = _crons[expression] = Cron(expression)
+    return cron
+
+
+def run_schedules(now=None):
+    """Queues every scheduled job that has come due since it last fired; returns the names queued."""
+    now = now or timezone.now()
+    stamp = int(now.timestamp())
+    queued = []
+    for name, entry in get_setting('SCHEDULE').items():
+        # A new schedule starts counting from now rather than firing at once.
+        checkpoint, _ = Checkpoint.objects.get_or_create(name=f'schedule:{name}', defaults={'position': stamp})
+        last = datetime.fromtimestamp(checkpoint.position, tz=timezone.get_current_timezone())
+        if _cron(entry['cron']).next_after(last) > now:
+            continue
+        with transaction.atomic():
+            won = Checkpoint.objects.filter(pk=checkpoint.pk, position=checkpoint.position).update(
+                position=stamp, updated_at=now,
+            )
+            if won:
+                enqueue(entry['job'], entry.get('kwargs'), max_attempts=entry.get('max_attempts'))
+                queued.append(name)
+    return queued
+
+
+# ──────── Worker ──────── #
+
+def _make_pool(workers, processes):
+    if processes:
+        # Spawned rather than forked so no child shares the parent's database
+        # connections; each sets Django up from scratch.
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+    return ThreadPoolExecutor(workers, thread_name_prefix='job')
+
+
+def _count(futures, counts, worker_id):
+    for future in futures:
+        try:
+            result = future.result()
+        except Exception:
+            # The job row could not be read or updated (e.g. the database went
+            # away); the lease brings the job back.
+            logger.exception("Worker %s could not record a job result", worker_id)
+            continue
+        if result is not None:
+            counts[result] += 1
+
+
+def make_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def work(workers=None, processes=False, burst=False, poll_interval=None, stop=None):
+    """
+    Claims and runs jobs until `stop` (a threading.Event) is set or, with
+    burst=True, until no job is due. Returns {status: count} for the jobs run.
+    """
+    workers = workers or get_setting('WORKERS')
+    poll_interval = get_setting('POLL_INTERVAL') if poll_interval is None else poll_interval
+    stop = stop or threading.Event()
+    worker_id = make_worker_id()
+    pool = _make_pool(workers, processes)
+    renew_every = timedelta(seconds=get_setting('LEASE') / 3)
+    renewed_at = timezone.now()
+
+    counts = {DONE: 0, FAILED: 0, QUEUED: 0}
+    running = set()
+    logger.info("Worker %s started with %s %s", worker_id, workers, 'processes' if processes else 'threads')
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                run_schedules()
+                requeue_expired()
+                if running and timezone.now() - renewed_at >= renew_every:
+                    renewed_at = timezone.now()
+                    heartbeat(worker_id, renewed_at)
+                claimed = claim(worker_id, workers - len(running)) if len(running) < workers else []
+            except DatabaseError:
+                # Keep the jobs in hand running and try again next poll.
+                logger.exception("Worker %s could not poll the queue", worker_id)
+                if not running:
+                    stop.wait(poll_interval)
+                    continue
+                claimed = []
+            for job_id in claimed:
+                try:
+                    running.add(pool.submit(execute, job_id, worker_id))
+                except BrokenExecutor:
+                    # A pool process died (e.g. killed for using too much memory).
+                    # The jobs it held come back when their lease expires.
+                    logger.error("Worker %s lost its pool, starting a new one", worker_id)
+                    pool.shutdown(wait=False)
+                    pool = _make_pool(workers, processes)
+                    running.add(pool.submit(execute, job_id, worker_id))
+
+            if running:
+                done, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                _count(done, counts, worker_id)
+            elif not claimed:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+    finally:
+        pool.shutdown(wait=True)
+        _count(running, counts, worker_id)
+        logger.info("Worker %s stopped", worker_id)
+    return counts
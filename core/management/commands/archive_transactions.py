@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = "Move transactions older than the archive horizon into the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive transactions older than this many days.")
+        parser.add_argument('--user', help="Only archive this username's transactions.")
+
+    def handle(self, *args, **options):
+        users = None
+        if options['user']:
+            users = User.objects.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        moved = archive.run(days=options['days'], users=users)
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} transactions."))
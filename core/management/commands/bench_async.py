@@ -0,0 +1,149 @@
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+
+from core import seeding
+
+# (name, WSGI path, async path)
+PAGES = [
+    ('dashboard', '/dashboard/', '/async/dashboard/'),
+    ('transactions_page', '/transactions-page/', '/async/transactions-page/'),
+    ('budgets_page', '/budgets-page/', '/async/budgets-page/'),
+    ('goals_page', '/goals-page/', '/async/goals-page/'),
+]
+
+
+class SimulatedLatency:
+    """Execute wrapper that adds a fixed delay per query, like a database across the network."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def _summary(latencies, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'median_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        'throughput_rps': round(len(ordered) / elapsed, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the synchronous pages (threaded, as under a WSGI server) with their /async/ versions "
+        "(one event loop, as under ASGI) at several concurrency levels."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,4,16', help="Concurrent clients, comma separated.")
+        parser.add_argument('--requests', type=int, default=64, help="Requests per page and level.")
+        parser.add_argument('--transactions', type=int, default=2000, help="Transactions per seeded user.")
+        parser.add_argument('--users', type=int, default=16)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--cached', action='store_true',
+                            help="Let the dashboard use its cache (by default every request rebuilds it).")
+        parser.add_argument('--db-latency', type=float, default=0.0,
+                            help="Milliseconds added to every query, to model a database server across the "
+                                 "network. In-process SQLite has no round trip for concurrent queries to overlap.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        except ValueError:
+            raise CommandError("--concurrency must be comma separated integers")
+        if not levels or min(levels) < 1 or options['requests'] < 1:
+            raise CommandError("--concurrency and --requests must be positive")
+
+        timeout = None if options['cached'] else 0
+        with seeding.throwaway_database(), override_settings(DASHBOARD_CACHE_TIMEOUT=timeout,
+                                                             INSTRUMENTATION={'LOG': False}):
+            users = seeding.seed(options['users'], options['transactions'], seed=options['seed'], prefix='bench')
+            if options['db_latency']:
+                latency = SimulatedLatency(options['db_latency'] / 1000)
+                connection_created.connect(latency.install)
+                for connection in connections.all(initialized_only=True):
+                    latency.install(connection)
+            results = {}
+            for name, sync_path, async_path in PAGES:
+                results[name] = {}
+                for level in levels:
+                    wsgi = self.bench_wsgi(users, sync_path, level, options['requests'])
+                    # A bare event loop, like an ASGI server's; under async_to_sync all
+                    # thread-sensitive work would be funnelled into this thread.
+                    asgi = asyncio.run(self.bench_asgi(users, async_path, level, options['requests']))
+                    results[name][str(level)] = {'wsgi': wsgi, 'async': asgi}
+                    self.stdout.write(
+                        f"  {name:<18} x{level:<3} wsgi median {wsgi['median_ms']:>8.2f} ms {wsgi['throughput_rps']:>7.1f} rps"
+                        f"  |  async median {asgi['median_ms']:>8.2f} ms {asgi['throughput_rps']:>7.1f} rps"
+                    )
+
+        if options['output']:
+            path = Path(options['output'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(f"Wrote {path}")
+
+    def bench_wsgi(self, users, path, concurrency, total):
+        clients = []
+        for index in range(concurrency):
+            client = Client()
+            client.force_login(users[index % len(users)])
+            clients.append(client)
+
+        def get(index):
+            started = time.perf_counter()
+            response = clients[index % concurrency].get(path)
+            if response.status_code != 200:
+                raise CommandError(f"GET {path} returned {response.status_code}")
+            return (time.perf_counter() - started) * 1000
+
+        clients[0].get(path)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(get, range(total)))
+        return _summary(latencies, time.perf_counter() - started)
+
+    async def bench_asgi(self, users, path, concurrency, total):
+        clients = []
+        for index in range(concurrency):
+            client = AsyncClient()
+            await client.aforce_login(users[index % len(users)])
+            clients.append(client)
+        latencies = []
+        remaining = iter(range(total))
+
+        async def worker(client):
+            for _ in remaining:
+                started = time.perf_counter()
+                # ASGIHandler gives each request its own thread for sync code;
+                # the test client doesn't, so do it here.
+                async with ThreadSensitiveContext():
+                    response = await client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f"GET {path} returned {response.status_code}")
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        await clients[0].get(path)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for client in clients))
+        return _summary(latencies, time.perf_counter() - started)
@@ -0,0 +1,74 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from core import seeding
+from core.models import Transaction
+from core.serializers import TransactionSerializer, serialize_values, values_lookups
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serializing transactions from model instances with the values() list path used by "
+        "the API list endpoints: time, peak memory and identical output."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='50,500,5000', help="Row counts to serialize, comma separated.")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--fields', default='', help="Sparse fieldset to apply, as in ?fields=.")
+
+    def handle(self, *args, **options):
+        try:
+            counts = [int(count) for count in options['rows'].split(',') if count.strip()]
+        except ValueError:
+            raise CommandError("--rows must be comma separated integers")
+        if not counts or min(counts) < 1 or options['repeat'] < 1:
+            raise CommandError("--rows and --repeat must be positive")
+
+        with seeding.throwaway_database():
+            user = seeding.seed(1, max(counts), seed=options['seed'], prefix='bench')[0]
+            query = f"?fields={options['fields']}" if options['fields'] else ''
+            request = Request(RequestFactory().get(f'/transactions/{query}'))
+            request.user = user
+            serializer = TransactionSerializer(context={'request': request})
+            lookups = values_lookups(serializer)
+
+            def instances(count):
+                queryset = Transaction.objects.filter(user=user).select_related('user').order_by('-date_time', '-id')
+                return TransactionSerializer(queryset[:count], many=True, context={'request': request}).data
+
+            def values(count):
+                queryset = Transaction.objects.filter(user=user).order_by('-date_time', '-id')
+                return serialize_values(serializer, queryset.values(*set(lookups.values()))[:count])
+
+            self.stdout.write(f"{'rows':>6}  {'instances':>20}  {'values()':>20}  speedup  memory")
+            for count in counts:
+                if json.dumps(instances(count), default=str) != json.dumps(values(count), default=str):
+                    raise CommandError(f"values() output differs from the serializer at {count} rows")
+                slow, slow_peak = self.measure(instances, count, options['repeat'])
+                fast, fast_peak = self.measure(values, count, options['repeat'])
+                self.stdout.write(
+                    f"{count:>6}  {slow:>9.2f} ms {slow_peak / 1024:>7.0f} KiB  {fast:>9.2f} ms {fast_peak / 1024:>7.0f} KiB"
+                    f"  {slow / fast:>6.1f}x  {slow_peak / fast_peak:>5.1f}x"
+                )
+
+    def measure(self, func, count, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(count)
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        tracemalloc.start()
+        try:
+            func(count)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return best, peak
@@ -0,0 +1,120 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.sms import DEFAULT_MERCHANT_CATEGORIES, SmsParser
+
+MERCHANTS = ['Zomato', 'Swiggy', 'Uber India', 'Ola Cabs', 'Amazon Pay', 'Flipkart', 'PharmEasy', 'Corner Bakery', 'Ravi Kumar']
+
+
+def legacy_parse_sms_data(sms, merchants=None):
+    # The pre-engine implementation of core.utils.parse_sms_data, kept as the
+    # baseline. `merchants` swaps in a larger dictionary for the same loop.
+    amount_match = re.search(r'₹(\d+\.?\d*)', sms)
+    merchant_match = re.search(r'to (.*?) via', sms)
+
+    if amount_match and merchant_match:
+        amount = amount_match.group(1)
+        merchant = merchant_match.group(1).strip()
+        lower_merchant = merchant.lower()
+
+        category_map = merchants or {
+            'zomato': 'Food',
+            'swiggy': 'Food',
+            'uber': 'Transport',
+            'ola': 'Transport',
+            'amazon': 'Shopping',
+            'flipkart': 'Shopping',
+            'pharmeasy': 'Health',
+            'medlife': 'Health',
+        }
+
+        category = 'Other'
+        for key in category_map:
+            if key in lower_merchant:
+                category = category_map[key]
+                break
+
+        return {
+            'amount': amount,
+            'category': category,
+            'description': f"GPay: {merchant}",
+            'status': 'Paid'
+        }
+    return None
+
+
+LEGACY_SHAPE = "₹{amount} paid to {merchant} via GPay"
+OTHER_SHAPES = [
+    "Rs.{amount} debited from A/c XX1234 on 12-03-25 to VPA {merchant} (UPI Ref No 5123)",
+    "INR {amount} debited from a/c **1234 on 05-Jun-25. Info: UPI/{merchant}/4123",
+    "Rs.{amount} credited to A/c XX1234 from {merchant} (UPI Ref No 5123)",
+    "Your OTP for login is 482913. Do not share it with anyone.",
+]
+
+
+def make_merchant_dictionary(size, seed):
+    rng = random.Random(seed)
+    categories = ['Food', 'Transport', 'Rent', 'Shopping', 'Health']
+    merchants = {}
+    while len(merchants) < size:
+        name = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(5, 10)))
+        merchants[name] = rng.choice(categories)
+    merchants.update(DEFAULT_MERCHANT_CATEGORIES)
+    return merchants
+
+
+def make_messages(count, seed, shapes):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        amount = f"{rng.randint(10, 5000)}.{rng.randint(0, 99):02d}"
+        messages.append(rng.choice(shapes).format(amount=amount, merchant=rng.choice(MERCHANTS)))
+    return messages
+
+
+class Command(BaseCommand):
+    help = "Benchmark the SMS parsing engine against the original per-message parser."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--merchants', type=int, default=2000,
+                            help="Size of the synthetic merchant dictionary for the last scenario.")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Runs per measurement; the fastest is reported, as timeit does.")
+
+    def run(self, label, func, messages):
+        elapsed = float('inf')
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            results = func(messages)
+            elapsed = min(elapsed, time.perf_counter() - started)
+        parsed = sum(1 for result in results if result)
+        self.stdout.write(f"  {label:<24} {len(messages) / elapsed:>12,.0f} msg/s  parsed {parsed}/{len(messages)}")
+
+    def handle(self, *args, **options):
+        count, seed = options['count'], options['seed']
+        self.repeat = max(options['repeat'], 1)
+        engine = SmsParser()
+
+        scenarios = [
+            ('legacy message shape, default dictionary', make_messages(count, seed, [LEGACY_SHAPE]), None),
+            ('mixed bank/UPI shapes, default dictionary', make_messages(count, seed, [LEGACY_SHAPE] + OTHER_SHAPES), None),
+        ]
+        if options['merchants']:
+            merchants = make_merchant_dictionary(options['merchants'], seed)
+            scenarios.append((
+                f"legacy message shape, {len(merchants)} merchants",
+                make_messages(count, seed, [LEGACY_SHAPE]),
+                merchants,
+            ))
+
+        for title, messages, merchants in scenarios:
+            self.stdout.write(title)
+            parser = engine if merchants is None else SmsParser(merchants=merchants)
+            self.run('legacy parse_sms_data', lambda batch: [legacy_parse_sms_data(sms, merchants) for sms in batch], messages)
+            self.run('engine parse', lambda batch: [parser.parse(sms) for sms in batch], messages)
+            self.run('engine parse_many', parser.parse_many, messages)
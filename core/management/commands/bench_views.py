@@ -0,0 +1,170 @@
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from core import seeding
+
+# (name, path, client) — 'session' pages use a logged-in Client, 'token' ones
+# send the user's API token like the mobile app does.
+ENDPOINTS = [
+    ('dashboard', '/dashboard/', 'session'),
+    ('transactions_page', '/transactions-page/', 'session'),
+    ('budgets_page', '/budgets-page/', 'session'),
+    ('api_transactions', '/transactions/', 'token'),
+    ('api_transactions_filtered', '/transactions/?category=Food&min_amount=200', 'token'),
+    ('api_transactions_search', '/transactions/?search=zomato', 'token'),
+    ('api_budgets', '/budgets/', 'token'),
+    ('api_goals', '/goals/', 'token'),
+]
+
+
+def _parse_sizes(value):
+    try:
+        sizes = [int(size) for size in value.split(',') if size.strip()]
+    except ValueError:
+        raise CommandError(f"--sizes must be comma separated integers, got '{value}'")
+    if not sizes or min(sizes) < 1:
+        raise CommandError("--sizes must list at least one positive integer")
+    return sizes
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the dashboard, transactions and budgets pages and the transaction/budget/goal list APIs "
+        "against freshly seeded data at several sizes, in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000', help="Transactions per user, comma separated.")
+        parser.add_argument('--users', type=int, default=5, help="Users seeded at each size (one is measured).")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help="Keep the cache between requests instead of clearing it before each one.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--baseline', help="Compare medians against a JSON file written by --output.")
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help="Fail when a median is more than this many times its baseline.")
+
+    def handle(self, *args, **options):
+        sizes = _parse_sizes(options['sizes'])
+        if options['repeat'] < 1 or options['users'] < 1:
+            raise CommandError("--repeat and --users must be positive")
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Could not read baseline: {exc}")
+
+        with seeding.throwaway_database():
+            results = {str(size): self.bench_size(size, options) for size in sizes}
+
+        report = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'users': options['users'],
+                'repeat': options['repeat'],
+                'seed': options['seed'],
+                'warm_cache': options['warm_cache'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            path = Path(options['output'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(f"Wrote {path}")
+        if baseline is not None:
+            self.compare(results, baseline.get('results', {}), options['threshold'])
+
+    def bench_size(self, size, options):
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        started = time.perf_counter()
+        users = seeding.seed(options['users'], size, seed=options['seed'], prefix='bench')
+        self.stdout.write(f"\n{size} transactions/user x {options['users']} users "
+                          f"(seeded in {time.perf_counter() - started:.1f}s)")
+
+        user = users[0]
+        clients = {'session': Client(), 'token': Client(HTTP_AUTHORIZATION=f'Token {user.auth_token.key}')}
+        clients['session'].force_login(user)
+
+        measured = {}
+        for name, path, kind in ENDPOINTS:
+            measured[name] = self.bench_endpoint(clients[kind], path, options)
+            stats = measured[name]
+            self.stdout.write(f"  {name:<26} median {stats['median_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  "
+                              f"{stats['queries']:>3} queries  {stats['bytes']:>8} bytes")
+        return measured
+
+    def bench_endpoint(self, client, path, options):
+        def get():
+            if not options['warm_cache']:
+                cache.clear()
+            response = client.get(path, HTTP_ACCEPT='application/json')
+            if response.status_code != 200:
+                raise CommandError(f"GET {path} returned {response.status_code}")
+            return response
+
+        for _ in range(options['warmup']):
+            get()
+        with CaptureQueriesContext(connection) as queries:
+            response = get()
+        # Read now: the next request_started signal clears the query log.
+        query_count = len(queries)
+
+        samples = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            get()
+            samples.append((time.perf_counter() - started) * 1000)
+        return {
+            'median_ms': round(statistics.median(samples), 3),
+            'mean_ms': round(statistics.fmean(samples), 3),
+            'min_ms': round(min(samples), 3),
+            'p95_ms': round(_percentile(samples, 0.95), 3),
+            'queries': query_count,
+            'bytes': len(response.content),
+        }
+
+    def compare(self, results, baseline, threshold):
+        # Wall-clock numbers only compare meaningfully when the baseline was
+        # recorded on the same kind of machine; query counts compare anywhere.
+        self.stdout.write(f"\nAgainst baseline (fail above {threshold:.2f}x):")
+        regressions = []
+        for size, endpoints in results.items():
+            for name, current in endpoints.items():
+                previous = baseline.get(size, {}).get(name)
+                if not previous:
+                    continue
+                ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+                more_queries = current['queries'] > previous['queries']
+                flag = ''
+                if ratio > threshold or more_queries:
+                    flag = '  REGRESSION'
+                    regressions.append(f"{name}@{size}")
+                self.stdout.write(f"  {name + '@' + size:<26} {ratio:>6.2f}x  "
+                                  f"queries {previous['queries']} -> {current['queries']}{flag}")
+        if regressions:
+            raise CommandError(f"Regressed: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("No regressions."))
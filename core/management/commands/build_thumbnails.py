@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from core import thumbnails
+from core.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Render profile image thumbnails for profiles that have none (e.g. uploaded before thumbnails existed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Re-render every profile, e.g. after changing PROFILE_THUMBNAILS size or quality.")
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.exclude(profile_image='')
+        if not options['all']:
+            profiles = profiles.filter(thumbnail='')
+
+        rendered = skipped = 0
+        for profile in profiles.iterator():
+            try:
+                with profile.profile_image.open('rb') as image:
+                    stem = thumbnails.render(image)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                skipped += 1
+                continue
+            Profile.objects.filter(pk=profile.pk).update(thumbnail=stem)
+            rendered += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} thumbnails, skipped {skipped} unreadable images."))
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import recurring
+
+
+class Command(BaseCommand):
+    help = "Detect recurring expenses from transaction history and update RecurringExpense."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help="Only re-evaluate users whose transactions changed since the last run.")
+        parser.add_argument('--user', help="Only evaluate this username (full mode).")
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            if options['user']:
+                raise CommandError("--user cannot be combined with --incremental")
+            detected, evaluated = recurring.run_incremental()
+        else:
+            users = None
+            if options['user']:
+                users = User.objects.filter(username=options['user'])
+                if not users.exists():
+                    raise CommandError(f"User '{options['user']}' does not exist")
+            detected, evaluated = recurring.run_full(users)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Evaluated {evaluated} merchants, {detected} recurring."
+        ))
@@ -0,0 +1,44 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.instrumentation import get_setting, load_dumps
+
+
+class Command(BaseCommand):
+    help = "Print p50/p95/p99 request latency and 304 rate per URL name from the instrumentation snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help="Snapshot directory (defaults to INSTRUMENTATION['DUMP_DIR']).")
+        parser.add_argument('--json', action='store_true', help="Emit JSON instead of a table.")
+        parser.add_argument('--reset', action='store_true', help="Delete the snapshots after printing them.")
+
+    def handle(self, *args, **options):
+        dump_dir = options['dir'] or get_setting('DUMP_DIR')
+        if not dump_dir:
+            raise CommandError("No snapshot directory; set INSTRUMENTATION['DUMP_DIR'] or pass --dir.")
+
+        summaries = {name: stats.summary() for name, stats in sorted(load_dumps(dump_dir).items())}
+        if options['json']:
+            self.stdout.write(json.dumps(summaries, indent=2))
+        elif not summaries:
+            self.stdout.write("No timings recorded yet.")
+        else:
+            header = f"{'view':<40} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'db p95':>9} {'queries':>8} {'304 %':>6}"
+            self.stdout.write(header)
+            self.stdout.write('-' * len(header))
+            for name, summary in summaries.items():
+                self.stdout.write(
+                    f"{name:<40} {summary['count']:>7} {summary['p50']:>9.1f} {summary['p95']:>9.1f} "
+                    f"{summary['p99']:>9.1f} {summary['max']:>9.1f} {summary['db_p95']:>9.1f} "
+                    f"{summary['queries_mean']:>8.1f} {summary['not_modified_rate'] * 100:>6.1f}"
+                )
+            self.stdout.write(
+                "Times in ms; percentiles are bucket upper bounds (~15% resolution). "
+                "304 % is the share of requests answered Not Modified."
+            )
+
+        if options['reset']:
+            for path in Path(dump_dir).glob('timings-*.json'):
+                path.unlink()
@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Queue a background job for run_jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="Registered job name.")
+        parser.add_argument('--payload', default='{}', help="Keyword arguments for the job, as a JSON object.")
+        parser.add_argument('--unique', action='store_true', help="Skip if an identical job is already queued.")
+
+    def handle(self, *args, **options):
+        try:
+            payload = json.loads(options['payload'])
+        except ValueError:
+            raise CommandError("--payload must be valid JSON")
+        if not isinstance(payload, dict):
+            raise CommandError("--payload must be a JSON object")
+        try:
+            job = jobs.enqueue(options['name'], payload, unique=options['unique'])
+        except LookupError as error:
+            raise CommandError(f"{error}; known jobs: {', '.join(sorted(jobs.registry))}")
+
+        if job is None:
+            self.stdout.write("An identical job is already queued.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Queued {job}."))
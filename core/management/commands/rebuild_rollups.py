@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the MonthlyRollup table from Transaction rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild rollups for this username.")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        written = rollups.rebuild(user=user)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows."))
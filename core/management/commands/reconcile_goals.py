@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import goals
+from core.models import Goal
+
+
+class Command(BaseCommand):
+    help = "Recompute Goal.saved_amount from initial_amount plus allocated transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only reconcile this username's goals.")
+
+    def handle(self, *args, **options):
+        queryset = Goal.objects.all()
+        if options['user']:
+            try:
+                queryset = queryset.filter(user=User.objects.get(username=options['user']))
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        corrected = goals.reconcile(queryset)
+        self.stdout.write(self.style.SUCCESS(f"Corrected {corrected} goals."))
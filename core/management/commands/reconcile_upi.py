@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import reconciliation
+from core.importers import iter_csv_rows
+
+
+class Command(BaseCommand):
+    help = "Settle a user's Pending UPI payments from a bank statement CSV (payee, amount, date_time or date)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('csv_file')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        try:
+            with open(options['csv_file'], encoding='utf-8-sig', newline='') as lines:
+                items = reconciliation.take_batch(row for _, row, _ in iter_csv_rows(lines))
+        except UnicodeDecodeError as exc:
+            raise CommandError(f"{options['csv_file']} is not UTF-8 text: {exc}")
+        try:
+            result = reconciliation.reconcile(user, items)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for entry in result.unmatched_items:
+            self.stdout.write(f"Row {entry['item']}: {entry['reason']}")
+        self.stdout.write(self.style.SUCCESS(f"Settled {result.matched} payments, {result.unmatched} rows unmatched."))
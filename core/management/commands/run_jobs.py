@@ -0,0 +1,38 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (core.jobs) and queue scheduled ones, until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help="Jobs run at once (default JOBS['WORKERS']).")
+        parser.add_argument('--processes', action='store_true',
+                            help="Run jobs in a process pool instead of threads, for CPU-bound work.")
+        parser.add_argument('--burst', action='store_true', help="Exit once no job is due.")
+        parser.add_argument('--poll-interval', type=float,
+                            help="Seconds between queue polls when idle (default JOBS['POLL_INTERVAL']).")
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError("--workers must be positive")
+
+        stop = threading.Event()
+        # Finish the jobs in hand on SIGTERM/Ctrl-C instead of abandoning them to the lease.
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        counts = jobs.work(
+            workers=options['workers'],
+            processes=options['processes'],
+            burst=options['burst'],
+            poll_interval=options['poll_interval'],
+            stop=stop,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Ran {counts[jobs.DONE]} jobs, {counts[jobs.FAILED]} failed, {counts[jobs.QUEUED]} to retry."
+        ))
@@ -0,0 +1,31 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import seeding
+
+
+class Command(BaseCommand):
+    help = "Bulk-create synthetic users with transactions, budgets, goals and recurring expenses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--transactions', type=int, default=500, help="Transactions per user.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='demo', help="Usernames are <prefix>0, <prefix>1, ...")
+        parser.add_argument('--anchor', type=date.fromisoformat,
+                            help="Date the generated history ends at (YYYY-MM-DD). Defaults to today.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['transactions'] < 0:
+            raise CommandError("--users must be positive and --transactions must not be negative")
+
+        started = time.perf_counter()
+        created = seeding.seed(options['users'], options['transactions'], seed=options['seed'],
+                               prefix=options['prefix'], anchor=options['anchor'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(created)} users ({options['users'] - len(created)} already existed) in {elapsed:.1f}s. "
+            f"Password for all of them: '{seeding.SEED_PASSWORD}'."
+        ))
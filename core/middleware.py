@@ -0,0 +1,203 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import base as template_base
+
+from . import routers
+from .instrumentation import get_setting, registry
+
+logger = logging.getLogger('core.instrumentation')
+
+# Per-request counters. A ContextVar keeps concurrent requests (threads or
+# ASGI tasks) apart without touching the request object from deep inside the
+# ORM or template engine.
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.template_depth = 0
+        # Async views may run several queries at once on worker threads.
+        self.lock = threading.Lock()
+
+    def add_query(self, elapsed):
+        with self.lock:
+            self.queries += 1
+            self.db += elapsed
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - started)
+
+
+def _install_wrapper(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install_wrapper(connection)
+
+
+# Every connection carries the wrapper, including those opened on worker
+# threads by async views; it does nothing outside an instrumented request.
+connection_created.connect(_on_connection_created)
+
+
+_original_template_render = template_base.Template.render
+
+
+def _timed_template_render(self, context):
+    timings = _current.get()
+    if timings is None:
+        return _original_template_render(self, context)
+    # {% extends %} and {% include %} render nested templates; only the
+    # outermost render is timed so nothing is counted twice.
+    timings.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_template_render(self, context)
+    finally:
+        timings.template_depth -= 1
+        if not timings.template_depth:
+            timings.template += time.perf_counter() - started
+
+
+def install_template_timer():
+    """
+    Wraps Template.render for the process, once, from CoreConfig.ready() and
+    only if instrumentation is enabled. Outside an instrumented request the
+    wrapper is a ContextVar lookup and a plain call.
+    """
+    if get_setting('ENABLED') and template_base.Template.render is _original_template_render:
+        template_base.Template.render = _timed_template_render
+
+
+class InstrumentationMiddleware:
+    """
+    Measures query count, DB time, template render time and total time per
+    request, and reports them as a Server-Timing header, a JSON log line and
+    per-URL-name histograms (see core/instrumentation.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not get_setting('ENABLED'):
+            return self.get_response(request)
+
+        timings, token, started = self.start()
+        try:
+            # Django renders TemplateResponse/DRF responses inside get_response,
+            # so their render time is included.
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        if not get_setting('ENABLED'):
+            return await self.get_response(request)
+
+        timings, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, started)
+
+    def start(self):
+        # Connections opened before this module was imported missed the signal.
+        for connection in connections.all(initialized_only=True):
+            _install_wrapper(connection)
+        timings = RequestTimings()
+        return timings, _current.set(timings), time.perf_counter()
+
+    def finish(self, request, response, timings, started):
+        total = (time.perf_counter() - started) * 1000
+        db, template = timings.db * 1000, timings.template * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        name = (match.view_name if match else None) or 'unresolved'
+        registry.record(name, total, db, timings.queries, not_modified=response.status_code == 304)
+        registry.maybe_flush()
+
+        if get_setting('SERVER_TIMING'):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={db:.1f};desc="{timings.queries} queries"',
+                f'tpl;dur={template:.1f}',
+                f'app;dur={max(total - db - template, 0):.1f}',
+                f'total;dur={total:.1f}',
+            ])
+        if get_setting('LOG'):
+            logger.info(json.dumps({
+                'event': 'request',
+                'view': name,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': timings.queries,
+                'db_ms': round(db, 2),
+                'template_ms': round(template, 2),
+                'total_ms': round(total, 2),
+            }))
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Pins the user to the primary database after any unsafe request, so their
+    next reads see what they just wrote (see core/routers.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        await sync_to_async(self.pin)(request)
+        return response
+
+    def pin(self, request):
+        if request.method in ('GET', 'HEAD', 'OPTIONS', 'TRACE') or not routers.has_replica():
+            return
+        # Set by AuthenticationMiddleware, or by DRF for token-authenticated calls.
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            routers.pin(user.pk)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_profile"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "date_time", "id"], name="core_tx_user_dt_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_rollups(apps, schema_editor):
+    Transaction = apps.get_model("core", "Transaction")
+    MonthlyRollup = apps.get_model("core", "MonthlyRollup")
+    grouped = (
+        Transaction.objects.annotate(
+            year=ExtractYear("date_time"), month=ExtractMonth("date_time")
+        )
+        .values("user_id", "year", "month", "category", "type")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+    MonthlyRollup.objects.bulk_create(
+        [MonthlyRollup(**row) for row in grouped], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_transaction_user_date_time_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.IntegerField()),
+                ("month", models.IntegerField()),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("Food", "Food"),
+                            ("Transport", "Transport"),
+                            ("Rent", "Rent"),
+                            ("Shopping", "Shopping"),
+                            ("Health", "Health"),
+                            ("Other", "Other"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("Income", "Income"), ("Expense", "Expense")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "year", "month", "category", "type"),
+                        name="core_rollup_unique_key",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
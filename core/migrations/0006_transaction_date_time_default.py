@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_monthlyrollup"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="transaction",
+            name="date_time",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def drop_duplicate_recurring(apps, schema_editor):
+    # The old detector could store a merchant more than once per user. Keep
+    # the most recently detected row of each so the constraint can be added.
+    RecurringExpense = apps.get_model("core", "RecurringExpense")
+    duplicated = (
+        RecurringExpense.objects.values("user_id", "merchant")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in list(duplicated):
+        rows = RecurringExpense.objects.filter(
+            user_id=group["user_id"], merchant=group["merchant"]
+        )
+        keep = rows.order_by("-last_detected", "-id").values_list("id", flat=True).first()
+        rows.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_transaction_date_time_default"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Checkpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("position", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(drop_duplicate_recurring, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="recurringexpense",
+            constraint=models.UniqueConstraint(
+                fields=("user", "merchant"), name="core_recurring_user_merchant"
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core import search
+
+
+def install_fulltext(apps, schema_editor):
+    search.install(schema_editor.connection)
+
+
+def uninstall_fulltext(apps, schema_editor):
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_recurring_unique_merchant_checkpoint"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "type", "date_time", "id"],
+                name="core_tx_user_type_dt_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "category", "date_time", "id"],
+                name="core_tx_user_cat_dt_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "status", "date_time", "id"],
+                name="core_tx_user_status_dt_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "payment_method", "date_time", "id"],
+                name="core_tx_user_pm_dt_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "is_auto_logged", "date_time", "id"],
+                name="core_tx_user_auto_dt_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "amount"], name="core_tx_user_amount_idx"
+            ),
+        ),
+        migrations.RunPython(install_fulltext, uninstall_fulltext),
+    ]
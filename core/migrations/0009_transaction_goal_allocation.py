@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def keep_saved_amounts(apps, schema_editor):
+    # Whatever was saved so far predates allocations.
+    Goal = apps.get_model("core", "Goal")
+    Goal.objects.update(initial_amount=F("saved_amount"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_transaction_filter_indexes_fulltext"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="goal",
+            name="initial_amount",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="goal",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="transactions",
+                to="core.goal",
+            ),
+        ),
+        migrations.RunPython(keep_saved_amounts, migrations.RunPython.noop),
+    ]
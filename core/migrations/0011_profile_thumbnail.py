@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="thumbnail",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
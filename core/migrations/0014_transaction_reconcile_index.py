@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_sync_updated_at_tombstone"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "status", "amount", "date_time"],
+                name="core_tx_user_st_amt_dt_idx",
+            ),
+        ),
+    ]
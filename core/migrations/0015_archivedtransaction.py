@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_transaction_reconcile_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedTransaction",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("Income", "Income"), ("Expense", "Expense")],
+                        max_length=10,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("Food", "Food"),
+                            ("Transport", "Transport"),
+                            ("Rent", "Rent"),
+                            ("Shopping", "Shopping"),
+                            ("Health", "Health"),
+                            ("Other", "Other"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("description", models.TextField(blank=True)),
+                ("payment_method", models.CharField(default="UPI", max_length=50)),
+                ("date_time", models.DateTimeField()),
+                ("is_auto_logged", models.BooleanField(default=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("Pending", "Pending"), ("Paid", "Paid")],
+                        default="Paid",
+                        max_length=10,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "goal",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_transactions",
+                        to="core.goal",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "date_time", "id"],
+                        name="core_archtx_user_dt_id_idx",
+                    )
+                ],
+            },
+        ),
+    ]
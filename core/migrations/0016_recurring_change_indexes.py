@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_archivedtransaction"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(fields=["deleted_at"], name="core_tomb_deleted_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["updated_at"], name="core_tx_updated_idx"),
+        ),
+    ]
@@ -1,6 +1,7 @@
 ### core/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 TRANSACTION_TYPES = (
     ('Income', 'Income'),
@@ -28,19 +29,80 @@ class Transaction(models.Model):
     category = models.CharField(choices=CATEGORIES, max_length=50)
     description = models.TextField(blank=True)
     payment_method = models.CharField(max_length=50, default='UPI')
-    date_time = models.DateTimeField(auto_now_add=True)
+    date_time = models.DateTimeField(default=timezone.now)  # settable so imports keep bank dates
     is_auto_logged = models.BooleanField(default=False)
     status = models.CharField(choices=STATUS_CHOICES, max_length=10, default='Paid')
+    # Savings allocated to a goal count towards its saved_amount (core/goals.py)
+    goal = models.ForeignKey('Goal', null=True, blank=True, on_delete=models.SET_NULL, related_name='transactions')
+    updated_at = models.DateTimeField(auto_now=True)  # queryset.update() callers set it themselves
+
+    class Meta:
+        indexes = [
+            # Backs the /sync/ change feed in core/sync.py
+            models.Index(fields=['user', 'updated_at', 'id'], name='core_tx_user_updated_idx'),
+            # Rows changed since the last incremental run of core/recurring.py, across users
+            models.Index(fields=['updated_at'], name='core_tx_updated_idx'),
+            # Backs the newest-first keyset pagination in core/pagination.py
+            models.Index(fields=['user', 'date_time', 'id'], name='core_tx_user_dt_id_idx'),
+            # One per list filter in core/filters.py; the trailing (date_time, id)
+            # keeps filtered pages in keyset order without a sort.
+            models.Index(fields=['user', 'type', 'date_time', 'id'], name='core_tx_user_type_dt_idx'),
+            models.Index(fields=['user', 'category', 'date_time', 'id'], name='core_tx_user_cat_dt_idx'),
+            models.Index(fields=['user', 'status', 'date_time', 'id'], name='core_tx_user_status_dt_idx'),
+            models.Index(fields=['user', 'payment_method', 'date_time', 'id'], name='core_tx_user_pm_dt_idx'),
+            models.Index(fields=['user', 'is_auto_logged', 'date_time', 'id'], name='core_tx_user_auto_dt_idx'),
+            models.Index(fields=['user', 'amount'], name='core_tx_user_amount_idx'),
+            # Pending UPI payments by amount and time, for core/reconciliation.py
+            models.Index(fields=['user', 'status', 'amount', 'date_time'], name='core_tx_user_st_amt_dt_idx'),
+        ]
 
     def __str__(self):
         return f'{self.type} - ₹{self.amount} - {self.category}'
 
+    def save(self, *args, **kwargs):
+        # Rollup signal handlers must commit or roll back together with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class ArchivedTransaction(models.Model):
+    # Cold store for transactions past the archive horizon (core/archive.py).
+    # Same columns and ids as Transaction, so list filters, serializers and
+    # exports work on both; read-only, with a single index for keyset scans.
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)  # leads the index below
+    type = models.CharField(choices=TRANSACTION_TYPES, max_length=10)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    category = models.CharField(choices=CATEGORIES, max_length=50)
+    description = models.TextField(blank=True)
+    payment_method = models.CharField(max_length=50, default='UPI')
+    date_time = models.DateTimeField()
+    is_auto_logged = models.BooleanField(default=False)
+    status = models.CharField(choices=STATUS_CHOICES, max_length=10, default='Paid')
+    goal = models.ForeignKey('Goal', null=True, blank=True, on_delete=models.SET_NULL,
+                             related_name='archived_transactions')
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date_time', 'id'], name='core_archtx_user_dt_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.type} - ₹{self.amount} - {self.category} (archived)'
+
 class Budget(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.CharField(choices=CATEGORIES, max_length=50)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     month = models.IntegerField()
     year = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='core_budget_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.category} - {self.month}/{self.year}'
@@ -49,8 +111,16 @@ class Goal(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=100)
     target_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Saved before any transaction was allocated; saved_amount = this + allocations
+    initial_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     saved_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     deadline = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)  # queryset.update() callers set it themselves
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='core_goal_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f'{self.title} - Target: ₹{self.target_amount}'
@@ -63,6 +133,12 @@ class RecurringExpense(models.Model):
     next_due_date = models.DateField()
     last_detected = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # One row per merchant per user; lets core/recurring.py upsert in bulk
+            models.UniqueConstraint(fields=['user', 'merchant'], name='core_recurring_user_merchant'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.merchant} ({self.frequency})"
     
@@ -73,6 +149,109 @@ from django.contrib.auth.models import User
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profile_image = models.ImageField(upload_to='images/', default='images/profile.png')
+    # Name stem of the WebP/JPEG renditions of profile_image (core/thumbnails.py)
+    thumbnail = models.CharField(max_length=64, blank=True)
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
+
+    @property
+    def thumbnail_urls(self):
+        from .thumbnails import urls
+        return urls(self.thumbnail)
+
+
+class MonthlyRollup(models.Model):
+    # Per-user monthly totals kept in step with Transaction (see core/rollups.py)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    category = models.CharField(choices=CATEGORIES, max_length=50)
+    type = models.CharField(choices=TRANSACTION_TYPES, max_length=10)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'year', 'month', 'category', 'type'],
+                name='core_rollup_unique_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} - {self.month}/{self.year} - {self.type} {self.category}: ₹{self.total}'
+
+
+class Checkpoint(models.Model):
+    # Named high-water marks for incremental background work (e.g. last Transaction id scanned)
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} @ {self.position}'
+
+
+JOB_STATUSES = (
+    ('Queued', 'Queued'),
+    ('Running', 'Running'),
+    ('Done', 'Done'),
+    ('Failed', 'Failed'),
+)
+
+class Job(models.Model):
+    # Background work queued for `manage.py run_jobs` (see core/jobs.py)
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)  # keyword arguments for the handler
+    status = models.CharField(choices=JOB_STATUSES, max_length=10, default='Queued')
+    run_at = models.DateTimeField(default=timezone.now)  # not picked up before this
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest due jobs: status = 'Queued' AND run_at <= now
+            models.Index(fields=['status', 'run_at', 'id'], name='core_job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+
+class Watermark(models.Model):
+    # When a user's data behind a list endpoint last changed (core/watermarks.py)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    resource = models.CharField(max_length=20)
+    modified_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'resource'], name='core_watermark_user_resource'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} - {self.resource} @ {self.modified_at}'
+
+
+class Tombstone(models.Model):
+    # Left behind by a deleted Transaction/Budget/Goal for the /sync/ feed (core/sync.py)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    resource = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'], name='core_tomb_user_deleted_idx'),
+            # Deletes since the last incremental recurring run; pruning
+            models.Index(fields=['deleted_at'], name='core_tomb_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} - {self.resource} #{self.object_id} deleted {self.deleted_at}'
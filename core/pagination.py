@@ -0,0 +1,143 @@
+import base64
+import heapq
+from collections import namedtuple
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Keyset pagination over (date_time, id), newest first. Every page is a single
+# range scan on the (user, date_time, id) index, so deep pages cost the same as
+# the first one.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'previous_cursor'])
+
+
+def encode_cursor(date_time, pk, reverse=False):
+    raw = f"{'r' if reverse else 'f'}|{date_time.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (reverse, date_time, pk); raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, date_time, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        if direction not in ('f', 'r'):
+            raise ValueError(direction)
+        return direction == 'r', datetime.fromisoformat(date_time), int(pk)
+    except (TypeError, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from exc
+
+
+def _position(row):
+    # Rows are model instances, or dicts from the values() list path.
+    if isinstance(row, dict):
+        return row['date_time'], row['id']
+    return row.date_time, row.pk
+
+
+def _seek(queryset, cursor_position, reverse):
+    if cursor_position is None:
+        return queryset.order_by('-date_time', '-id')
+    date_time, pk = cursor_position
+    if reverse:
+        # Walking back towards newer rows: scan ascending, flip afterwards.
+        return queryset.filter(
+            Q(date_time__gt=date_time) | Q(date_time=date_time, id__gt=pk),
+            date_time__gte=date_time,
+        ).order_by('date_time', 'id')
+    return queryset.filter(
+        Q(date_time__lt=date_time) | Q(date_time=date_time, id__lt=pk),
+        date_time__lte=date_time,
+    ).order_by('-date_time', '-id')
+
+
+def keyset_paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, others=()):
+    """
+    One page of `queryset`, newest first. `others` are querysets over the same
+    columns (the transaction archive) whose rows are merged into the pages.
+    """
+    reverse, cursor_position = False, None
+    if cursor:
+        reverse, *cursor_position = decode_cursor(cursor)
+
+    rows = list(_seek(queryset, cursor_position, reverse)[:page_size + 1])
+    for other in others:
+        other = _seek(other, cursor_position, reverse)
+        if len(rows) > page_size:
+            # Only rows ahead of the last one fetched can make the page.
+            bound = _position(rows[-1])[0]
+            other = other.filter(**{'date_time__lte' if reverse else 'date_time__gte': bound})
+        rows = list(heapq.merge(rows, other[:page_size + 1], key=_position, reverse=not reverse))[:page_size + 1]
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    next_cursor = previous_cursor = None
+    if rows:
+        first, last = _position(rows[0]), _position(rows[-1])
+        if has_more or reverse:
+            next_cursor = encode_cursor(*last)
+        if (has_more and reverse) or (cursor and not reverse):
+            previous_cursor = encode_cursor(*first, reverse=True)
+
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+class TransactionCursorPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    # Columns a values() queryset must include for the cursors to be built
+    key_fields = ('date_time', 'id')
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = get_page_size(request.query_params.get(self.page_size_query_param))
+        # Views may add querysets to merge in, e.g. the transaction archive.
+        others = view.get_merged_querysets(queryset) if hasattr(view, 'get_merged_querysets') else ()
+        try:
+            self.page = keyset_paginate(queryset, request.query_params.get(self.cursor_query_param), page_size, others)
+        except ValueError:
+            raise NotFound('Invalid cursor')
+        return self.page.items
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,219 @@
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Transaction
+from .recurring import merchant_key
+from .sms import get_parser
+from . import caching, watermarks
+
+# Settles the Pending UPI payments logged by generate_upi_page against
+# payment confirmations (parsed bank SMS, bank statement rows). A pending row
+# matches a confirmation with the same amount and payee that arrived within
+# WINDOW_HOURS after it (or EARLY_MINUTES before, for clock skew).
+#
+# A batch costs one query per AMOUNTS_PER_QUERY distinct amounts, each an
+# index range scan on (user, status, amount, date_time), whatever the number
+# of confirmations; matching is done in memory and the matched rows are
+# flipped to Paid with one UPDATE.
+
+DEFAULTS = {
+    'WINDOW_HOURS': 72,
+    'EARLY_MINUTES': 10,
+    'MAX_CONFIRMATIONS': 10000,
+}
+
+AMOUNTS_PER_QUERY = 500
+MAX_REPORTED_ITEMS = 1000
+CENT = Decimal('0.01')
+_AMOUNT_FIELD = Transaction._meta.get_field('amount')
+# Anything this large can't be a stored transaction amount, so can't match one.
+MAX_AMOUNT = Decimal(10) ** (_AMOUNT_FIELD.max_digits - _AMOUNT_FIELD.decimal_places)
+
+Confirmation = namedtuple('Confirmation', ['payee', 'amount', 'date_time'])
+
+
+def get_setting(name):
+    return getattr(settings, 'UPI_RECONCILIATION', {}).get(name, DEFAULTS[name])
+
+
+def payee_key(text):
+    """Comparable form of a payee: 'Pending GPay to Zomato' and 'zomato@ybl' both give 'zomato'."""
+    key = merchant_key(text or '')
+    return key.split('@', 1)[0] if '@' in key else key
+
+
+def same_payee(a, b):
+    # Banks shorten or extend names ("ZOMATO" vs "Zomato Ltd").
+    return bool(a and b) and (a in b or b in a)
+
+
+def _moment(value, name):
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        value = str(value or '').strip()
+        # Dates first: parse_datetime() also accepts '2024-03-02', as midnight.
+        try:
+            day = parse_date(value)
+            moment = None if day else parse_datetime(value)
+        except ValueError:  # well formed, but not a real date or time
+            day = moment = None
+        if day is not None:
+            # Statements often carry only the date; the payment happened
+            # some time that day, so the window counts back from its end.
+            moment = datetime.combine(day, time.max)
+        elif moment is None:
+            raise ValueError(f'{name} must be YYYY-MM-DD or an ISO 8601 date-time')
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def read_confirmation(item):
+    """
+    A Confirmation from {'payee', 'amount', 'date_time'} (or 'date'), or from
+    an SMS {'body', 'received_at'}. Raises ValueError if it can't be read.
+    """
+    if not isinstance(item, dict):
+        raise ValueError('Expected an object.')
+    if item.get('body'):
+        parsed = get_parser().parse(str(item['body']))
+        if parsed is None or parsed['type'] != 'Expense':
+            raise ValueError('Not a recognised payment SMS.')
+        item = {'payee': parsed['merchant'], 'amount': parsed['amount'], 'date_time': item.get('received_at')}
+        if not item['date_time']:
+            raise ValueError('received_at is required.')
+
+    payee = str(item.get('payee') or '').strip()
+    if not payee_key(payee):
+        raise ValueError('payee is required.')
+    try:
+        amount = Decimal(str(item.get('amount')).replace(',', ''))
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite() or amount <= 0:
+        raise ValueError('amount must be a positive number.')
+    if amount >= MAX_AMOUNT:
+        raise ValueError(f'amount must be less than {MAX_AMOUNT}.')
+    return Confirmation(payee, amount.quantize(CENT), _moment(item.get('date_time') or item.get('date'), 'date_time'))
+
+
+class ReconcileResult:
+    def __init__(self):
+        self.matched = 0
+        self.unmatched = 0
+        self.matches = []
+        self.unmatched_items = []
+
+    def add_match(self, item, transaction_id):
+        self.matched += 1
+        if len(self.matches) < MAX_REPORTED_ITEMS:
+            self.matches.append({'item': item, 'transaction': transaction_id})
+
+    def add_unmatched(self, item, reason, confirmation=None):
+        self.unmatched += 1
+        if len(self.unmatched_items) < MAX_REPORTED_ITEMS:
+            entry = {'item': item, 'reason': reason}
+            if confirmation is not None:
+                entry.update(payee=confirmation.payee, amount=str(confirmation.amount),
+                             date_time=confirmation.date_time.isoformat())
+            self.unmatched_items.append(entry)
+
+    def as_dict(self):
+        return {
+            'matched': self.matched,
+            'unmatched': self.unmatched,
+            'matches': self.matches,
+            'unmatched_items': self.unmatched_items,
+            'truncated': self.matched > len(self.matches) or self.unmatched > len(self.unmatched_items),
+        }
+
+
+def _pending(user, confirmations, window, early):
+    """{amount: [(date_time, id, payee key)] sorted by time} for the pending rows that could match."""
+    amounts = sorted({confirmation.amount for confirmation in confirmations})
+    since = min(confirmation.date_time for confirmation in confirmations) - window
+    until = max(confirmation.date_time for confirmation in confirmations) + early
+    candidates = defaultdict(list)
+    for start in range(0, len(amounts), AMOUNTS_PER_QUERY):
+        rows = (
+            Transaction.objects
+            .filter(user=user, status='Pending', amount__in=amounts[start:start + AMOUNTS_PER_QUERY],
+                    date_time__gte=since, date_time__lte=until)
+            .select_for_update()
+            .values_list('amount', 'date_time', 'id', 'description')
+        )
+        for amount, date_time, pk, description in rows:
+            candidates[amount].append((date_time, pk, payee_key(description)))
+    for rows in candidates.values():
+        rows.sort()
+    return candidates
+
+
+def take_batch(items):
+    """
+    A list of at most MAX_CONFIRMATIONS + 1 items from an iterable, so an
+    oversized upload is rejected by reconcile() without reading all of it.
+    """
+    return list(islice(items, get_setting('MAX_CONFIRMATIONS') + 1))
+
+
+def reconcile(user, items):
+    """
+    Matches confirmation dicts (see read_confirmation) against the user's
+    Pending transactions and marks the matched ones Paid. Items are reported
+    by 1-based position. Returns a ReconcileResult; raises ValueError for an
+    oversized batch.
+    """
+    if len(items) > get_setting('MAX_CONFIRMATIONS'):
+        raise ValueError(f"At most {get_setting('MAX_CONFIRMATIONS')} confirmations per batch.")
+    window = timedelta(hours=get_setting('WINDOW_HOURS'))
+    early = timedelta(minutes=get_setting('EARLY_MINUTES'))
+
+    confirmations, outcomes = {}, {}
+    for number, item in enumerate(items, start=1):
+        try:
+            confirmations[number] = read_confirmation(item)
+        except ValueError as exc:
+            outcomes[number] = (None, str(exc))
+
+    matched_ids = []
+    if confirmations:
+        with transaction.atomic():
+            candidates = _pending(user, confirmations.values(), window, early)
+            taken = set()
+            # Oldest confirmation first, each taking the oldest pending payment
+            # in its window: payments settle in the order they were made.
+            for number, confirmation in sorted(confirmations.items(), key=lambda entry: (entry[1].date_time, entry[0])):
+                rows = candidates.get(confirmation.amount, ())
+                payee = payee_key(confirmation.payee)
+                until = confirmation.date_time + early
+                outcomes[number] = (None, 'No pending payment matches.')
+                for date_time, pk, pending_payee in rows[bisect_left(rows, (confirmation.date_time - window,)):]:
+                    if date_time > until:
+                        break
+                    if pk not in taken and same_payee(payee, pending_payee):
+                        taken.add(pk)
+                        matched_ids.append(pk)
+                        outcomes[number] = (pk, None)
+                        break
+
+            if matched_ids:
+                Transaction.objects.filter(pk__in=matched_ids).update(status='Paid', updated_at=timezone.now())
+                caching.bump_on_commit(user.pk, caching.DASHBOARD, caching.TRANSACTIONS)
+                watermarks.touch(user.pk, watermarks.TRANSACTIONS)
+
+    result = ReconcileResult()
+    for number in sorted(outcomes):
+        match, reason = outcomes[number]
+        if match is None:
+            result.add_unmatched(number, reason, confirmations.get(number))
+        else:
+            result.add_match(number, match)
+    return result
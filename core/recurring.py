@@ -0,0 +1,254 @@
+import calendar
+import re
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Checkpoint, RecurringExpense, Tombstone, Transaction
+from . import caching, watermarks
+
+# Recurring expense detection. A user's Expense history is loaded as flat
+# arrays in one query, grouped by (user, merchant), and the inter-arrival
+# intervals and amounts of every group are reduced at once with bincount, so
+# the per-group Python work is limited to the merchants that actually recur.
+#
+# The incremental run re-evaluates every merchant of each user whose
+# transactions were added, edited (updated_at, which the queryset.update()
+# callers also set) or deleted (a Tombstone) since the checkpoint, the
+# updated_at it last read up to. It stops SETTLE_SECONDS short of now, so a
+# write stamped before the checkpoint but committed after it is still seen.
+# Moving rows to the archive (core/archive.py) leaves no such trace; the
+# nightly full run (JOBS['SCHEDULE']['recurring-full']) covers that.
+
+CHECKPOINT = 'recurring_detection_updated_at'  # microseconds since the epoch
+SETTLE_SECONDS = 60
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+Frequency = namedtuple('Frequency', ['name', 'days', 'tolerance', 'min_occurrences'])
+
+FREQUENCIES = (
+    Frequency('Weekly', 7.0, 2.0, 3),
+    Frequency('Monthly', 30.44, 5.0, 3),
+    Frequency('Yearly', 365.25, 20.0, 2),
+)
+MAX_INTERVAL_CV = 0.35  # spread of the gaps between payments, relative to their mean
+MAX_AMOUNT_CV = 0.5
+STALE_PERIODS = 2  # missed this many periods in a row -> no longer recurring
+USERS_PER_BATCH = 500
+
+# Prefixes written by generate_upi_page and the SMS parser ("GPay: Zomato", ...)
+MERCHANT_PREFIX = re.compile(r'^(?:pending\s+gpay\s+to|gpay:|bank:)\s*', re.I)
+
+Detection = namedtuple('Detection', ['user_id', 'merchant', 'frequency', 'average_amount', 'last_date'])
+
+
+def merchant_key(description):
+    """Normalises a transaction description to a merchant key ('' if there is none)."""
+    return ' '.join(MERCHANT_PREFIX.sub('', description).split()).lower()
+
+
+def _load(queryset):
+    """Returns (group codes, day numbers, amounts, [(user_id, merchant)] per code)."""
+    keys = {}
+    groups, labels = {}, []
+    codes, days, amounts = [], [], []
+    tz = timezone.get_current_timezone()
+    rows = queryset.filter(type='Expense').exclude(description='').values_list(
+        'user_id', 'description', 'amount', 'date_time',
+    )
+    for user_id, description, amount, date_time in rows.iterator(chunk_size=5000):
+        key = keys.get(description)
+        if key is None:
+            key = keys[description] = merchant_key(description)
+        if not key:
+            continue
+        code = groups.get((user_id, key))
+        if code is None:
+            code = groups[(user_id, key)] = len(labels)
+            labels.append((user_id, key))
+        codes.append(code)
+        days.append(date_time.astimezone(tz).toordinal())
+        amounts.append(amount)
+    return (
+        np.asarray(codes, dtype=np.int64),
+        np.asarray(days, dtype=np.float64),
+        np.asarray(amounts, dtype=np.float64),
+        labels,
+    )
+
+
+def _coefficient_of_variation(count, total, squares):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        variance = np.maximum(squares / count - mean ** 2, 0.0)
+        return mean, np.where(mean > 0, np.sqrt(variance) / mean, np.inf)
+
+
+def detect(queryset, today=None):
+    """Returns (detections, evaluated (user_id, merchant) pairs) for the transactions in `queryset`."""
+    codes, days, amounts, labels = _load(queryset)
+    if not labels:
+        return [], []
+    today = today or timezone.localdate()
+    size = len(labels)
+
+    order = np.lexsort((days, codes))
+    codes, days, amounts = codes[order], days[order], amounts[order]
+
+    occurrences = np.bincount(codes, minlength=size)
+    last_day = days[np.cumsum(occurrences) - 1]
+    mean_amount, amount_cv = _coefficient_of_variation(
+        occurrences, np.bincount(codes, amounts, size), np.bincount(codes, amounts ** 2, size),
+    )
+
+    same_group = codes[1:] == codes[:-1]
+    gaps = np.diff(days)[same_group]
+    gap_codes = codes[1:][same_group]
+    gap_count = np.bincount(gap_codes, minlength=size)
+    mean_gap, gap_cv = _coefficient_of_variation(
+        gap_count, np.bincount(gap_codes, gaps, size), np.bincount(gap_codes, gaps ** 2, size),
+    )
+
+    frequency_index = np.full(size, -1)
+    for index, frequency in enumerate(FREQUENCIES):
+        matches = (
+            (frequency_index < 0)
+            & (occurrences >= frequency.min_occurrences)
+            & (np.abs(mean_gap - frequency.days) <= frequency.tolerance)
+            & (gap_cv <= MAX_INTERVAL_CV)
+            & (amount_cv <= MAX_AMOUNT_CV)
+            & (today.toordinal() - last_day <= frequency.days * STALE_PERIODS)
+        )
+        frequency_index[matches] = index
+
+    detections = []
+    for code in np.flatnonzero(frequency_index >= 0):
+        user_id, merchant = labels[code]
+        detections.append(Detection(
+            user_id, merchant, FREQUENCIES[frequency_index[code]],
+            Decimal(f'{mean_amount[code]:.2f}'),
+            date.fromordinal(int(last_day[code])),
+        ))
+    return detections, labels
+
+
+def add_period(day, frequency):
+    if frequency.name == 'Monthly':
+        year, month = divmod(day.month, 12)
+        year, month = day.year + year, month + 1
+        return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+    if frequency.name == 'Yearly':
+        year = day.year + 1
+        return day.replace(year=year, day=min(day.day, calendar.monthrange(year, day.month)[1]))
+    return day + timedelta(days=frequency.days)
+
+
+def next_due_date(detection, today):
+    due = add_period(detection.last_date, detection.frequency)
+    while due < today:
+        due = add_period(due, detection.frequency)
+    return due
+
+
+def save(detections, evaluated, today=None):
+    """Upserts detections and removes rows for evaluated merchants that no longer recur."""
+    today = today or timezone.localdate()
+    objects = [
+        RecurringExpense(
+            user_id=detection.user_id,
+            merchant=detection.merchant,
+            average_amount=detection.average_amount,
+            frequency=detection.frequency.name,
+            next_due_date=next_due_date(detection, today),
+        )
+        for detection in detections
+    ]
+    conflict_target = {}
+    if connection.features.supports_update_conflicts_with_target:
+        conflict_target['unique_fields'] = ['user', 'merchant']
+
+    detected = {(detection.user_id, detection.merchant) for detection in detections}
+    stale = {}
+    for user_id, merchant in evaluated:
+        if (user_id, merchant) not in detected:
+            stale.setdefault(user_id, []).append(merchant)
+
+    with transaction.atomic():
+        if objects:
+            RecurringExpense.objects.bulk_create(
+                objects,
+                batch_size=500,
+                update_conflicts=True,
+                update_fields=['average_amount', 'frequency', 'next_due_date', 'last_detected'],
+                **conflict_target,
+            )
+        for user_id, merchants in stale.items():
+            RecurringExpense.objects.filter(user_id=user_id, merchant__in=merchants).delete()
+        # bulk_create skips post_save, so invalidate cached dashboards here.
+        for user_id in {detection.user_id for detection in detections}:
+            caching.bump_on_commit(user_id, caching.DASHBOARD)
+    return len(objects)
+
+
+def _position(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def run_full(users=None, users_per_batch=USERS_PER_BATCH, now=None):
+    """Re-evaluates every merchant of every (or the given) user; returns (detected, evaluated)."""
+    settled = (now or timezone.now()) - timedelta(seconds=SETTLE_SECONDS)
+    user_ids = Transaction.objects.filter(type='Expense').values_list('user_id', flat=True).distinct().order_by('user_id')
+    if users is not None:
+        user_ids = user_ids.filter(user__in=users)
+    user_ids = list(user_ids)
+
+    # Users are processed in batches so memory stays bounded on a nightly run.
+    current = set()
+    evaluated = 0
+    for start in range(0, len(user_ids), users_per_batch):
+        batch = user_ids[start:start + users_per_batch]
+        detections, labels = detect(Transaction.objects.filter(user_id__in=batch))
+        save(detections, labels)
+        current.update((detection.user_id, detection.merchant) for detection in detections)
+        evaluated += len(labels)
+
+    # Merchants with no expenses left at all never show up in `labels`.
+    stale = RecurringExpense.objects.all() if users is None else RecurringExpense.objects.filter(user__in=users)
+    orphaned = [
+        pk for pk, user_id, merchant in stale.values_list('pk', 'user_id', 'merchant')
+        if (user_id, merchant) not in current
+    ]
+    RecurringExpense.objects.filter(pk__in=orphaned).delete()
+    if users is None:
+        Checkpoint.objects.update_or_create(name=CHECKPOINT, defaults={'position': _position(settled)})
+    return len(current), evaluated
+
+
+def run_incremental(users_per_batch=USERS_PER_BATCH, now=None):
+    """
+    Re-evaluates the users whose transactions changed since the last run (all
+    users on the first run); returns (detected, evaluated).
+    """
+    now = now or timezone.now()
+    checkpoint = Checkpoint.objects.filter(name=CHECKPOINT).first()
+    if checkpoint is None:
+        return run_full(users_per_batch=users_per_batch, now=now)
+    since = EPOCH + timedelta(microseconds=checkpoint.position)
+    settled = now - timedelta(seconds=SETTLE_SECONDS)
+    if settled <= since:
+        return 0, 0
+
+    changed = Transaction.objects.filter(updated_at__gt=since, updated_at__lte=settled)
+    deleted = Tombstone.objects.filter(
+        resource=watermarks.TRANSACTIONS, deleted_at__gt=since, deleted_at__lte=settled,
+    )
+    user_ids = set(changed.order_by().values_list('user_id', flat=True).distinct())
+    user_ids.update(deleted.order_by().values_list('user_id', flat=True).distinct())
+    result = run_full(sorted(user_ids), users_per_batch) if user_ids else (0, 0)
+    checkpoint.position = _position(settled)
+    checkpoint.save(update_fields=['position', 'updated_at'])
+    return result
@@ -0,0 +1,158 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import ArchivedTransaction, MonthlyRollup, Transaction
+
+# Monthly (user, year, month, category, type) totals. The signal handlers in
+# core/signals.py apply deltas here on every Transaction save/delete, so the
+# dashboard and budget pages read O(categories) rows instead of scanning
+# Transaction. Months are bucketed in the project's TIME_ZONE.
+#
+# Batches (imports, bulk edits) add their deltas with one INSERT ... ON
+# CONFLICT / ON DUPLICATE KEY UPDATE per UPSERT_ROWS keys rather than an
+# UPDATE per key, leaning on the unique (user, year, month, category, type)
+# constraint.
+
+UPSERT_ROWS = 100  # 7 parameters a row, under SQLite's 999
+
+ROLLUP_FIELDS = ('user_id', 'date_time', 'category', 'type', 'amount')
+
+
+def rollup_key(user_id, date_time, category, type, tz=None):
+    local = timezone.localtime(date_time, tz) if timezone.is_aware(date_time) else date_time
+    return user_id, local.year, local.month, category, type
+
+
+def apply_delta(key, amount, count):
+    user_id, year, month, category, type = key
+    updated = MonthlyRollup.objects.filter(
+        user_id=user_id, year=year, month=month, category=category, type=type,
+    ).update(total=F('total') + amount, count=F('count') + count)
+    # Removals always hit an existing row, and must not recreate one for a user
+    # whose rollups were already cascade-deleted.
+    if not updated and count > 0:
+        rollup, created = MonthlyRollup.objects.get_or_create(
+            user_id=user_id, year=year, month=month, category=category, type=type,
+            defaults={'total': amount, 'count': count},
+        )
+        if not created:
+            MonthlyRollup.objects.filter(pk=rollup.pk).update(
+                total=F('total') + amount, count=F('count') + count,
+            )
+
+
+def apply_transaction(values, sign=1):
+    """Adds (sign=1) or removes (sign=-1) one transaction given as a dict of ROLLUP_FIELDS."""
+    key = rollup_key(values['user_id'], values['date_time'], values['category'], values['type'])
+    apply_delta(key, Decimal(values['amount']) * sign, sign)
+
+
+def _upsert_sql(connection, rows):
+    table = connection.ops.quote_name(MonthlyRollup._meta.db_table)
+    total, count = connection.ops.quote_name('total'), connection.ops.quote_name('count')
+    columns = ', '.join(connection.ops.quote_name(name) for name in (
+        'user_id', 'year', 'month', 'category', 'type', 'total', 'count',
+    ))
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * rows)
+    if connection.vendor == 'mysql':
+        return (f'INSERT INTO {table} ({columns}) VALUES {values} ON DUPLICATE KEY UPDATE '
+                f'{total} = {total} + VALUES({total}), {count} = {count} + VALUES({count})')
+    key = ', '.join(connection.ops.quote_name(name) for name in ('user_id', 'year', 'month', 'category', 'type'))
+    return (f'INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT ({key}) DO UPDATE SET '
+            f'{total} = {table}.{total} + excluded.{total}, {count} = {table}.{count} + excluded.{count}')
+
+
+def add_many(deltas):
+    """Adds {key: (amount, count)} deltas, creating missing rows, in one upsert per UPSERT_ROWS keys."""
+    connection = connections[router.db_for_write(MonthlyRollup)]
+    if connection.vendor not in ('sqlite', 'postgresql', 'mysql'):
+        for key, (amount, count) in deltas.items():
+            apply_delta(key, amount, count)
+        return
+    items = list(deltas.items())
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), UPSERT_ROWS):
+            batch = items[start:start + UPSERT_ROWS]
+            params = [value for key, (amount, count) in batch for value in (*key, amount, count)]
+            cursor.execute(_upsert_sql(connection, len(batch)), params)
+
+
+def apply_many(rows, sign=1):
+    """Like apply_transaction for a batch of dicts, with one statement per UPSERT_ROWS affected keys."""
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    tz = timezone.get_current_timezone()
+    for values in rows:
+        key = rollup_key(values['user_id'], values['date_time'], values['category'], values['type'], tz)
+        deltas[key][0] += Decimal(values['amount'])
+        deltas[key][1] += 1
+    if sign > 0:
+        add_many(deltas)
+        return
+    # Removals go through apply_delta, which never recreates a row.
+    for key, (amount, count) in deltas.items():
+        apply_delta(key, -amount, -count)
+
+
+def rebuild(user=None):
+    """
+    Recomputes rollups from scratch (hot and archived transactions), for every
+    user or just one. Returns rows written.
+    """
+    sources = [Transaction.objects.all(), ArchivedTransaction.objects.all()]
+    rollups = MonthlyRollup.objects.all()
+    if user is not None:
+        sources = [source.filter(user=user) for source in sources]
+        rollups = rollups.filter(user=user)
+
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    for source in sources:
+        grouped = (
+            source
+            .annotate(year=ExtractYear('date_time'), month=ExtractMonth('date_time'))
+            .values_list('user_id', 'year', 'month', 'category', 'type')
+            .annotate(total=Sum('amount'), count=Count('id'))
+            .order_by()
+        )
+        for *key, total, count in grouped.iterator():
+            totals[tuple(key)][0] += total
+            totals[tuple(key)][1] += count
+
+    fields = ('user_id', 'year', 'month', 'category', 'type')
+    with transaction.atomic():
+        rollups.delete()
+        created = MonthlyRollup.objects.bulk_create(
+            (MonthlyRollup(**dict(zip(fields, key)), total=total, count=count) for key, (total, count) in totals.items()),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def month_totals(user, year, month):
+    """Returns {'Income': Decimal, 'Expense': Decimal} for one month."""
+    totals = {'Income': Decimal('0'), 'Expense': Decimal('0')}
+    rows = (
+        MonthlyRollup.objects
+        .filter(user=user, year=year, month=month)
+        .values('type')
+        .annotate(total=Sum('total'))
+        .order_by()
+    )
+    for row in rows:
+        totals[row['type']] = row['total']
+    return totals
+
+
+def category_totals(user, year, month, type='Expense'):
+    """Returns {category: Decimal} for one month, largest first."""
+    rows = (
+        MonthlyRollup.objects
+        .filter(user=user, year=year, month=month, type=type, count__gt=0)
+        .order_by('-total')
+        .values_list('category', 'total')
+    )
+    return dict(rows)
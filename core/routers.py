@@ -0,0 +1,115 @@
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Read-replica routing. Writes always go to the primary. Reads go to the
+# 'replica' alias (settings.DATABASES, configured from the environment) only
+# inside a replica_reads() block: the list endpoints and the dashboard, on
+# GET/HEAD. Everything else, including get_or_create() and select_for_update(),
+# stays on the primary.
+#
+# Replication lags, so a user who just wrote is pinned to the primary for
+# STICKY_SECONDS: ReplicaStickinessMiddleware pins after any unsafe request,
+# and caching.bump_version()/watermarks.touch() pin on writes made outside a
+# request (jobs, commands), since a list or dashboard built from a stale
+# replica would otherwise be cached under the new version or ETag.
+# Without a 'replica' alias all of this is a no-op.
+
+REPLICA = 'replica'
+
+DEFAULTS = {
+    'STICKY_SECONDS': 10,
+}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def get_setting(name):
+    return getattr(settings, 'DATABASE_REPLICA', {}).get(name, DEFAULTS[name])
+
+
+def has_replica():
+    return REPLICA in connections.settings
+
+
+def pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def pin(user_id):
+    """Keeps the user's reads on the primary for STICKY_SECONDS."""
+    if has_replica() and user_id is not None:
+        cache.set(pin_key(user_id), 1, get_setting('STICKY_SECONDS'))
+
+
+def is_pinned(user_id):
+    return cache.get(pin_key(user_id)) is not None
+
+
+async def ais_pinned(user_id):
+    return await cache.aget(pin_key(user_id)) is not None
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _safe(request):
+    return request.method in ('GET', 'HEAD')
+
+
+def use_replica(view):
+    """
+    Decorator for function views (sync or async) whose GET/HEAD reads may go
+    to the replica, unless the user is pinned to the primary.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            enabled = has_replica() and _safe(request) and not await ais_pinned(user.pk)
+            with replica_reads(enabled):
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            enabled = has_replica() and _safe(request) and not is_pinned(request.user.pk)
+            with replica_reads(enabled):
+                return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaListMixin:
+    """For viewsets: list() reads from the replica as use_replica() describes."""
+
+    def list(self, request, *args, **kwargs):
+        enabled = has_replica() and _safe(request) and not is_pinned(request.user.pk)
+        with replica_reads(enabled):
+            return super().list(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return REPLICA if _replica_reads.get() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Not the instance's own alias: objects read from the replica are
+        # saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication.
+        return db != REPLICA
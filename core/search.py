@@ -0,0 +1,127 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Full-text search on Transaction.description.
+#
+# SQLite: an external-content FTS5 table (core_transaction_fts) indexes the
+# description column by rowid = transaction id. Triggers on core_transaction
+# keep it in step, so bulk_create, queryset.update() and raw SQL are covered.
+# MySQL: a FULLTEXT index on description, queried with MATCH ... AGAINST in
+# boolean mode. Other backends fall back to icontains per term. Archived
+# transactions (core/archive.py) are matched by regex on word prefixes.
+#
+# SQLite rebuilds a table, dropping its triggers, whenever a migration alters
+# it in a way ALTER TABLE can't express; restore_triggers() runs on
+# post_migrate to put them back. Ids and descriptions survive the rebuild, so
+# the index itself stays valid.
+
+FTS_TABLE = 'core_transaction_fts'
+FULLTEXT_INDEX = 'core_tx_description_ft'
+MAX_TERMS = 8
+
+SQLITE_TRIGGERS = {
+    'core_transaction_fts_ai': (
+        "AFTER INSERT ON core_transaction BEGIN "
+        "INSERT INTO core_transaction_fts(rowid, description) VALUES (new.id, new.description); END"
+    ),
+    'core_transaction_fts_ad': (
+        "AFTER DELETE ON core_transaction BEGIN "
+        "INSERT INTO core_transaction_fts(core_transaction_fts, rowid, description) "
+        "VALUES ('delete', old.id, old.description); END"
+    ),
+    'core_transaction_fts_au': (
+        "AFTER UPDATE OF description ON core_transaction BEGIN "
+        "INSERT INTO core_transaction_fts(core_transaction_fts, rowid, description) "
+        "VALUES ('delete', old.id, old.description); "
+        "INSERT INTO core_transaction_fts(rowid, description) VALUES (new.id, new.description); END"
+    ),
+}
+
+
+def _fts_table_exists(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+    return cursor.fetchone() is not None
+
+
+def _create_triggers(cursor):
+    for name, body in SQLITE_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def install(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            if not _fts_table_exists(cursor):
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    "description, content='core_transaction', content_rowid='id')"
+                )
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            _create_triggers(cursor)
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT 1 FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'core_transaction' AND index_name = %s",
+                [FULLTEXT_INDEX],
+            )
+            if cursor.fetchone() is None:
+                cursor.execute(f"ALTER TABLE core_transaction ADD FULLTEXT INDEX {FULLTEXT_INDEX} (description)")
+
+
+def restore_triggers(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if _fts_table_exists(cursor):
+            _create_triggers(cursor)
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'mysql':
+            cursor.execute(f"ALTER TABLE core_transaction DROP INDEX {FULLTEXT_INDEX}")
+
+
+def search_terms(text):
+    return re.findall(r'\w+', text.lower())[:MAX_TERMS]
+
+
+def search(queryset, text):
+    """
+    Narrows a Transaction (or ArchivedTransaction) queryset to rows whose
+    description has every term (prefix match).
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+    if queryset.model._meta.db_table != 'core_transaction':
+        # The transaction archive has no index: scan it for the same word
+        # prefixes, within the user's rows.
+        condition = Q()
+        for term in terms:
+            condition &= Q(description__iregex=rf'(^|\W){term}')
+        return queryset.filter(condition)
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        )
+    if vendor == 'mysql':
+        match = ' '.join(f'+{term}*' for term in terms)
+        table = queryset.model._meta.db_table
+        return queryset.alias(
+            relevance=RawSQL(f"MATCH (`{table}`.`description`) AGAINST (%s IN BOOLEAN MODE)", (match,),
+                             output_field=FloatField()),
+        ).filter(relevance__gt=0)
+    condition = Q()
+    for term in terms:
+        condition &= Q(description__icontains=term)
+    return queryset.filter(condition)
@@ -0,0 +1,163 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import Budget, Goal, Profile, RecurringExpense, Transaction
+from . import recurring, rollups
+
+# Deterministic synthetic data for local testing and benchmarks. Everything is
+# derived from one random.Random(seed) and written with bulk_create, so seeding
+# thousands of users takes seconds and the same seed always yields the same
+# shape of data relative to `anchor`.
+
+SPENDING = [
+    # (merchant description, category, low, high, weight)
+    ('GPay: Zomato', 'Food', 120, 900, 18),
+    ('GPay: Swiggy', 'Food', 100, 800, 16),
+    ('Bank: Big Bazaar', 'Shopping', 300, 4000, 6),
+    ('GPay: Amazon', 'Shopping', 200, 6000, 8),
+    ('GPay: Flipkart', 'Shopping', 200, 5000, 5),
+    ('GPay: Uber', 'Transport', 80, 700, 12),
+    ('GPay: Ola', 'Transport', 60, 600, 10),
+    ('Bank: Apollo Pharmacy', 'Health', 100, 2500, 4),
+    ('GPay: PharmEasy', 'Health', 150, 1800, 3),
+    ('GPay: Chai Point', 'Food', 30, 200, 12),
+    ('', 'Other', 50, 3000, 6),
+]
+SUBSCRIPTIONS = [
+    # (description, category, amount, every n days)
+    ('GPay: Netflix', 'Other', Decimal('649.00'), 30),
+    ('GPay: Cult Fit', 'Health', Decimal('250.00'), 7),
+    ('Bank: Landlord Rent', 'Rent', Decimal('18000.00'), 30),
+]
+GOAL_TITLES = ['Emergency fund', 'New laptop', 'Goa trip', 'Bike', 'Wedding gift']
+SEED_PASSWORD = 'password'
+
+
+def _at(day, rng):
+    return timezone.make_aware(datetime.combine(day, time(rng.randint(7, 22), rng.randint(0, 59), rng.randint(0, 59))))
+
+
+def _transactions(user, count, anchor, rng):
+    days = 365
+    rows = []
+    # Salary and subscriptions first, so they are always part of the history.
+    for month in range(12):
+        payday = anchor - timedelta(days=30 * month + 2)
+        rows.append(Transaction(
+            user=user, type='Income', category='Other', description='Bank: Salary',
+            amount=Decimal(rng.randint(40, 120) * 1000), date_time=_at(payday, rng),
+        ))
+    for description, category, amount, every in SUBSCRIPTIONS:
+        offset = rng.randint(0, every - 1)
+        for day in range(offset, days, every):
+            rows.append(Transaction(
+                user=user, type='Expense', category=category, description=description,
+                amount=amount, date_time=_at(anchor - timedelta(days=day), rng),
+            ))
+
+    weights = [spend[4] for spend in SPENDING]
+    for _ in range(max(count - len(rows), 0)):
+        description, category, low, high, _ = rng.choices(SPENDING, weights)[0]
+        pending = rng.random() < 0.03
+        rows.append(Transaction(
+            user=user, type='Expense', category=category, description=description,
+            amount=Decimal(rng.randint(low * 100, high * 100)) / 100,
+            date_time=_at(anchor - timedelta(days=rng.randint(0, days - 1)), rng),
+            is_auto_logged=pending or rng.random() < 0.4,
+            status='Pending' if pending else 'Paid',
+        ))
+    return rows[:count]
+
+
+def _budgets(user, anchor, rng):
+    rows = []
+    for offset in range(6):
+        index = anchor.year * 12 + anchor.month - 1 - offset
+        year, month = index // 12, index % 12 + 1
+        for category in ('Food', 'Transport', 'Shopping', 'Health', 'Rent'):
+            rows.append(Budget(
+                user=user, category=category, year=year, month=month,
+                amount=Decimal(rng.choice([2000, 3000, 5000, 8000, 20000])),
+            ))
+    return rows
+
+
+def _goals(user, anchor, rng):
+    goals = []
+    for title in rng.sample(GOAL_TITLES, 3):
+        saved = Decimal(rng.randint(0, 10) * 1000)
+        goals.append(Goal(
+            user=user, title=title,
+            target_amount=Decimal(rng.randint(10, 200) * 1000),
+            initial_amount=saved, saved_amount=saved,
+            deadline=anchor + timedelta(days=rng.randint(60, 720)),
+        ))
+    return goals
+
+
+def _recurring(user, anchor):
+    rows = []
+    for description, _, amount, every in SUBSCRIPTIONS:
+        rows.append(RecurringExpense(
+            user=user, merchant=recurring.merchant_key(description), average_amount=amount,
+            frequency='Weekly' if every == 7 else 'Monthly',
+            next_due_date=anchor + timedelta(days=every),
+        ))
+    return rows
+
+
+def seed(users, transactions_per_user, seed=0, prefix='demo', anchor=None):
+    """
+    Creates `users` users named <prefix><n> (existing names are skipped) with
+    their transactions, budgets, goals, recurring expenses and API tokens.
+    Returns the list of created users.
+    """
+    rng = random.Random(seed)
+    anchor = anchor or timezone.localdate()
+    usernames = [f'{prefix}{index}' for index in range(users)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    password = make_password(SEED_PASSWORD)
+
+    with transaction.atomic():
+        created = User.objects.bulk_create([
+            User(username=username, email=f'{username}@example.com', password=password)
+            for username in usernames if username not in existing
+        ])
+        # bulk_create skips post_save, so create what the signal would have.
+        created = list(User.objects.filter(username__in=[user.username for user in created]).order_by('id'))
+        Profile.objects.bulk_create([Profile(user=user) for user in created])
+        Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in created])
+
+        for user in created:
+            Transaction.objects.bulk_create(_transactions(user, transactions_per_user, anchor, rng), batch_size=1000)
+            Budget.objects.bulk_create(_budgets(user, anchor, rng))
+            Goal.objects.bulk_create(_goals(user, anchor, rng))
+            RecurringExpense.objects.bulk_create(_recurring(user, anchor))
+            rollups.rebuild(user=user)
+    return created
+
+
+@contextmanager
+def throwaway_database():
+    """
+    Runs the block against a freshly migrated test database (in-memory on
+    SQLite), so benchmarks never write to the configured one.
+    """
+    setup_test_environment(debug=False)
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
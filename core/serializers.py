@@ -1,34 +1,178 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
 from .models import *
+from .goals import projected_completion
+from . import thumbnails
 from django.contrib.auth.models import User
 
-class TransactionSerializer(serializers.ModelSerializer):
+
+# ──────── Sparse fieldsets & values() fast path ──────── #
+
+class SparseFieldsMixin:
+    """Limits GET output to the comma separated field names in ?fields=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        names = {name.strip() for name in requested.split(',') if name.strip()}
+        unknown = names - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        for name in set(self.fields) - names:
+            self.fields.pop(name)
+
+
+# Fields whose to_representation returns values() output unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.ReadOnlyField, serializers.CharField, serializers.ChoiceField,
+    serializers.IntegerField, serializers.BooleanField,
+)
+
+
+def values_lookups(serializer):
+    """
+    Returns {field_name: values() lookup} for the serializer's readable fields,
+    or None when one of them cannot be read from a values() row.
+    """
+    lookups = {}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*' or isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+            return None
+        if isinstance(field, serializers.RelatedField) and not _is_plain_pk(field):
+            return None
+        lookups[name] = field.source.replace('.', '__')
+    return lookups
+
+
+def _is_plain_pk(field):
+    # values() already yields the id a PrimaryKeyRelatedField would output.
+    return isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None
+
+
+def serialize_values(serializer, rows):
+    """
+    Formats values() rows exactly as serializer.to_representation would format
+    model instances, without building the instances.
+    """
+    columns = []
+    for name, lookup in values_lookups(serializer).items():
+        field = serializer.fields[name]
+        convert = None if type(field) in PASSTHROUGH_FIELDS or _is_plain_pk(field) else field.to_representation
+        columns.append((name, lookup, convert))
+
+    data = []
+    for row in rows:
+        item = {}
+        for name, lookup, convert in columns:
+            value = row[lookup]
+            item[name] = value if convert is None or value is None else convert(value)
+        data.append(item)
+    return data
+
+
+class TransactionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username') 
 
     class Meta:
         model = Transaction
         fields = '__all__'
+        # Stamped when the transaction is logged; only imports set it (ImportRowSerializer).
+        read_only_fields = ['date_time']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Transactions can only be allocated to the requesting user's goals.
+        request = self.context.get('request')
+        fields['goal'].queryset = Goal.objects.filter(user=request.user) if request else Goal.objects.none()
+        return fields
+
+class TransactionBulkSerializer(serializers.Serializer):
+    """A selection for the bulk endpoints: ids, list API filters, or both (intersected)."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    filter = serializers.DictField(required=False)
+
+class TransactionBulkUpdateSerializer(TransactionBulkSerializer):
+    status = serializers.ChoiceField(choices=STATUS_CHOICES, required=False)
+    category = serializers.ChoiceField(choices=CATEGORIES, required=False)
+
+    def validate(self, data):
+        if 'status' not in data and 'category' not in data:
+            raise serializers.ValidationError('Give a status and/or category to set.')
+        return data
 
-class BudgetSerializer(serializers.ModelSerializer):
+class BudgetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')  
 
     class Meta:
         model = Budget
         fields = '__all__'
 
-class GoalSerializer(serializers.ModelSerializer):
+class GoalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username') 
+    projected_completion = serializers.SerializerMethodField()
 
     class Meta:
         model = Goal
         fields = '__all__'
+        # Maintained from allocated transactions; set initial_amount instead.
+        read_only_fields = ['saved_amount']
+
+    def create(self, validated_data):
+        # No transaction can be allocated to a goal that does not exist yet
+        validated_data['saved_amount'] = validated_data.get('initial_amount', 0)
+        return super().create(validated_data)
+
+    def update(self, goal, validated_data):
+        # Shift saved_amount by the change in initial_amount. The F() keeps
+        # allocations applied since the goal was loaded, and the row lock
+        # stops two edits from both using the same old initial_amount.
+        with transaction.atomic():
+            previous = Goal.objects.select_for_update().values_list('initial_amount', flat=True).get(pk=goal.pk)
+            delta = validated_data.get('initial_amount', previous) - previous
+            goal.saved_amount = F('saved_amount') + delta
+            goal = super().update(goal, validated_data)
+        goal.refresh_from_db(fields=['saved_amount'])
+        return goal
+
+    def get_projected_completion(self, goal):
+        return projected_completion(goal, timezone.localdate())
+
+class BudgetStatusSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    category = serializers.CharField()
+    amount = serializers.DecimalField(max_digits=14, decimal_places=2)
+    spent = serializers.DecimalField(max_digits=14, decimal_places=2)
+    remaining = serializers.DecimalField(max_digits=14, decimal_places=2)
+    percent_used = serializers.FloatField(allow_null=True)
+
+class BudgetMonthStatusSerializer(serializers.Serializer):
+    year = serializers.IntegerField()
+    month = serializers.IntegerField()
+    budgets = BudgetStatusSerializer(many=True)
+    total_budget = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total_spent = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total_remaining = serializers.DecimalField(max_digits=14, decimal_places=2)
 
 class UserSerializer(serializers.ModelSerializer):
     profile_image = serializers.ImageField(source='profile.profile_image', read_only=True)
+    # {'webp': url, 'jpeg': url}, or null when the upload has no renditions
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'profile_image']
+        fields = ['id', 'username', 'email', 'profile_image', 'thumbnail']
+
+    def get_thumbnail(self, user):
+        return thumbnails.urls(user.profile.thumbnail, self.context.get('request'))
 
 
 class RecurringExpenseSerializer(serializers.ModelSerializer):
@@ -1,10 +1,169 @@
 # signals.py
-from django.db.models.signals import post_save
+from decimal import Decimal
+
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete, post_migrate
+from django.db import connections, transaction
 from django.dispatch import receiver
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import Profile
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from .authentication import token_cache
+from .models import Profile, Transaction, Budget, Goal, RecurringExpense
+from . import caching, goals, rollups, search, sync, thumbnails, watermarks
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+@receiver(pre_save, sender=Profile)
+def render_profile_thumbnail(sender, instance, **kwargs):
+    image = instance.profile_image
+    if not image:
+        instance.thumbnail = ''
+    elif not image._committed:  # a new upload, not yet written to storage
+        try:
+            instance.thumbnail = thumbnails.render(image)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Not a readable image; pages fall back to the original file.
+            instance.thumbnail = ''
+
+
+# ──────── Monthly rollups & goal progress ──────── #
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_values(sender, instance, **kwargs):
+    instance._previous_values = None
+    if instance.pk:
+        instance._previous_values = (
+            Transaction.objects.filter(pk=instance.pk).values(*rollups.ROLLUP_FIELDS, 'goal_id').first()
+        )
+
+@receiver(post_save, sender=Transaction)
+def update_rollups_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    if previous:
+        rollups.apply_transaction(previous, sign=-1)
+    rollups.apply_transaction({field: getattr(instance, field) for field in rollups.ROLLUP_FIELDS})
+
+@receiver(post_delete, sender=Transaction)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.apply_transaction({field: getattr(instance, field) for field in rollups.ROLLUP_FIELDS}, sign=-1)
+
+@receiver(post_save, sender=Transaction)
+def update_goal_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    goals.move_allocation(
+        (previous['goal_id'], previous['amount']) if previous else (None, 0),
+        (instance.goal_id, instance.amount),
+    )
+
+@receiver(post_delete, sender=Transaction)
+def update_goal_on_delete(sender, instance, **kwargs):
+    goals.apply_allocation(instance.goal_id, -Decimal(instance.amount))
+
+
+# ──────── Cache versions ──────── #
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+@receiver(post_save, sender=RecurringExpense)
+@receiver(post_delete, sender=RecurringExpense)
+def bump_dashboard_version(sender, instance, **kwargs):
+    caching.bump_on_commit(instance.user_id, caching.DASHBOARD)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def bump_transactions_version(sender, instance, **kwargs):
+    caching.bump_on_commit(instance.user_id, caching.TRANSACTIONS)
+
+
+# ──────── List watermarks ──────── #
+
+def deleting_user(origin):
+    # Rows removed by an account deletion cascade; writing anything that
+    # references the user then would fail its foreign key at commit.
+    return isinstance(origin, User) or getattr(origin, 'model', None) is User
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def touch_transaction_watermarks(sender, instance, origin=None, **kwargs):
+    if deleting_user(origin):
+        return
+    previous = getattr(instance, '_previous_values', None)
+    resources = [watermarks.TRANSACTIONS]
+    if instance.goal_id or (previous and previous['goal_id']):
+        resources.append(watermarks.GOALS)  # the allocation moved saved_amount
+    watermarks.touch(instance.user_id, *resources)
+
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+def touch_budget_watermark(sender, instance, origin=None, **kwargs):
+    if not deleting_user(origin):
+        watermarks.touch(instance.user_id, watermarks.BUDGETS)
+
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+def touch_goal_watermarks(sender, instance, origin=None, **kwargs):
+    if deleting_user(origin):
+        return
+    resources = [watermarks.GOALS]
+    if kwargs['signal'] is post_delete:
+        resources.append(watermarks.TRANSACTIONS)  # allocations are set to NULL
+    watermarks.touch(instance.user_id, *resources)
+
+@receiver(post_save, sender=User)
+def touch_user_watermarks(sender, instance, created, update_fields=None, **kwargs):
+    # Lists show the username; logins only save last_login.
+    if not created and (update_fields is None or 'username' in update_fields):
+        watermarks.touch(instance.pk, watermarks.TRANSACTIONS, watermarks.BUDGETS, watermarks.GOALS)
+
+
+# ──────── Sync tombstones ──────── #
+
+@receiver(pre_delete, sender=Goal)
+def touch_allocated_transactions(sender, instance, **kwargs):
+    # SET_NULL clears their goal with an UPDATE that skips auto_now.
+    instance.transactions.update(updated_at=timezone.now())
+
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=Budget)
+@receiver(post_delete, sender=Goal)
+def leave_tombstone(sender, instance, origin=None, **kwargs):
+    if not deleting_user(origin):
+        sync.leave_tombstone(instance)
+
+
+# ──────── Token auth cache ──────── #
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def evict_cached_token(sender, instance, **kwargs):
+    # Rotating a token deletes the old key (it is the primary key) and creates
+    # a new one, so this covers delete and rotate alike. Evicting again on
+    # commit drops anything a concurrent request cached before the commit.
+    key = instance.key
+    token_cache.evict(key)
+    transaction.on_commit(lambda: token_cache.evict(key))
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_user_tokens(sender, instance, **kwargs):
+    # Any user change (is_active, username, permissions) drops the cached copy.
+    user_id = instance.pk
+    token_cache.evict_user(user_id)
+    transaction.on_commit(lambda: token_cache.evict_user(user_id))
+
+
+# ──────── Full-text search ──────── #
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.name == 'core':
+        search.restore_triggers(connections[using])
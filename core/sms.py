@@ -0,0 +1,182 @@
+import re
+from collections import deque, namedtuple
+
+from django.conf import settings
+
+# SMS parsing engine. Message templates are compiled once at import time.
+# Merchants are categorised by a substring scan over the dictionary, like the
+# original parser, or with an Aho-Corasick automaton once the dictionary has
+# AUTOMATON_MIN_KEYWORDS entries: the scan is C-speed per keyword, the
+# automaton walks the name a character at a time in Python whatever the
+# dictionary size, and they cost the same at about 32 keywords.
+
+DEFAULT_MERCHANT_CATEGORIES = {
+    'zomato': 'Food',
+    'swiggy': 'Food',
+    'uber': 'Transport',
+    'ola': 'Transport',
+    'amazon': 'Shopping',
+    'flipkart': 'Shopping',
+    'pharmeasy': 'Health',
+    'medlife': 'Health',
+}
+
+AMOUNT = r'(?:₹|Rs\.?|INR)\s*(?P<amount>\d[\d,]*(?:\.\d+)?)'
+# A merchant runs until a trailing clause ("on <date>", "via", "(Ref ...", ...) or the end.
+MERCHANT = r"(?P<merchant>[^()\n]+?)(?=\s+(?:on|via|using|Ref|UPI|Avl|Avbl)\b|\s*\(|\.\s|\.?$)"
+
+AUTOMATON_MIN_KEYWORDS = 32
+
+# `triggers` are lowercase literals at least one of which must appear in the
+# message; they let most templates be skipped without running the regex.
+Template = namedtuple('Template', ['name', 'label', 'type', 'triggers', 'pattern'])
+
+TEMPLATES = (
+    # "₹250.00 paid to Zomato via GPay" (the original single supported shape)
+    Template('upi_paid', 'GPay', 'Expense', (' via',), re.compile(AMOUNT + r'.*?\bto (?P<merchant>.*?) via', re.S)),
+    # "Your A/c XX1234 is debited for Rs.250.00 on 01-06-25 and credited to AMAZON PAY (UPI Ref 1234)"
+    Template('acct_debited_for', 'Bank', 'Expense', ('debited for', 'debited by'), re.compile(
+        r'\bdebited\s+(?:for|by)\s+' + AMOUNT + r'.*?\bcredited\s+to\s+(?:VPA\s+)?' + MERCHANT, re.I | re.S)),
+    # "INR 450.00 debited from a/c **1234 on 05-Jun-25. Info: UPI/SWIGGY/4123"
+    Template('debit_info', 'Bank', 'Expense', ('info',), re.compile(
+        AMOUNT + r'\s+(?:has\s+been\s+)?debited\b.*?\bInfo:?\s*(?:UPI[/-])?(?P<merchant>[^/\n]+?)(?=[/.]|\s*$)', re.I | re.S)),
+    # "Rs.1,234.50 debited from A/c XX1234 on 12-03-25 to VPA zomato@ybl (UPI Ref No 5123)"
+    Template('debit_to', 'Bank', 'Expense', ('debited', 'spent', 'sent', 'paid'), re.compile(
+        AMOUNT + r'\s+(?:has\s+been\s+)?(?:debited|spent|sent|paid)\b.*?\b(?:to|at)\s+(?:VPA\s+)?' + MERCHANT, re.I | re.S)),
+    # "Rs.5,000.00 credited to A/c XX1234 from JOHN DOE (UPI Ref No 5123)"
+    Template('credit_from', 'Bank', 'Income', ('credited', 'received'), re.compile(
+        AMOUNT + r'\s+(?:has\s+been\s+)?(?:credited|received)\b.*?\b(?:from|by)\s+(?:VPA\s+)?' + MERCHANT, re.I | re.S)),
+)
+
+
+class MerchantMatcher:
+    """
+    Categorises by a {keyword: category} dictionary: the earliest keyword in
+    dictionary order that occurs anywhere in the text wins, case-insensitively.
+    Small dictionaries are scanned; large ones get an Aho-Corasick automaton.
+    """
+
+    def __init__(self, keywords, default='Other'):
+        self.default = default
+        self.keywords = None
+        if len(keywords) < AUTOMATON_MIN_KEYWORDS:
+            self.keywords = []
+            for keyword, category in keywords.items():
+                if keyword.lower() not in (seen for seen, _ in self.keywords):
+                    self.keywords.append((keyword.lower(), category))
+            return
+
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]  # (priority, category) of the best keyword ending at each state
+
+        for priority, (keyword, category) in enumerate(keywords.items()):
+            state = 0
+            for char in keyword.lower():
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            if self.best[state] is None or priority < self.best[state][0]:
+                self.best[state] = (priority, category)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited[0] < self.best[child][0]):
+                    self.best[child] = inherited
+
+    def match(self, text):
+        if self.keywords is not None:
+            text = text.lower()
+            for keyword, category in self.keywords:
+                if keyword in text:
+                    return category
+            return self.default
+
+        goto, fail, best = self.goto, self.fail, self.best
+        state = 0
+        found = None
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            hit = best[state]
+            if hit is not None and (found is None or hit[0] < found[0]):
+                found = hit
+                if found[0] == 0:
+                    break
+        return found[1] if found else self.default
+
+
+class SmsParser:
+    def __init__(self, merchants=None, templates=TEMPLATES):
+        if merchants is None:
+            merchants = getattr(settings, 'SMS_MERCHANT_CATEGORIES', DEFAULT_MERCHANT_CATEGORIES)
+        self.matcher = MerchantMatcher(merchants)
+        self.templates = templates
+
+    def _parse(self, sms, categorize):
+        lowered = sms.lower()
+        for template in self.templates:
+            for trigger in template.triggers:
+                if trigger in lowered:
+                    break
+            else:
+                continue
+            match = template.pattern.search(sms)
+            if match is None:
+                continue
+            amount, merchant = match.group('amount', 'merchant')
+            merchant = merchant.strip()
+            if not merchant:
+                continue
+            return {
+                'amount': amount.replace(',', ''),
+                'type': template.type,
+                'category': categorize(merchant),
+                'merchant': merchant,
+                'description': f"{template.label}: {merchant}",
+                'status': 'Paid',
+                'template': template.name,
+            }
+        return None
+
+    def parse(self, sms):
+        """Returns a transaction dict for one SMS body, or None if no template matches."""
+        return self._parse(sms, self.matcher.match)
+
+    def parse_many(self, messages):
+        """Parses a list of SMS bodies; results line up with the input, None for no match."""
+        categories = {}
+
+        def categorize(merchant):
+            key = merchant.lower()
+            if key not in categories:
+                categories[key] = self.matcher.match(key)
+            return categories[key]
+
+        return [self._parse(sms, categorize) for sms in messages]
+
+
+_default_parser = None
+
+
+def get_parser():
+    global _default_parser
+    if _default_parser is None:
+        _default_parser = SmsParser()
+    return _default_parser
+
+
+def parse_sms_batch(messages):
+    return get_parser().parse_many(messages)
@@ -0,0 +1,167 @@
+import base64
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import watermarks
+from .goals import with_recent_savings
+from .models import Budget, Goal, Tombstone, Transaction
+from .serializers import BudgetSerializer, GoalSerializer, TransactionSerializer, serialize_values, values_lookups
+
+# Change feed for /sync/. Rows carry updated_at (auto_now, and set explicitly
+# by the queryset.update() callers) and deletes leave a Tombstone, so "what
+# changed since X" is a range scan on (user, updated_at, id) per model plus one
+# on (user, deleted_at, id). The four streams are merged in (time, stream, id)
+# order and cut into pages; the cursor is the position of the last item sent.
+#
+# Only rows older than SETTLE_SECONDS are served: a write stamped before the
+# cursor but committed after it would otherwise never be sent. Once a client
+# has caught up its cursor moves to the settle point, so idle clients don't
+# fall behind the tombstone retention window (TOMBSTONE_DAYS), after which
+# they get CursorExpired and must resync from scratch.
+
+DEFAULTS = {
+    'PAGE_SIZE': 500,
+    'SETTLE_SECONDS': 5,
+    'TOMBSTONE_DAYS': 90,
+}
+
+# (name, model, serializer); the index orders streams whose timestamps tie.
+RESOURCES = (
+    (watermarks.TRANSACTIONS, Transaction, TransactionSerializer),
+    (watermarks.BUDGETS, Budget, BudgetSerializer),
+    (watermarks.GOALS, Goal, GoalSerializer),
+)
+RESOURCE_NAMES = {model: name for name, model, _ in RESOURCES}
+DELETED = len(RESOURCES)  # stream index of the tombstones
+CAUGHT_UP = DELETED + 1  # after every stream at that time
+
+Position = namedtuple('Position', ['at', 'stream', 'pk'])
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def get_setting(name):
+    return getattr(settings, 'SYNC', {}).get(name, DEFAULTS[name])
+
+
+def encode_cursor(position):
+    raw = f'{position.at.isoformat()}|{position.stream}|{position.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns a Position; raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        at, stream, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        at = datetime.fromisoformat(at)
+        if timezone.is_naive(at):
+            raise ValueError(at)
+        return Position(at, int(stream), int(pk))
+    except (TypeError, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from exc
+
+
+def _after(queryset, field, stream, position):
+    if position is None:
+        return queryset
+    if stream < position.stream:
+        return queryset.filter(**{f'{field}__gt': position.at})
+    if stream > position.stream:
+        return queryset.filter(**{f'{field}__gte': position.at})
+    return queryset.filter(
+        Q(**{f'{field}__gt': position.at}) | Q(**{field: position.at, 'id__gt': position.pk}),
+        **{f'{field}__gte': position.at},
+    )
+
+
+def _serialize(model, serializer_class, ids):
+    queryset = model.objects.filter(pk__in=ids).order_by('updated_at', 'id')
+    if model is Goal:
+        queryset = with_recent_savings(queryset, timezone.localdate())
+    serializer = serializer_class()
+    lookups = values_lookups(serializer)
+    if lookups is None:
+        return serializer_class(queryset.select_related('user'), many=True).data
+    return serialize_values(serializer, queryset.values(*set(lookups.values())))
+
+
+def changes(user, cursor=None, page_size=None, now=None):
+    """
+    Returns the user's changes after `cursor` (everything when None) as
+    {'changes': {resource: [rows]}, 'deleted': {resource: [ids]}, 'cursor', 'has_more'}.
+    Raises ValueError for a malformed cursor and CursorExpired for one older
+    than the tombstone retention.
+    """
+    now = now or timezone.now()
+    page_size = page_size or get_setting('PAGE_SIZE')
+    settled = now - timedelta(seconds=get_setting('SETTLE_SECONDS'))
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None and position.at < now - timedelta(days=get_setting('TOMBSTONE_DAYS')):
+        raise CursorExpired(cursor)
+
+    # Keys only first: each is an index-only scan, and just the rows that make
+    # the page are loaded afterwards.
+    keys = []
+    for stream, (_, model, _) in enumerate(RESOURCES):
+        rows = _after(model.objects.filter(user=user, updated_at__lte=settled), 'updated_at', stream, position)
+        keys += [
+            Position(at, stream, pk)
+            for at, pk in rows.order_by('updated_at', 'id').values_list('updated_at', 'id')[:page_size + 1]
+        ]
+    tombstones = _after(Tombstone.objects.filter(user=user, deleted_at__lte=settled), 'deleted_at', DELETED, position)
+    keys += [
+        Position(at, DELETED, pk)
+        for at, pk in tombstones.order_by('deleted_at', 'id').values_list('deleted_at', 'id')[:page_size + 1]
+    ]
+
+    keys.sort()
+    has_more = len(keys) > page_size
+    page = keys[:page_size]
+
+    result = {'changes': {}, 'deleted': {name: [] for name, _, _ in RESOURCES}}
+    for stream, (name, model, serializer_class) in enumerate(RESOURCES):
+        ids = [key.pk for key in page if key.stream == stream]
+        result['changes'][name] = _serialize(model, serializer_class, ids) if ids else []
+    tombstone_ids = [key.pk for key in page if key.stream == DELETED]
+    if tombstone_ids:
+        for resource, object_id in Tombstone.objects.filter(pk__in=tombstone_ids).order_by(
+            'deleted_at', 'id',
+        ).values_list('resource', 'object_id'):
+            result['deleted'][resource].append(object_id)
+
+    if has_more:
+        next_position = page[-1]
+    else:
+        # Everything up to the settle point has been sent.
+        next_position = Position(settled, CAUGHT_UP, 0)
+        if position is not None and position > next_position:
+            next_position = position
+    result['cursor'] = encode_cursor(next_position)
+    result['has_more'] = has_more
+    return result
+
+
+def leave_tombstone(instance):
+    Tombstone.objects.create(user_id=instance.user_id, resource=RESOURCE_NAMES[type(instance)], object_id=instance.pk)
+
+
+def leave_tombstones(model, user_id, object_ids):
+    """leave_tombstone for rows removed with a raw DELETE, in one INSERT."""
+    Tombstone.objects.bulk_create(
+        [Tombstone(user_id=user_id, resource=RESOURCE_NAMES[model], object_id=pk) for pk in object_ids],
+        batch_size=1000,
+    )
+
+
+def prune_tombstones(days=None):
+    """Deletes tombstones past the retention window; returns how many."""
+    days = get_setting('TOMBSTONE_DAYS') if days is None else days
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
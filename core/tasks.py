@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+
+from . import archive, goals, jobs, recurring, rollups, sync
+
+# Handlers for core.jobs. Each takes the job payload as keyword arguments, so
+# payloads must stay JSON-serialisable.
+
+
+@jobs.register('recurring.detect')
+def detect_recurring(full=False):
+    if full:
+        recurring.run_full()
+    else:
+        recurring.run_incremental()
+
+
+@jobs.register('rollups.rebuild')
+def rebuild_rollups(user_id=None):
+    rollups.rebuild(user=User.objects.get(pk=user_id) if user_id is not None else None)
+
+
+@jobs.register('goals.reconcile')
+def reconcile_goals():
+    goals.reconcile()
+
+
+@jobs.register('jobs.cleanup')
+def cleanup_jobs(days=None):
+    jobs.cleanup(days)
+
+
+@jobs.register('sync.prune_tombstones')
+def prune_tombstones(days=None):
+    sync.prune_tombstones(days)
+
+
+@jobs.register('archive.run')
+def archive_transactions(days=None):
+    archive.run(days)
@@ -1,3 +1,1189 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
+from itertools import count
+import csv
+import json
+import tempfile
+import time
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models.signals import post_migrate
+from django.db.migrations.executor import MigrationExecutor
+from django.template import Context, base as template_base
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from unittest import mock
+
+from .authentication import CachedTokenAuthentication, TokenCache, token_cache
+from .budgets import budget_status, recent_months
+from .importers import import_transactions
+from .models import (
+    ArchivedTransaction, Budget, Goal, Job, MonthlyRollup, RecurringExpense, Tombstone, Transaction, Watermark,
+)
+from .pagination import keyset_paginate
+from .sms import AUTOMATON_MIN_KEYWORDS, DEFAULT_MERCHANT_CATEGORIES, MerchantMatcher
+from . import (
+    analytics, archive, bulk, caching, exporters, goals, jobs, middleware, reconciliation, recurring, rollups, search,
+    sync, thumbnails,
+)
+
+START = timezone.make_aware(datetime(2024, 5, 1, 12, 0))
+
+
+def make_transaction(user, date_time=START, **fields):
+    values = {'type': 'Expense', 'amount': '100.00', 'category': 'Food', 'description': 'Lunch'}
+    values.update(fields)
+    return Transaction.objects.create(user=user, date_time=date_time, **values)
+
+
+def make_archived(user, pk, date_time=START, **fields):
+    values = {'type': 'Expense', 'amount': '100.00', 'category': 'Food', 'description': 'Lunch'}
+    values.update(fields)
+    return ArchivedTransaction.objects.create(
+        id=pk, user=user, date_time=date_time, updated_at=timezone.now(), **values,
+    )
+
+
+def newest_first(rows):
+    return [row.pk for row in sorted(rows, key=lambda row: (row.date_time, row.pk), reverse=True)]
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        # Three runs of rows sharing a date_time, so pages end inside a tie.
+        self.rows = [
+            make_transaction(self.user, START + timedelta(hours=hour))
+            for hour in (0, 0, 0, 1, 1, 2, 2, 2, 2)
+        ]
+
+    def walk(self, queryset, page_size, others=()):
+        """Pages forwards, then back from the last one: (ids in order, forward pages, backward pages)."""
+        pages = [keyset_paginate(queryset, None, page_size, others)]
+        while pages[-1].next_cursor:
+            pages.append(keyset_paginate(queryset, pages[-1].next_cursor, page_size, others))
+        back = [pages[-1]]
+        while back[-1].previous_cursor:
+            back.append(keyset_paginate(queryset, back[-1].previous_cursor, page_size, others))
+        forward = [row.pk for page in pages for row in page.items]
+        return forward, pages, back[::-1]
+
+    def test_next_and_previous_cursors_across_ties(self):
+        queryset = Transaction.objects.filter(user=self.user)
+        for page_size in (1, 2, 4):
+            forward, pages, back = self.walk(queryset, page_size)
+            self.assertEqual(forward, newest_first(self.rows))
+            self.assertIsNone(pages[0].previous_cursor)
+            self.assertIsNone(pages[-1].next_cursor)
+            # Walking back lands on the same pages, first one included.
+            self.assertEqual([[row.pk for row in page.items] for page in back],
+                             [[row.pk for row in page.items] for page in pages])
+
+    def test_other_users_rows_are_not_paginated(self):
+        other = User.objects.create_user('bob', password='secret')
+        make_transaction(other, START + timedelta(hours=1))
+        forward, _, _ = self.walk(Transaction.objects.filter(user=self.user), 2)
+        self.assertEqual(forward, newest_first(self.rows))
+
+    def test_malformed_cursor_is_404(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        # Not base64, wrong direction marker ('x|y|z'), not even ASCII.
+        for cursor in ('garbage', 'eHx5fHo', '!!!'):
+            response = client.get('/transactions/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_merges_archive_at_page_boundaries(self):
+        # Archived rows are mostly older; two tie with hot rows' date_time.
+        archived = [
+            make_archived(self.user, 10_000 + number, START - timedelta(hours=number))
+            for number in range(5)
+        ]
+        archived.append(make_archived(self.user, 20_000, START))
+        archived.append(make_archived(self.user, 20_001, START + timedelta(hours=1)))
+        hot = Transaction.objects.filter(user=self.user)
+        others = [ArchivedTransaction.objects.filter(user=self.user)]
+        expected = newest_first(self.rows + archived)
+        for page_size in (1, 2, 3, 5, 9, 20):
+            forward, pages, back = self.walk(hot, page_size, others)
+            self.assertEqual(forward, expected, page_size)
+            self.assertTrue(all(len(page.items) == page_size for page in pages[:-1]))
+            self.assertEqual([[row.pk for row in page.items] for page in back],
+                             [[row.pk for row in page.items] for page in pages])
+
+    def test_list_api_includes_archived_rows(self):
+        make_archived(self.user, 10_000, START - timedelta(days=800))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        ids, url = [], '/transactions/?page_size=4'
+        while url:
+            body = client.get(url).json()
+            ids += [row['id'] for row in body['results']]
+            url = body['next']
+        self.assertEqual(ids, newest_first(self.rows) + [10_000])
+
+
+class RollupTests(TestCase):
+    """Every write path must leave MonthlyRollup as rollups.rebuild() would."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.other = User.objects.create_user('bob', password='secret')
+        for number in range(6):
+            make_transaction(self.user, START + timedelta(days=12 * number), amount=f'{10 + number}.50',
+                             category=('Food', 'Rent')[number % 2], type=('Expense', 'Income')[number % 3 == 0])
+        make_transaction(self.other, START, amount='7.00')
+
+    def snapshot(self):
+        # Incremental upkeep leaves emptied rows at count 0; rebuild drops them.
+        return sorted(
+            MonthlyRollup.objects.exclude(count=0)
+            .values_list('user_id', 'year', 'month', 'category', 'type', 'total', 'count')
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_create_update_and_delete(self):
+        self.assertMatchesRebuild()
+        tx = make_transaction(self.user, START + timedelta(days=3), amount='99.99')
+        self.assertMatchesRebuild()
+
+        tx.amount = '150.25'
+        tx.save()
+        self.assertMatchesRebuild()
+        tx.category = 'Health'
+        tx.save()
+        self.assertMatchesRebuild()
+        tx.date_time = START + timedelta(days=45)  # another month
+        tx.save()
+        self.assertMatchesRebuild()
+
+        tx.delete()
+        self.assertMatchesRebuild()
+
+    def test_bulk_import(self):
+        lines = ['type,amount,category,description,date_time']
+        lines += [f'Expense,{number}.25,Transport,Cab,2024-0{1 + number % 3}-1{number % 10}T08:00:00'
+                  for number in range(25)]
+        lines.append('Expense,not-a-number,Food,Broken,2024-01-01T00:00:00')
+        upload = SimpleUploadedFile('statement.csv', '\n'.join(lines).encode())
+        result = import_transactions(self.user, upload, 'csv', chunk_size=10)
+        self.assertEqual(result.created, 25)
+        self.assertMatchesRebuild()
+
+    def test_bulk_update_and_delete(self):
+        selection = bulk.select(self.user, filters={'category': 'Food'})
+        self.assertEqual(len(bulk.update(self.user, selection, {'category': 'Shopping'})), 3)
+        self.assertMatchesRebuild()
+        self.assertEqual(len(bulk.update(self.user, bulk.select(self.user, filters={'type': 'Income'}),
+                                         {'status': 'Pending'})), 2)
+        self.assertMatchesRebuild()
+
+        ids = list(Transaction.objects.filter(user=self.user).values_list('pk', flat=True)[:4])
+        self.assertEqual(len(bulk.delete(self.user, bulk.select(self.user, ids=ids))), 4)
+        self.assertMatchesRebuild()
+
+    def test_archiving(self):
+        make_transaction(self.user, timezone.now() - timedelta(days=30))
+        moved = archive.run(days=365, batch_size=2)
+        self.assertEqual(moved, 7)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertMatchesRebuild()
+
+
+class ImportEncodingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        rows = ['type,amount,category,description,date_time']
+        # The undecodable row comes after a whole batch of good ones.
+        rows += [f'Expense,{number}.00,Food,Cafe,2024-03-01T10:00:00' for number in range(1, 30)]
+        rows.append('Expense,5.00,Food,Café Müller,2024-03-02T10:00:00')
+        self.text = '\n'.join(rows)
+
+    def upload(self, url, content, name='statement.csv'):
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content), 'chunk_size': 10},
+                                format='multipart')
+
+    def test_non_utf8_import_is_rejected_before_any_row_is_saved(self):
+        for encoding in ('latin-1', 'utf-16'):
+            response = self.upload('/transactions/import/', self.text.encode(encoding))
+            self.assertEqual(response.status_code, 400, encoding)
+            self.assertIn('not UTF-8', response.json()['detail'])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_utf8_import_with_bom(self):
+        response = self.upload('/transactions/import/', self.text.encode('utf-8-sig'))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 30)
+
+    def test_only_imports_set_date_time(self):
+        self.upload('/transactions/import/', self.text.encode())
+        imported = Transaction.objects.order_by('id').first()
+        self.assertEqual(timezone.localtime(imported.date_time).date().isoformat(), '2024-03-01')
+
+        data = {'type': 'Expense', 'amount': '10.00', 'category': 'Food', 'description': 'Tea',
+                'date_time': '2020-01-01T10:00:00'}
+        response = self.client.post('/transactions/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(timezone.localdate(Transaction.objects.get(pk=response.data['id']).date_time),
+                         timezone.localdate())
+
+    def test_non_utf8_reconcile_upload_is_400(self):
+        content = 'payee,amount,date_time\nCafé,5.00,2024-03-02T10:00:00'.encode('latin-1')
+        response = self.upload('/transactions/reconcile/', content)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not UTF-8', response.json()['detail'])
+
+
+class MerchantMatcherTests(TestCase):
+    def reference(self, keywords, text):
+        # The original parser's loop: first keyword in dictionary order wins.
+        for keyword, category in keywords.items():
+            if keyword.lower() in text.lower():
+                return category
+        return 'Other'
+
+    def test_scan_and_automaton_agree_with_the_original_loop(self):
+        large = {f'shop{number:03d}': f'C{number}' for number in range(AUTOMATON_MIN_KEYWORDS)}
+        large.update({'Ola': 'Transport', 'cola': 'Food', 'zomato': 'Food', 'mato': 'Other-2'})
+        texts = ['Ola Cabs', 'COCA COLA', 'zomato@ybl', 'shop012 and shop007', 'Tomato', 'Ravi Kumar', '']
+        for keywords in (DEFAULT_MERCHANT_CATEGORIES, large):
+            matcher = MerchantMatcher(keywords)
+            self.assertEqual(matcher.keywords is None, len(keywords) >= AUTOMATON_MIN_KEYWORDS)
+            for text in texts + list(keywords):
+                self.assertEqual(matcher.match(text), self.reference(keywords, text), text)
+
+
+class RecurringUniqueMigrationTests(TransactionTestCase):
+    before = [('core', '0006_transaction_date_time_default')]
+    after = [('core', '0007_recurring_unique_merchant_checkpoint')]
+
+    def tearDown(self):
+        MigrationExecutor(connection).migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicates_are_dropped_before_the_constraint(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        user = apps.get_model('auth', 'User').objects.create(username='alice')
+        RecurringExpense = apps.get_model('core', 'RecurringExpense')
+        due = timezone.localdate()
+        for merchant, amount in (('netflix', 199), ('netflix', 249), ('netflix', 499), ('spotify', 119)):
+            RecurringExpense.objects.create(user=user, merchant=merchant, average_amount=amount,
+                                            frequency='Monthly', next_due_date=due)
+        newest = RecurringExpense.objects.filter(merchant='netflix').order_by('-last_detected', '-id').first()
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        RecurringExpense = executor.loader.project_state(self.after).apps.get_model('core', 'RecurringExpense')
+        self.assertEqual(sorted(RecurringExpense.objects.values_list('merchant', flat=True)), ['netflix', 'spotify'])
+        self.assertEqual(RecurringExpense.objects.get(merchant='netflix').pk, newest.pk)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client.force_login(self.user)
+
+    def misses(self):
+        return caching.stats().get(f'{caching.DASHBOARD}.miss', 0)
+
+    def dashboard_at(self, moment):
+        with mock.patch('django.utils.timezone.now', return_value=moment), \
+                mock.patch('core.views.now', return_value=moment):
+            response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_rebuilt_on_a_new_local_day(self):
+        evening = timezone.make_aware(datetime(2024, 5, 14, 23, 50))
+        make_transaction(self.user, evening - timedelta(hours=1), amount='42.00')
+        self.dashboard_at(evening)
+        misses = self.misses()
+        self.dashboard_at(evening + timedelta(minutes=5))
+        self.assertEqual(self.misses(), misses)
+
+        response = self.dashboard_at(evening + timedelta(minutes=15))  # 00:05 the next day
+        self.assertEqual(self.misses(), misses + 1)
+        self.assertEqual(response.context['tx_labels'][-1], '15 May')
+
+
+class TemplateTimerTests(TestCase):
+    def tearDown(self):
+        template_base.Template.render = middleware._timed_template_render
+
+    def test_installed_only_when_instrumentation_is_enabled(self):
+        # Installed by CoreConfig.ready(), not by the first request.
+        self.assertIs(template_base.Template.render, middleware._timed_template_render)
+        template_base.Template.render = middleware._original_template_render
+        with override_settings(INSTRUMENTATION={'ENABLED': False}):
+            middleware.install_template_timer()
+        self.assertIs(template_base.Template.render, middleware._original_template_render)
+        middleware.install_template_timer()
+        middleware.install_template_timer()
+        self.assertIs(template_base.Template.render, middleware._timed_template_render)
+
+    def test_only_instrumented_requests_are_timed(self):
+        template = template_base.Template('{{ value }}')
+        self.assertIsNone(middleware._current.get())
+        self.assertEqual(template.render(Context({'value': 1})), '1')
+
+        self.client.force_login(User.objects.create_user('alice', password='secret'))
+        timing = self.client.get('/transactions-page/')['Server-Timing']
+        template_ms = float(timing.split('tpl;dur=')[1].split(',')[0])
+        self.assertGreater(template_ms, 0)
+
+
+    def test_request_log_is_opt_in(self):
+        self.client.force_login(User.objects.create_user('alice', password='secret'))
+        with self.assertNoLogs('core.instrumentation'):
+            self.client.get('/budgets-page/')
+        with override_settings(INSTRUMENTATION={'LOG': True}), self.assertLogs('core.instrumentation', 'INFO'):
+            self.client.get('/budgets-page/')
+
+
+class GoalSavedAmountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_goal(self, **fields):
+        data = {'title': 'Laptop', 'target_amount': '80000.00', 'deadline': '2030-01-01', **fields}
+        response = self.client.post('/goals/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_create_starts_saved_amount_at_initial_amount(self):
+        created = self.create_goal(initial_amount='500.00', saved_amount='9999.00')
+        self.assertEqual(created['saved_amount'], '500.00')
+        self.assertEqual(Goal.objects.get(pk=created['id']).saved_amount, Decimal('500.00'))
+        self.assertEqual(self.create_goal()['saved_amount'], '0.00')
+
+    def test_update_moves_saved_amount_by_the_initial_amount_change(self):
+        goal_id = self.create_goal(initial_amount='500.00')['id']
+        make_transaction(self.user, amount='200.00', goal_id=goal_id)
+
+        response = self.client.patch(f'/goals/{goal_id}/', {'initial_amount': '800.00'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['saved_amount'], '1000.00')
+
+        response = self.client.patch(f'/goals/{goal_id}/', {'title': 'New laptop'}, format='json')
+        self.assertEqual(response.data['saved_amount'], '1000.00')
+        self.assertEqual(goals.reconcile(), 0)
+
+    def test_reconcile_invalidates_the_dashboard(self):
+        goal_id = self.create_goal(initial_amount='500.00')['id']
+        Goal.objects.filter(pk=goal_id).update(saved_amount='1.00')
+        version = caching.get_version(self.user.pk, caching.DASHBOARD)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(goals.reconcile(), 1)
+        self.assertNotEqual(caching.get_version(self.user.pk, caching.DASHBOARD), version)
+        self.assertEqual(Goal.objects.get(pk=goal_id).saved_amount, Decimal('500.00'))
+
+
+class ConditionalListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        make_transaction(self.user)
+        make_transaction(self.user, date_time=START + timedelta(hours=1))
+
+    def test_etag_is_per_query_string(self):
+        etag = self.client.get('/transactions/')['ETag']
+        for query in ('?page_size=1', '?search=lunch', '?fields=id', '?category=Food'):
+            response = self.client.get(f'/transactions/{query}', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, query)
+            self.assertNotEqual(response['ETag'], etag, query)
+
+        paged_etag = self.client.get('/transactions/?page_size=1')['ETag']
+        response = self.client.get('/transactions/?page_size=1', HTTP_IF_NONE_MATCH=paged_etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class AccountDeletionTests(TransactionTestCase):
+    # A TransactionTestCase so the foreign keys are checked when the deletion commits.
+
+    def test_deleting_a_user_with_data(self):
+        user = User.objects.create_user('alice', password='secret')
+        other = User.objects.create_user('bob', password='secret')
+        goal = Goal.objects.create(user=user, title='Laptop', target_amount='80000.00', deadline='2030-01-01')
+        Budget.objects.create(user=user, category='Food', amount='5000.00', month=5, year=2024)
+        make_transaction(user)
+        make_transaction(user, amount='250.00', goal=goal)
+        make_transaction(other)
+
+        user.delete()
+
+        for model in (Transaction, Budget, Goal, Watermark, Tombstone):
+            self.assertFalse(model.objects.filter(user_id=user.pk).exists(), model.__name__)
+        self.assertEqual(Transaction.objects.filter(user=other).count(), 1)
+
+
+class SyncChangesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.now = timezone.now() + timedelta(minutes=1)  # everything written so far has settled
+
+    def ids(self, result, resource):
+        return [row['id'] for row in result['changes'][resource]]
+
+    def test_unsettled_rows_wait_for_the_next_sync(self):
+        written = timezone.now()
+        tx = make_transaction(self.user)
+        first = sync.changes(self.user, now=written + timedelta(seconds=1))
+        self.assertEqual(self.ids(first, 'transactions'), [])
+        self.assertFalse(first['has_more'])
+
+        second = sync.changes(self.user, first['cursor'], now=self.now)
+        self.assertEqual(self.ids(second, 'transactions'), [tx.pk])
+        third = sync.changes(self.user, second['cursor'], now=self.now)
+        self.assertEqual(self.ids(third, 'transactions'), [])
+
+    def test_deletes_leave_tombstones(self):
+        kept, deleted, *bulk_deleted = [make_transaction(self.user) for _ in range(4)]
+        goal = Goal.objects.create(user=self.user, title='Laptop', target_amount='80000.00', deadline='2030-01-01')
+        cursor = sync.changes(self.user, now=timezone.now())['cursor']
+        deleted_ids = [tx.pk for tx in [deleted] + bulk_deleted]
+        goal_id = goal.pk
+
+        deleted.delete()
+        goal.delete()
+        bulk.delete(self.user, bulk.select(self.user, ids=deleted_ids[1:]))
+
+        result = sync.changes(self.user, cursor, now=self.now + timedelta(minutes=1))
+        self.assertEqual(sorted(result['deleted']['transactions']), deleted_ids)
+        self.assertEqual(result['deleted']['goals'], [goal_id])
+        self.assertEqual(result['deleted']['budgets'], [])
+        # Written just before the first sync, so unsettled then and sent now
+        self.assertEqual(self.ids(result, 'transactions'), [kept.pk])
+
+    def test_expired_and_malformed_cursors(self):
+        expired = sync.encode_cursor(sync.Position(self.now - timedelta(days=91), 0, 0))
+        with self.assertRaises(sync.CursorExpired):
+            sync.changes(self.user, expired, now=self.now)
+        with self.assertRaises(ValueError):
+            sync.changes(self.user, 'not-a-cursor', now=self.now)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/sync/', {'since': expired}).status_code, 410)
+        self.assertEqual(client.get('/sync/', {'since': 'not-a-cursor'}).status_code, 400)
+
+    def test_pages_split_ties_across_streams(self):
+        tied = timezone.now()
+        transactions = [make_transaction(self.user).pk for _ in range(3)]
+        budgets = [Budget.objects.create(user=self.user, category=category, amount='100.00', month=5, year=2024).pk
+                   for category in ('Food', 'Rent')]
+        goal_ids = [Goal.objects.create(user=self.user, title=title, target_amount='100.00', deadline='2030-01-01').pk
+                    for title in ('Laptop', 'Bike', 'Trip')]
+        Goal.objects.filter(pk=goal_ids.pop()).delete()
+        for model in (Transaction, Budget, Goal):
+            model.objects.filter(user=self.user).update(updated_at=tied)
+        Tombstone.objects.filter(user=self.user).update(deleted_at=tied)
+
+        seen = {'transactions': [], 'budgets': [], 'goals': [], 'deleted': []}
+        cursor, pages = None, 0
+        while True:
+            result = sync.changes(self.user, cursor, page_size=2, now=self.now)
+            pages += 1
+            for resource in ('transactions', 'budgets', 'goals'):
+                seen[resource] += self.ids(result, resource)
+                seen['deleted'] += result['deleted'][resource]
+            cursor = result['cursor']
+            if not result['has_more']:
+                break
+
+        self.assertEqual(pages, 4)
+        self.assertEqual(seen['transactions'], transactions)
+        self.assertEqual(seen['budgets'], budgets)
+        self.assertEqual(seen['goals'], goal_ids)
+        self.assertEqual(len(seen['deleted']), 1)
+        self.assertEqual(sync.changes(self.user, cursor, now=self.now)['changes']['transactions'], [])
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        paid_at = timezone.make_aware(datetime(2024, 3, 2, 14, 0))
+        self.cafe = make_transaction(self.user, paid_at, amount='99.00', description='Pending GPay to Cafe', status='Pending')
+        self.zomato = make_transaction(self.user, paid_at, amount='250.00', description='Pending GPay to Zomato',
+                                       status='Pending')
+
+    def reconcile(self, *confirmations):
+        response = self.client.post('/transactions/reconcile/', {'confirmations': list(confirmations)}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def assertStatus(self, transaction, status):
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, status)
+
+    def test_matches_by_payee(self):
+        result = self.reconcile({'payee': 'CAFE', 'amount': '99.00', 'date_time': '2024-03-02T14:05:00+05:30'})
+        self.assertEqual(result['matches'], [{'item': 1, 'transaction': self.cafe.pk}])
+        self.assertStatus(self.cafe, 'Paid')
+        self.assertStatus(self.zomato, 'Pending')
+
+    def test_matches_a_bank_sms(self):
+        body = 'Rs.250.00 debited from A/c XX1234 on 02-03-24 to VPA zomato@ybl (UPI Ref No 5123)'
+        result = self.reconcile({'body': body, 'received_at': '2024-03-02T14:01:00+05:30'})
+        self.assertEqual(result['matches'], [{'item': 1, 'transaction': self.zomato.pk}])
+        self.assertStatus(self.zomato, 'Paid')
+
+    def test_amount_must_match(self):
+        result = self.reconcile({'payee': 'Cafe', 'amount': '98.00', 'date_time': '2024-03-02T14:05:00+05:30'})
+        self.assertEqual(result['matched'], 0)
+        self.assertEqual(result['unmatched_items'][0]['reason'], 'No pending payment matches.')
+        self.assertStatus(self.cafe, 'Pending')
+
+    def test_date_only_confirmation_covers_the_whole_day(self):
+        result = self.reconcile({'payee': 'Cafe', 'amount': '99', 'date': '2024-03-02'})
+        self.assertEqual(result['matched'], 1)
+        self.assertStatus(self.cafe, 'Paid')
+        confirmation = reconciliation.read_confirmation({'payee': 'Cafe', 'amount': '99', 'date': '2024-03-02'})
+        self.assertEqual(timezone.localtime(confirmation.date_time).time().hour, 23)
+
+    def test_bad_amounts_and_dates_are_unmatched(self):
+        items = [
+            {'payee': 'Cafe', 'amount': amount, 'date': '2024-03-02'}
+            for amount in ('1e400', '123456789012.00', 'abc', '-5', 'NaN')
+        ] + [{'payee': 'Cafe', 'amount': '99', 'date': date} for date in ('2024-02-30', 'yesterday')]
+        result = self.reconcile(*items)
+        self.assertEqual(result['matched'], 0)
+        self.assertEqual([entry['item'] for entry in result['unmatched_items']], list(range(1, 8)))
+        self.assertEqual(result['unmatched_items'][0]['reason'], 'amount must be less than 100000000.')
+        self.assertStatus(self.cafe, 'Pending')
+
+    @override_settings(UPI_RECONCILIATION={'MAX_CONFIRMATIONS': 3})
+    def test_batches_over_the_limit_are_rejected_unread(self):
+        self.assertEqual(len(reconciliation.take_batch(count())), 4)
+        with self.assertRaises(ValueError):
+            reconciliation.reconcile(self.user, [{'payee': 'Cafe', 'amount': '99', 'date': '2024-03-02'}] * 4)
+
+        rows = 'payee,amount,date\n' + 'Cafe,99,2024-03-02\n' * 4
+        upload = SimpleUploadedFile('statement.csv', rows.encode())
+        response = self.client.post('/transactions/reconcile/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertStatus(self.cafe, 'Pending')
+
+
+class CronTests(TestCase):
+    def next_after(self, expression, *moment):
+        fire = jobs.Cron(expression).next_after(timezone.make_aware(datetime(*moment)))
+        return timezone.localtime(fire).replace(tzinfo=None)
+
+    def test_next_fire_time(self):
+        self.assertEqual(self.next_after('*/15 * * * *', 2024, 5, 1, 12, 7, 30), datetime(2024, 5, 1, 12, 15))
+        self.assertEqual(self.next_after('*/15 * * * *', 2024, 5, 1, 12, 15), datetime(2024, 5, 1, 12, 30))
+        self.assertEqual(self.next_after('30 2 * * *', 2024, 5, 1, 12, 0), datetime(2024, 5, 2, 2, 30))
+        self.assertEqual(self.next_after('0 4 * * 0', 2024, 5, 1, 12, 0), datetime(2024, 5, 5, 4, 0))
+        self.assertEqual(self.next_after('0 4 * * 7', 2024, 5, 1, 12, 0), datetime(2024, 5, 5, 4, 0))
+        self.assertEqual(self.next_after('0 0 29 2 *', 2025, 3, 1, 0, 0), datetime(2028, 2, 29, 0, 0))
+
+    def test_restricted_day_fields_match_either(self):
+        # The 13th, or any Friday: Friday 3 May comes first.
+        self.assertEqual(self.next_after('0 0 13 * 5', 2024, 5, 1, 12, 0), datetime(2024, 5, 3, 0, 0))
+        self.assertEqual(self.next_after('0 0 13 * 5', 2024, 5, 10, 12, 0), datetime(2024, 5, 13, 0, 0))
+
+    def test_invalid_expressions(self):
+        for expression in ('* * * *', '60 * * * *', '*/0 * * * *', '5-1 * * * *', '0 0 31 2 *'):
+            with self.assertRaises(ValueError, msg=expression):
+                jobs.Cron(expression).next_after(START)
+
+
+@mock.patch.dict(jobs.registry)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        jobs.register('tests.record')(lambda **kwargs: self.calls.append(kwargs))
+        jobs.register('tests.fail')(self.fail_job)
+        self.now = timezone.now()
+
+    def fail_job(self):
+        raise RuntimeError('boom')
+
+    def test_claim_takes_due_jobs_once(self):
+        first = jobs.enqueue('tests.record', {'n': 1}, run_at=self.now - timedelta(minutes=2))
+        second = jobs.enqueue('tests.record', {'n': 2}, run_at=self.now - timedelta(minutes=1))
+        jobs.enqueue('tests.record', {'n': 3}, run_at=self.now + timedelta(minutes=1))
+
+        self.assertEqual(jobs.claim('worker-a', 1, self.now), [first.pk])
+        self.assertEqual(jobs.claim('worker-b', 10, self.now), [second.pk])
+        self.assertEqual(jobs.claim('worker-c', 10, self.now), [])
+        claimed = Job.objects.get(pk=first.pk)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), (jobs.RUNNING, 'worker-a', 1))
+
+    def test_unique_enqueue_and_unknown_names(self):
+        self.assertIsNotNone(jobs.enqueue('tests.record', {'n': 1}, unique=True))
+        self.assertIsNone(jobs.enqueue('tests.record', {'n': 1}, unique=True))
+        with self.assertRaises(LookupError):
+            jobs.enqueue('tests.missing')
+
+    def test_execute_runs_the_handler(self):
+        job = jobs.enqueue('tests.record', {'n': 1})
+        jobs.claim('worker', 1)
+        self.assertEqual(jobs.execute(job.pk, 'worker'), jobs.DONE)
+        self.assertEqual(self.calls, [{'n': 1}])
+        # A claim that was lost (requeued and taken by another worker) is not run.
+        self.assertIsNone(jobs.execute(job.pk, 'worker'))
+
+    @override_settings(JOBS={'BACKOFF_BASE': 10, 'BACKOFF_MAX': 60})
+    def test_failures_back_off_then_fail(self):
+        job = jobs.enqueue('tests.fail', max_attempts=2)
+        jobs.claim('worker', 1)
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertEqual(jobs.execute(job.pk, 'worker'), jobs.QUEUED)
+        job.refresh_from_db()
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertEqual(job.locked_by, '')
+        delay = (job.run_at - timezone.now()).total_seconds()
+        self.assertTrue(7 <= delay <= 12.5, delay)
+
+        jobs.claim('worker', 1, job.run_at)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(jobs.execute(job.pk, 'worker'), jobs.FAILED)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, jobs.FAILED)
+
+        for attempts in (1, 2, 3, 10):
+            delay = jobs.backoff(attempts)
+            expected = min(10 * 2 ** (attempts - 1), 60)
+            self.assertTrue(expected * 0.75 <= delay <= expected * 1.25, (attempts, delay))
+
+    @override_settings(JOBS={'LEASE': 600})
+    def test_expired_leases_are_requeued_unless_renewed(self):
+        claimed_at = self.now - timedelta(minutes=20)
+        renewed, silent, exhausted = (jobs.enqueue('tests.record', {'n': n}, run_at=claimed_at) for n in range(3))
+        Job.objects.filter(pk=exhausted.pk).update(max_attempts=1)
+        jobs.claim('busy', 1, claimed_at)
+        jobs.claim('dead', 2, claimed_at)
+        self.assertEqual(jobs.heartbeat('busy', self.now - timedelta(minutes=1)), 1)
+
+        self.assertEqual(jobs.requeue_expired(self.now), 2)
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {renewed.pk: jobs.RUNNING, silent.pk: jobs.QUEUED, exhausted.pk: jobs.FAILED})
+        self.assertEqual(Job.objects.get(pk=silent.pk).last_error, 'Lease expired')
+
+
+@mock.patch.dict(jobs.registry)
+class JobWorkerTests(TransactionTestCase):
+    # A TransactionTestCase so the pool threads see the queued job.
+
+    @override_settings(JOBS={'LEASE': 0.3, 'POLL_INTERVAL': 0.02})
+    def test_long_job_keeps_its_lease(self):
+        calls = []
+        jobs.register('tests.slow')(lambda: calls.append(time.sleep(1)))
+        job = jobs.enqueue('tests.slow')
+
+        with self.assertLogs('core.jobs', 'INFO'):
+            counts = jobs.work(workers=1, burst=True)
+
+        self.assertEqual(counts[jobs.DONE], 1)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).attempts, 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        if connection.vendor == 'mysql':
+            self.skipTest('InnoDB FULLTEXT indexes only see committed rows')
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.swiggy = make_transaction(self.user, description='Swiggy pizza order')
+        self.uber = make_transaction(self.user, description='Uber trip to airport')
+
+    def found(self, text):
+        return sorted(search.search(Transaction.objects.filter(user=self.user), text).values_list('pk', flat=True))
+
+    def listed(self, text):
+        response = self.client.get('/transactions/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_prefixes_of_every_term(self):
+        self.assertEqual(self.found('swig'), [self.swiggy.pk])
+        self.assertEqual(self.found('SWIGGY  Piz'), [self.swiggy.pk])
+        self.assertEqual(self.found('swiggy trip'), [])
+        self.assertEqual(self.found('wig'), [])
+        self.assertEqual(self.found('!!'), [self.swiggy.pk, self.uber.pk])
+        self.assertEqual(self.listed('airport'), [self.uber.pk])
+
+    def test_index_follows_writes(self):
+        response = self.client.patch(f'/transactions/{self.swiggy.pk}/', {'description': 'Zomato biryani'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.listed('swiggy'), [])
+        self.assertEqual(self.listed('biryani'), [self.swiggy.pk])
+
+        # queryset.update() skips signals; the triggers still see it
+        Transaction.objects.filter(pk=self.uber.pk).update(description='Ola cab')
+        self.assertEqual(self.found('uber'), [])
+        self.assertEqual(self.found('ola'), [self.uber.pk])
+
+        self.assertEqual(self.client.delete(f'/transactions/{self.swiggy.pk}/').status_code, 204)
+        self.assertEqual(self.found('zomato'), [])
+        created = make_transaction(self.user, description='Zomato dinner')
+        self.assertEqual(self.found('zomato'), [created.pk])
+
+    def test_archive_matches_word_prefixes(self):
+        archived = make_archived(self.user, 20_000, description='Old Swiggy order (pizza)')
+        rows = ArchivedTransaction.objects.filter(user=self.user)
+        for text, expected in (('swig', [archived.pk]), ('pizza swiggy', [archived.pk]), ('wig', []), ('zza', [])):
+            self.assertEqual(list(search.search(rows, text).values_list('pk', flat=True)), expected, text)
+        self.assertEqual(sorted(self.listed('swiggy')), sorted([self.swiggy.pk, archived.pk]))
+
+    def test_triggers_are_restored_after_migrate(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 triggers are SQLite only')
+        with connection.cursor() as cursor:
+            for name in search.SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        post_migrate.send(sender=apps.get_app_config('core'), app_config=apps.get_app_config('core'),
+                          verbosity=0, interactive=False, using=connection.alias, apps=apps, plan=[])
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'core_transaction_fts_%'")
+            self.assertEqual(sorted(row[0] for row in cursor.fetchall()), sorted(search.SQLITE_TRIGGERS))
+        created = make_transaction(self.user, description='Restored trigger')
+        self.assertEqual(self.found('restored'), [created.pk])
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user('alice', password='secret')
+        self.token = Token.objects.create(user=self.user)
+
+    def get(self, key):
+        return APIClient().get('/budgets/', HTTP_AUTHORIZATION=f'Token {key}').status_code
+
+    def test_repeat_requests_are_served_from_the_cache(self):
+        self.assertEqual(self.get(self.token.key), 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedTokenAuthentication().authenticate_credentials(self.token.key)[0], self.user)
+
+    def test_deleted_token_stops_working_at_once(self):
+        key = self.token.key  # delete() clears the primary key
+        self.assertEqual(self.get(key), 200)
+        self.token.delete()
+        self.assertEqual(self.get(key), 401)
+
+    def test_rotated_token_stops_working_at_once(self):
+        key = self.token.key
+        self.assertEqual(self.get(key), 200)
+        # How rest_framework rotates a key: delete the row, create a new one.
+        self.token.delete()
+        rotated = Token.objects.create(user=self.user)
+        self.assertEqual(self.get(key), 401)
+        self.assertEqual(self.get(rotated.key), 200)
+
+    def test_deactivated_user_is_refused_at_once(self):
+        self.assertEqual(self.get(self.token.key), 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(self.token.key), 401)
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = TokenCache(max_entries=10, ttl=60)
+        with mock.patch('core.authentication.time.monotonic', return_value=1000.0) as clock:
+            cache.put(self.token.key, self.user, self.token)
+            clock.return_value = 1059.0
+            self.assertEqual(cache.get(self.token.key), (self.user, self.token))
+            clock.return_value = 1060.0
+            self.assertIsNone(cache.get(self.token.key))
+        self.assertEqual(cache.by_user, {})
+
+    def test_least_recently_used_entries_go_first(self):
+        cache = TokenCache(max_entries=2, ttl=60)
+        cache.put('a', self.user, self.token)
+        cache.put('b', self.user, self.token)
+        cache.get('a')
+        cache.put('c', self.user, self.token)
+        self.assertEqual(list(cache.entries), ['a', 'c'])
+        cache.evict_user(self.user.pk)
+        self.assertEqual((cache.entries, cache.by_user), ({}, {}))
+
+
+class RecurringIncrementalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.other = User.objects.create_user('bob', password='secret')
+        self.now = timezone.now()
+        self.netflix = [
+            make_transaction(self.user, self.now - timedelta(days=30 * months), amount='499.00', description='Netflix')
+            for months in range(1, 5)
+        ]
+        make_transaction(self.other, self.now - timedelta(days=3), description='Lunch')
+
+    def merchants(self):
+        return sorted(RecurringExpense.objects.filter(user=self.user).values_list('merchant', flat=True))
+
+    def run_after(self, minutes):
+        return recurring.run_incremental(now=self.now + timedelta(minutes=minutes))
+
+    def test_first_run_is_a_full_run(self):
+        self.assertEqual(self.run_after(2), (1, 2))
+        self.assertEqual(self.merchants(), ['netflix'])
+        self.assertEqual(self.run_after(4), (0, 0))
+
+    def test_edits_and_deletes_of_old_rows_are_picked_up(self):
+        self.run_after(2)
+        # Edits through queryset.update() set updated_at themselves.
+        edited_at = self.now + timedelta(minutes=3)
+        Transaction.objects.filter(pk__in=[tx.pk for tx in self.netflix]).update(
+            description='Hotstar', updated_at=edited_at,
+        )
+        self.assertEqual(self.run_after(5), (1, 1))
+        self.assertEqual(self.merchants(), ['hotstar'])
+
+        bulk.delete(self.user, bulk.select(self.user, ids=[tx.pk for tx in self.netflix[1:]]))
+        Tombstone.objects.update(deleted_at=self.now + timedelta(minutes=6))
+        self.assertEqual(self.run_after(8), (0, 1))
+        self.assertEqual(self.merchants(), [])
+
+    def test_recent_changes_wait_for_the_settle_window(self):
+        self.run_after(2)
+        changed_at = self.now + timedelta(minutes=3)
+        Transaction.objects.filter(pk=self.netflix[0].pk).update(description='Hotstar', updated_at=changed_at)
+        self.assertEqual(recurring.run_incremental(now=changed_at + timedelta(seconds=10)), (0, 0))
+        self.assertEqual(self.merchants(), ['netflix'])
+        self.assertEqual(self.run_after(5), (1, 2))
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        cache.clear()
+
+    def picture(self, size=(400, 300)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+        return SimpleUploadedFile('me.png', buffer.getvalue(), content_type='image/png')
+
+    def test_renditions_are_square_webp_and_jpeg(self):
+        stem = thumbnails.render(self.picture())
+        for extension, pillow_format in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+            with Image.open(BytesIO(thumbnails.read(f'{stem}.{extension}'))) as image:
+                self.assertEqual((image.format, image.size), (pillow_format, (144, 144)))
+        self.assertEqual(thumbnails.render(self.picture()), stem)
+
+    def test_name_follows_the_rendering_settings(self):
+        stem = thumbnails.render(self.picture())
+        for changed in ({'SIZE': 96}, {'JPEG_QUALITY': 50}, {'WEBP_QUALITY': 60}):
+            with override_settings(PROFILE_THUMBNAILS=changed):
+                self.assertNotEqual(thumbnails.render(self.picture()), stem, changed)
+
+    def test_served_immutable_with_etag(self):
+        name = f'{thumbnails.render(self.picture())}.webp'
+        response = self.client.get(f'/thumbnails/{name}')
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/webp'))
+        self.assertEqual(response['ETag'], f'"{name}"')
+
+        revalidated = self.client.get(f'/thumbnails/{name}', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+        for cache_control in (response['Cache-Control'], revalidated['Cache-Control']):
+            self.assertIn('immutable', cache_control)
+            self.assertIn(f"max-age={thumbnails.get_setting('MAX_AGE')}", cache_control)
+
+    def test_missing_and_malformed_names_are_404(self):
+        self.assertEqual(self.client.get(f"/thumbnails/{'0' * 32}-144.webp").status_code, 404)
+        self.assertEqual(self.client.get('/thumbnails/../settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/thumbnails/abc.png').status_code, 404)
+
+    def test_profile_upload_renders_or_falls_back(self):
+        profile = User.objects.create_user('alice', password='secret').profile
+        profile.profile_image = self.picture()
+        profile.save()
+        self.assertRegex(profile.thumbnail, r'^[0-9a-f]{32}-144$')
+        profile.profile_image = SimpleUploadedFile('me.png', b'not an image')
+        profile.save()
+        self.assertEqual(profile.thumbnail, '')
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Four rows share a date_time, so batches of two split the tie.
+        self.rows = [make_transaction(self.user, START) for _ in range(4)]
+        self.rows += [make_transaction(self.user, START + timedelta(days=day), category='Rent') for day in (1, 2)]
+        self.rows.append(make_transaction(self.user, START - timedelta(days=1), description='Tea, "masala"'))
+        make_transaction(User.objects.create_user('bob', password='secret'), START)
+
+    def oldest_first(self, rows):
+        return [row.pk for row in sorted(rows, key=lambda row: (row.date_time, row.pk))]
+
+    def export(self, **params):
+        response = self.client.get('/transactions/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_batches_split_ties_without_gaps_or_repeats(self):
+        queryset = Transaction.objects.filter(user=self.user)
+        for chunk_size in (2, 3, 7, 100):
+            batches = list(exporters.iter_batches(queryset, chunk_size))
+            self.assertTrue(all(0 < len(batch) <= chunk_size for batch in batches), chunk_size)
+            self.assertEqual([row[0] for batch in batches for row in batch], self.oldest_first(self.rows), chunk_size)
+
+    def test_archived_rows_are_merged_in_order(self):
+        archived = [make_archived(self.user, 20_000 + day, START - timedelta(days=day)) for day in (2, 0)]
+        batches = list(exporters.merge_batches(
+            [Transaction.objects.filter(user=self.user), archive.archived_for(self.user)], chunk_size=2,
+        ))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 2, 2, 1])
+        self.assertEqual([row[0] for batch in batches for row in batch], self.oldest_first(self.rows + archived))
+
+    def test_csv_rows(self):
+        lines = list(csv.reader(self.export(file_format='csv').splitlines()))
+        self.assertEqual(tuple(lines[0]), exporters.COLUMNS)
+        self.assertEqual([int(line[0]) for line in lines[1:]], self.oldest_first(self.rows))
+        tea = dict(zip(exporters.COLUMNS, lines[1]))
+        self.assertEqual(tea['description'], 'Tea, "masala"')
+        self.assertEqual(tea['amount'], '100.00')
+        self.assertEqual(tea['date_time'], timezone.localtime(START - timedelta(days=1)).isoformat())
+        self.assertEqual(tea['is_auto_logged'], 'False')
+
+    def test_ndjson_rows_with_filters(self):
+        rows = [json.loads(line) for line in self.export(file_format='ndjson', category='Rent').splitlines()]
+        self.assertEqual([row['id'] for row in rows], [tx.pk for tx in self.rows[4:6]])
+        self.assertEqual(set(rows[0]), set(exporters.COLUMNS))
+        self.assertEqual((rows[0]['amount'], rows[0]['category']), ('100.00', 'Rent'))
+
+    def test_unknown_format_is_400(self):
+        self.assertEqual(self.client.get('/transactions/export/', {'file_format': 'xlsx'}).status_code, 400)
+
+
+class BudgetStatusTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        for category, amount, month in (('Food', '1000.00', 5), ('Rent', '500.00', 5), ('Food', '200.00', 4),
+                                         ('Health', '0.00', 4)):
+            Budget.objects.create(user=self.user, category=category, amount=amount, month=month, year=2024)
+        may, april = START, START - timedelta(days=20)
+        for date_time, amount, fields in ((may, '300.00', {}), (may, '50.00', {}), (may, '600.00', {'category': 'Rent'}),
+                                          (may, '1000.00', {'type': 'Income'}), (april, '250.00', {})):
+            make_transaction(self.user, date_time, amount=amount, **fields)
+        make_transaction(User.objects.create_user('bob', password='secret'), may, amount='999.00')
+
+    def test_recent_months_cross_the_year(self):
+        self.assertEqual(recent_months(2024, 2, 3), [(2024, 2), (2024, 1), (2023, 12)])
+
+    def test_spent_remaining_and_totals(self):
+        may, april, march = budget_status(self.user, recent_months(2024, 5, 3))
+        self.assertEqual([(budget['category'], budget['spent'], budget['remaining'], budget['percent_used'])
+                          for budget in may['budgets']],
+                         [('Food', Decimal('350.00'), Decimal('650.00'), Decimal('35.0')),
+                          ('Rent', Decimal('600.00'), Decimal('-100.00'), Decimal('120.0'))])
+        self.assertEqual((may['total_budget'], may['total_spent'], may['total_remaining']),
+                         (Decimal('1500.00'), Decimal('950.00'), Decimal('550.00')))
+        self.assertEqual([(budget['category'], budget['spent'], budget['percent_used']) for budget in april['budgets']],
+                         [('Food', Decimal('250.00'), Decimal('125.0')), ('Health', Decimal('0'), None)])
+        self.assertEqual((march['year'], march['month'], march['budgets'], march['total_remaining']),
+                         (2024, 3, [], Decimal('0')))
+
+    def test_status_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/budgets/status/', {'year': 2024, 'month': 5, 'months': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(entry['month'], entry['total_spent']) for entry in response.data['months']],
+                         [(5, '950.00'), (4, '250.00')])
+        for params in ({'month': 13}, {'months': 0}, {'year': 'next'}):
+            self.assertEqual(client.get('/budgets/status/', params).status_code, 400, params)
+
+    def test_page_history_lists_only_budgeted_months(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get('/budgets-page/'), 'No history yet.')
+        (year, month), = recent_months(timezone.localdate().year, timezone.localdate().month, 3)[2:]
+        Budget.objects.create(user=self.user, category='Food', amount='100.00', month=month, year=year)
+        response = self.client.get('/budgets-page/')
+        self.assertNotContains(response, 'No history yet.')
+        self.assertEqual([(entry['year'], entry['month']) for entry in response.context['history']], [(year, month)])
+
+
+class BulkEndpointTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.food = [make_transaction(self.user, START + timedelta(hours=hour)).pk for hour in range(3)]
+        self.rent = make_transaction(self.user, category='Rent', amount='900.00').pk
+        self.others = make_transaction(User.objects.create_user('bob', password='secret')).pk
+
+    def post(self, action, data):
+        return self.client.post(f'/transactions/{action}/', data, format='json')
+
+    def test_update_reports_ids_it_did_not_touch(self):
+        missing = self.others + 1000
+        response = self.post('bulk-update', {'ids': [*self.food[:2], self.others, missing], 'status': 'Pending'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data, {'updated': 2, 'not_found': sorted([self.others, missing])})
+        self.assertEqual(sorted(Transaction.objects.filter(status='Pending').values_list('pk', flat=True)),
+                         self.food[:2])
+
+    def test_ids_and_filter_intersect(self):
+        response = self.post('bulk-update', {'ids': [self.food[0], self.rent], 'filter': {'category': 'Rent'},
+                                             'category': 'Shopping'})
+        self.assertEqual(response.data, {'updated': 1, 'not_found': [self.food[0]]})
+        self.assertEqual(Transaction.objects.get(pk=self.rent).category, 'Shopping')
+
+        response = self.post('bulk-update', {'filter': {'category': ['Food', 'Shopping']}, 'status': 'Pending'})
+        self.assertEqual(response.data, {'updated': 4})
+        self.assertEqual(Transaction.objects.get(pk=self.others).status, 'Paid')
+
+    def test_bad_requests(self):
+        for action, data in (
+            ('bulk-update', {'ids': self.food}),
+            ('bulk-update', {'ids': self.food, 'status': 'Lost'}),
+            ('bulk-update', {'ids': ['x'], 'status': 'Paid'}),
+            ('bulk-delete', {}),
+            ('bulk-delete', {'filter': {'colour': 'red'}}),
+            ('bulk-delete', {'filter': {'date_from': 'May'}}),
+        ):
+            self.assertEqual(self.post(action, data).status_code, 400, (action, data))
+        self.assertEqual(Transaction.objects.count(), 5)
+
+    @override_settings(TRANSACTION_BULK_LIMIT=2)
+    def test_selections_over_the_limit(self):
+        response = self.post('bulk-delete', {'ids': self.food})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('At most 2 ids', response.data['detail'])
+        response = self.post('bulk-delete', {'filter': {'category': 'Food'}})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('More than 2', response.data['detail'])
+        self.assertEqual(Transaction.objects.count(), 5)
+
+    def test_delete_reverses_allocations_and_leaves_tombstones(self):
+        goal = Goal.objects.create(user=self.user, title='Trip', target_amount='5000.00', deadline='2030-01-01')
+        rent = Transaction.objects.get(pk=self.rent)
+        rent.goal = goal
+        rent.save()
+        self.assertEqual(Goal.objects.get(pk=goal.pk).saved_amount, Decimal('900.00'))
+
+        response = self.post('bulk-delete', {'ids': [self.food[0], self.rent, self.others]})
+        self.assertEqual(response.data, {'deleted': 2, 'not_found': [self.others]})
+        self.assertEqual(Goal.objects.get(pk=goal.pk).saved_amount, Decimal('0.00'))
+        self.assertEqual(sorted(Tombstone.objects.filter(user=self.user).values_list('object_id', flat=True)),
+                         sorted([self.food[0], self.rent]))
+        self.assertTrue(Transaction.objects.filter(pk=self.others).exists())
+
+
+@override_settings(ANALYTICS={'DAILY_DAYS': 5, 'MOVING_AVERAGE_DAYS': 3, 'WEEKS': 3, 'FORECAST_MONTHS': 3})
+class AnalyticsTests(TestCase):
+    today = START.date() + timedelta(days=9)  # Friday 10 May 2024
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='secret')
+        for day, amount, fields in ((10, '100.00', {}), (8, '40.00', {}), (1, '600.00', {'category': 'Rent'}),
+                                    (10, '1000.00', {'type': 'Income'})):
+            make_transaction(self.user, START.replace(day=day), amount=amount, **fields)
+        make_transaction(self.user, START.replace(month=4, day=20), amount='90.00')
+        make_transaction(self.user, START.replace(month=4, day=5), amount='30.00')  # before the 10th: not projected
+        make_transaction(self.user, START.replace(month=3, day=25), amount='60.00', category='Health')
+        make_archived(self.user, 10_000, START.replace(month=2, day=15), amount='120.00')
+        make_transaction(User.objects.create_user('bob', password='secret'), START.replace(day=10), amount='999.00')
+        Budget.objects.create(user=self.user, category='Food', amount='200.00', month=5, year=2024)
+        Budget.objects.create(user=self.user, category='Rent', amount='500.00', month=5, year=2024)
+
+    def test_daily_and_weekly_series(self):
+        report = analytics.report(self.user, self.today)
+        self.assertEqual(report['daily'], {
+            'dates': ['2024-05-06', '2024-05-07', '2024-05-08', '2024-05-09', '2024-05-10'],
+            'amounts': [0.0, 0.0, 40.0, 0.0, 100.0],
+            'moving_average': [0.0, 0.0, 13.33, 13.33, 46.67],
+        })
+        self.assertEqual(report['weekly'], {'weeks': ['2024-04-22', '2024-04-29', '2024-05-06'],
+                                            'amounts': [0.0, 600.0, 140.0]})
+
+    def test_forecast_adds_the_rest_of_earlier_months(self):
+        # Food: 140 spent + (90 + 120 archived) / 3 months; Health: 60 / 3; Rent on the 1st is not repeated
+        forecast = analytics.report(self.user, self.today)['forecast']
+        self.assertEqual((forecast['month'], forecast['spent'], forecast['projected'], forecast['budget'],
+                          forecast['over_budget']), ('2024-05', 740.0, 830.0, 700.0, True))
+        self.assertEqual([(entry['category'], entry['spent'], entry['share'], entry['projected'], entry['budget'],
+                           entry['over_budget']) for entry in forecast['categories']],
+                         [('Rent', 600.0, 0.8108, 600.0, 500.0, True),
+                          ('Food', 140.0, 0.1892, 210.0, 200.0, True),
+                          ('Health', 0.0, 0.0, 20.0, None, False)])
+
+    def test_rebuilt_after_a_change(self):
+        self.assertEqual(analytics.report(self.user, self.today)['forecast']['spent'], 740.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_transaction(self.user, START.replace(day=9), amount='10.00')
+        self.assertEqual(analytics.report(self.user, self.today)['forecast']['spent'], 750.0)
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/analytics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['as_of'], timezone.localdate().isoformat())
+        self.assertEqual(len(response.data['daily']['dates']), 5)
+
+
+class TransactionsPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client.force_login(self.user)
+        make_transaction(self.user)
+
+    def table(self, path='/transactions-page/'):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_table_is_cached_until_a_transaction_is_saved(self):
+        for path in ('/transactions-page/', '/async/transactions-page/'):
+            self.assertIn('Lunch', self.table(path))
+        Transaction.objects.update(description='Edited')  # sends no signal, so nothing is invalidated
+        for path in ('/transactions-page/', '/async/transactions-page/'):
+            self.assertIn('Lunch', self.table(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_transaction(self.user, START + timedelta(hours=1), description='Dinner')
+        for path in ('/transactions-page/', '/async/transactions-page/'):
+            table = self.table(path)
+            self.assertIn('Dinner', table)
+            self.assertIn('Edited', table)
+            self.assertNotIn('Lunch', table)
+
+    def test_bulk_writes_invalidate_the_table(self):
+        self.table()
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.update(self.user, Transaction.objects.filter(user=self.user), {'description': 'Edited'})
+        self.assertIn('Edited', self.table())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.delete(self.user, Transaction.objects.filter(user=self.user))
+        self.assertIn('No transactions found.', self.table())
+
+    def test_other_users_writes_keep_the_table(self):
+        self.table()
+        Transaction.objects.update(description='Edited')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_transaction(User.objects.create_user('bob', password='secret'))
+        self.assertIn('Lunch', self.table())
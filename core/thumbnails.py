@@ -0,0 +1,110 @@
+import hashlib
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+# Square profile thumbnails, rendered once at upload time as WebP and JPEG.
+# Renditions are named after a hash of the uploaded file and the settings they
+# are rendered with (size, formats, qualities), so a name always refers to the
+# same bytes: they are served as immutable (browsers
+# don't ask again) with the name as ETag (a forced reload gets a 304), and an
+# identical upload reuses the files already in storage. Profile.thumbnail
+# holds the name stem, '' when the upload could not be read as an image.
+
+DEFAULTS = {
+    'SIZE': 144,  # the sidebar avatar is 72 CSS px; 2x for high-density screens
+    'WEBP_QUALITY': 80,
+    'JPEG_QUALITY': 85,
+    'MAX_AGE': 365 * 24 * 60 * 60,
+    'CACHE_TIMEOUT': 24 * 60 * 60,
+}
+
+DIRECTORY = 'thumbnails'
+FORMATS = {
+    # extension: (Pillow format, content type)
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+}
+NAME = re.compile(r'^(?P<stem>[0-9a-f]{32}-\d+)\.(?P<extension>webp|jpg)$')
+
+
+def get_setting(name):
+    return getattr(settings, 'PROFILE_THUMBNAILS', {}).get(name, DEFAULTS[name])
+
+
+def storage_path(name):
+    return f'{DIRECTORY}/{name}'
+
+
+def _encode(image, extension):
+    pillow_format, _ = FORMATS[extension]
+    buffer = BytesIO()
+    if pillow_format == 'JPEG':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # JPEG has no alpha; flatten transparent avatars onto white.
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        image.convert('RGB').save(buffer, 'JPEG', quality=get_setting('JPEG_QUALITY'), optimize=True,
+                                  progressive=True)
+    else:
+        image.save(buffer, 'WEBP', quality=get_setting('WEBP_QUALITY'), method=6)
+    return buffer.getvalue()
+
+
+def render(image_file):
+    """
+    Writes the renditions of an uploaded image (unless they already exist) and
+    returns their name stem. Raises OSError/ValueError if it isn't an image.
+    """
+    size = get_setting('SIZE')
+    image_file.seek(0)
+    data = image_file.read()
+    digest = hashlib.sha256(data)
+    digest.update(f"|{size}|{','.join(FORMATS)}|{get_setting('WEBP_QUALITY')}|{get_setting('JPEG_QUALITY')}".encode())
+    stem = f'{digest.hexdigest()[:32]}-{size}'
+    missing = [extension for extension in FORMATS if not default_storage.exists(storage_path(f'{stem}.{extension}'))]
+    if not missing:
+        return stem
+
+    with Image.open(BytesIO(data)) as image:
+        # Let the JPEG decoder downscale while decoding; a phone photo then
+        # costs a fraction of a full-size decode.
+        image.draft('RGB', (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+
+    for extension in missing:
+        default_storage.save(storage_path(f'{stem}.{extension}'), ContentFile(_encode(thumbnail, extension)))
+    return stem
+
+
+def urls(stem, request=None):
+    """{'webp': url, 'jpeg': url} for a name stem (absolute if `request` is given), or None."""
+    if not stem:
+        return None
+    result = {}
+    for key, extension in (('webp', 'webp'), ('jpeg', 'jpg')):
+        url = reverse('thumbnail', args=[f'{stem}.{extension}'])
+        result[key] = request.build_absolute_uri(url) if request is not None else url
+    return result
+
+
+def read(name):
+    """The bytes of a rendition, from the cache when possible. Raises FileNotFoundError."""
+    key = f'thumbnail:{name}'
+    data = cache.get(key)
+    if data is None:
+        with default_storage.open(storage_path(name)) as rendition:
+            data = rendition.read()
+        cache.set(key, data, get_setting('CACHE_TIMEOUT'))
+    return data
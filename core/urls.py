@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from django.views.generic import RedirectView
 from .views import *
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'transactions', TransactionViewSet, basename='transactions')
@@ -15,6 +16,8 @@ urlpatterns = [
 
     # API Endpoints
     path('logout/', logout_view, name='logout'),
+    path('sync/', sync_view, name='sync'),
+    path('analytics/', analytics_view, name='analytics'),
 
     # Auth & Core UI Views
     path('register/', register, name='register'),
@@ -24,7 +27,16 @@ urlpatterns = [
     path('budgets-page/', budgets_page, name='budgets_page'),
     path('goals-page/', goals_page, name='goals_page'),
 
+    # Async versions of the pages above, for ASGI deployments
+    path('async/dashboard/', async_views.dashboard_view, name='async_dashboard'),
+    path('async/transactions-page/', async_views.transactions_page, name='async_transactions_page'),
+    path('async/budgets-page/', async_views.budgets_page, name='async_budgets_page'),
+    path('async/goals-page/', async_views.goals_page, name='async_goals_page'),
+
     # HTML Views for Feature Pages
     path('upi/', upi_page, name='upi_page'),
     path('generate-upi/', generate_upi_page, name='generate_upi_page'),
+
+    # Profile image renditions (content-hashed, cached by browsers for good)
+    path('thumbnails/<str:name>', thumbnail, name='thumbnail'),
 ]
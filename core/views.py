@@ -1,61 +1,248 @@
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 from django.utils import timezone
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-
-from rest_framework import viewsets, permissions
-from rest_framework.authentication import TokenAuthentication
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 
+from .authentication import CachedTokenAuthentication
+from .filters import TransactionFilterBackend
 from .models import Transaction, Budget, Goal, Profile
-from .serializers import TransactionSerializer, BudgetSerializer, GoalSerializer
+from .serializers import (
+    TransactionSerializer, BudgetSerializer, GoalSerializer, BudgetMonthStatusSerializer,
+    TransactionBulkSerializer, TransactionBulkUpdateSerializer,
+    serialize_values, values_lookups,
+)
+from .pagination import TransactionCursorPagination, decode_cursor, keyset_paginate, get_page_size
 from .utils import generate_upi_link
+from . import analytics, archive, bulk, caching, jobs, reconciliation, rollups, sync, thumbnails, watermarks
+from .budgets import budget_status, recent_months
+from .goals import goals_with_projection, with_recent_savings
+from .importers import EncodingError, detect_format, import_transactions, iter_rows
+from .routers import ReplicaListMixin, use_replica
+from .watermarks import ConditionalListMixin
+from . import exporters
 from django.utils.dateformat import DateFormat
 from django.utils.timezone import localtime
 
 # ──────── ViewSets ──────── #
 
-class TransactionViewSet(viewsets.ModelViewSet):
+MAX_STATUS_MONTHS = 24
+
+class ValuesListMixin:
+    """
+    list() that reads only the serialized columns with values() and formats
+    them with the serializer's own fields, instead of building a model
+    instance per row. Output is identical to the regular list().
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        lookups = values_lookups(serializer)
+        if lookups is None:
+            return super().list(request, *args, **kwargs)
+
+        columns = set(lookups.values()) | set(getattr(self.paginator, 'key_fields', ()))
+        rows = self.filter_queryset(self.get_queryset()).values(*columns)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize_values(serializer, page))
+        return Response(serialize_values(serializer, rows))
+
+
+class TransactionViewSet(ReplicaListMixin, ConditionalListMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    pagination_class = TransactionCursorPagination
+    filter_backends = [TransactionFilterBackend]
+    watermark_resource = watermarks.TRANSACTIONS
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
+        return Transaction.objects.filter(user=self.request.user).select_related('user')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def get_merged_querysets(self, queryset):
+        # List pages also show archived rows, filtered the same way and read as
+        # values() rows or instances to match the hot queryset.
+        archived = self.filter_queryset(archive.archived_for(self.request.user))
+        columns = queryset.query.values_select
+        return [archived.values(*columns) if columns else archived.select_related('user')]
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Upload a CSV or JSON-lines file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = detect_format(upload.name, request.data.get('file_format'))
+        if file_format is None:
+            return Response({'detail': 'Unsupported file format, expected csv or jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = import_transactions(request.user, upload, file_format, request.data.get('chunk_size'))
+        except EncodingError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if result.created:
+            # Imported history can reveal new subscriptions; look for them off the request path.
+            jobs.enqueue('recurring.detect', unique=True)
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED if result.created else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in exporters.FORMATS:
+            return Response({'detail': 'Unsupported file format, expected csv or ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        archived = self.filter_queryset(archive.archived_for(request.user))
+        content_type, extension = exporters.FORMATS[file_format]
+        response = StreamingHttpResponse(
+            exporters.stream_export(queryset, file_format, others=[archived]), content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="transactions.{extension}"'
+        return response
 
-class BudgetViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        serializer = TransactionBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = {field: serializer.validated_data[field] for field in bulk.EDITABLE_FIELDS
+                   if field in serializer.validated_data}
+        return self._bulk_response(request, serializer.validated_data, 'updated',
+                                   lambda queryset: bulk.update(request.user, queryset, changes))
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        serializer = TransactionBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self._bulk_response(request, serializer.validated_data, 'deleted',
+                                   lambda queryset: bulk.delete(request.user, queryset))
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, MultiPartParser])
+    def reconcile(self, request):
+        """
+        Settles Pending UPI payments from a batch of confirmations: JSON
+        {"confirmations": [{"payee", "amount", "date_time"} or {"body", "received_at"}]}
+        (the latter a bank SMS), or a CSV/JSON-lines statement uploaded as "file".
+        """
+        upload = request.FILES.get('file')
+        if upload is not None:
+            file_format = detect_format(upload.name, request.data.get('file_format'))
+            if file_format is None:
+                return Response({'detail': 'Unsupported file format, expected csv or jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                items = reconciliation.take_batch(row for _, row, _ in iter_rows(upload, file_format))
+            except EncodingError as exc:
+                return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            items = request.data.get('confirmations')
+            if not isinstance(items, list):
+                return Response({'detail': 'Send "confirmations" as a list, or upload a statement as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = reconciliation.reconcile(request.user, items)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict())
+
+    def _bulk_response(self, request, selection, key, apply):
+        try:
+            ids = apply(bulk.select(request.user, selection.get('ids'), selection.get('filter')))
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        result = {key: len(ids)}
+        if 'ids' in selection:
+            # Ids that are not the user's, already gone, or outside the filter.
+            result['not_found'] = sorted(set(selection['ids']) - set(ids))
+        return Response(result)
+
+
+class BudgetViewSet(ReplicaListMixin, ConditionalListMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = BudgetSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    watermark_resource = watermarks.BUDGETS
 
     def get_queryset(self):
-        return Budget.objects.filter(user=self.request.user)
+        return Budget.objects.filter(user=self.request.user).select_related('user')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'], url_path='status')
+    def monthly_status(self, request):
+        today = timezone.localdate()
+        try:
+            year = int(request.query_params.get('year', today.year))
+            month = int(request.query_params.get('month', today.month))
+            count = int(request.query_params.get('months', 1))
+        except ValueError:
+            return Response({'detail': 'year, month and months must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= month <= 12 or not 1 <= count <= MAX_STATUS_MONTHS:
+            return Response({'detail': f'month must be 1-12 and months 1-{MAX_STATUS_MONTHS}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        months = budget_status(request.user, recent_months(year, month, count))
+        return Response({'months': BudgetMonthStatusSerializer(months, many=True).data})
+
 
-class GoalViewSet(viewsets.ModelViewSet):
+class GoalViewSet(ReplicaListMixin, ConditionalListMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = GoalSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    watermark_resource = watermarks.GOALS
+
+    def last_modified(self, request):
+        # projected_completion is relative to today, so the list changes at
+        # midnight even when no goal does.
+        midnight = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        return max(super().last_modified(request), midnight)
 
     def get_queryset(self):
-        return Goal.objects.filter(user=self.request.user)
+        # recent_saved feeds projected_completion without a query per goal
+        return with_recent_savings(Goal.objects.filter(user=self.request.user).select_related('user'), timezone.localdate())
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+# ──────── Sync ──────── #
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_view(request):
+    page_size = get_page_size(request.query_params.get('page_size'), default=sync.get_setting('PAGE_SIZE'))
+    try:
+        result = sync.changes(request.user, request.query_params.get('since'), page_size)
+    except sync.CursorExpired:
+        return Response({'detail': 'Cursor expired, sync again without "since".'}, status=status.HTTP_410_GONE)
+    except ValueError:
+        return Response({'detail': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result)
+
+# ──────── Analytics ──────── #
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def analytics_view(request):
+    return Response(analytics.report(request.user))
+
 # ──────── Auth APIs ──────── #
 
 class CustomLoginView(ObtainAuthToken):
@@ -130,43 +317,85 @@ from django.shortcuts import render
 from django.utils.timezone import now
 from .models import Transaction, Budget, Goal, RecurringExpense
 
+def dashboard_queries(user, today):
+    """The dashboard's independent queries, as {name: callable} so they can also run concurrently."""
+    return {
+        'latest_transactions': lambda: list(Transaction.objects.filter(user=user).order_by('-date_time', '-id')[:5]),
+        'recent_budgets': lambda: list(Budget.objects.filter(user=user).order_by('-id')[:5]),
+        'goals': lambda: list(Goal.objects.filter(user=user).order_by('-id')[:5]),
+        'recurring_expenses': lambda: list(RecurringExpense.objects.filter(user=user).order_by('next_due_date')),
+        'month_budgets': lambda: list(Budget.objects.filter(user=user, month=today.month, year=today.year)),
+        # Current month totals and category split, read from the rollup table
+        'month_totals': lambda: rollups.month_totals(user, today.year, today.month),
+        'spending': lambda: rollups.category_totals(user, today.year, today.month),
+        # Daily spend, its moving average and the month-end forecast
+        'analytics': lambda: analytics.report(user, today.date()),
+    }
+
+
+def assemble_dashboard_context(results):
+    # Chart data: spend per day over the last month; nothing to plot if it was all zero
+    daily = results['analytics']['daily'] if any(results['analytics']['daily']['amounts']) else None
+    month_budgets, spending = results['month_budgets'], results['spending']
+    return {
+        'recent_transactions': results['latest_transactions'],
+        'recent_budgets': results['recent_budgets'],
+        'goals': results['goals'],
+        'recurring_expenses': results['recurring_expenses'],
+        'tx_labels': [datetime.strptime(day, '%Y-%m-%d').strftime('%d %b') for day in daily['dates']] if daily else [],
+        'tx_amounts': daily['amounts'] if daily else [],
+        'tx_average': daily['moving_average'] if daily else [],
+        'forecast': results['analytics']['forecast'],
+        'budget_labels': [budget.category for budget in month_budgets],
+        'budget_amounts': [float(budget.amount) for budget in month_budgets],
+        'month_income': results['month_totals']['Income'],
+        'month_expense': results['month_totals']['Expense'],
+        'category_labels': list(spending),
+        'category_amounts': [float(amount) for amount in spending.values()],
+    }
+
+
+def build_dashboard_context(user, today):
+    return assemble_dashboard_context({name: query() for name, query in dashboard_queries(user, today).items()})
+
+
 @login_required
+@use_replica
 def dashboard_view(request):
     user = request.user
-    # 1. Recent data for cards
-    recent_transactions = Transaction.objects.filter(user=user).order_by('-date_time')[:5]
-    recent_budgets = Budget.objects.filter(user=user).order_by('-id')[:5]
-    goals = Goal.objects.filter(user=user).order_by('-id')[:5]
-    recurring_expenses = RecurringExpense.objects.filter(user=user).order_by('next_due_date')
-
-    # 2. Graph data: last 7 transactions (oldest to newest)
-    tx_query = Transaction.objects.filter(user=user).order_by('-date_time')[:7][::-1]
-    tx_labels = [tx.date_time.strftime('%d %b') for tx in tx_query]
-    tx_amounts = [float(tx.amount) for tx in tx_query]
-
-    # 3. Graph data: current month budgets
-    current_month = now().month
-    current_year = now().year
-    budgets = Budget.objects.filter(user=user, month=current_month, year=current_year)
-    budget_labels = [budget.category for budget in budgets]
-    budget_amounts = [float(budget.amount) for budget in budgets]
-
-    context = {
-        'recent_transactions': recent_transactions,
-        'recent_budgets': recent_budgets,
-        'goals': goals,
-        'recurring_expenses': recurring_expenses,
-        'tx_labels': tx_labels,
-        'tx_amounts': tx_amounts,
-        'budget_labels': budget_labels,
-        'budget_amounts': budget_amounts,
-    }
-
+    today = localtime(now())
+    # Served from the per-user cache until a Transaction/Budget/Goal/RecurringExpense
+    # change bumps the dashboard version (see core/caching.py). Keyed by the local
+    # date, as the daily series and forecast move on at midnight.
+    context = caching.get_or_build(
+        user.pk, caching.DASHBOARD,
+        lambda: build_dashboard_context(user, today),
+        timeout=settings.DASHBOARD_CACHE_TIMEOUT,
+        suffix=today.date().isoformat(),
+    )
     return render(request, 'dashboard.html', context)
 
 
+def transactions_page_context(user, cursor, page_size, version):
+    """
+    Context for transactions.html. Its table is a fragment cached per (user,
+    transactions version, cursor, page size), and the page is only queried
+    when that fragment has to be rendered, so a cached page costs no query.
+    """
+    return {
+        'page': SimpleLazyObject(lambda: keyset_paginate(
+            Transaction.objects.filter(user=user), cursor or None, page_size,
+            others=[archive.archived_for(user)],
+        )),
+        'cursor': cursor,
+        'page_size': page_size,
+        'table_version': version,
+        'table_timeout': settings.TRANSACTIONS_PAGE_CACHE_TIMEOUT,
+    }
+
 
 @login_required
+@use_replica
 def transactions_page(request):
     if request.method == 'POST':
         type = request.POST.get('type')
@@ -190,13 +419,23 @@ def transactions_page(request):
         else:
             messages.error(request, 'Please fill all required fields.')
 
-    transactions = Transaction.objects.filter(user=request.user).order_by('-date_time')
-    return render(request, 'transactions.html', {'transactions': transactions})
+    cursor = request.GET.get('cursor', '')
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError:
+        return redirect('transactions_page')
+
+    version = caching.get_version(request.user.pk, caching.TRANSACTIONS)
+    return render(request, 'transactions.html', transactions_page_context(
+        request.user, cursor, get_page_size(request.GET.get('page_size')), version,
+    ))
 
 
 @login_required
+@use_replica
 def budgets_page(request):
-    now = timezone.now()
+    now = timezone.localtime()
 
     if request.method == 'POST':
         category = request.POST.get('category')
@@ -215,15 +454,18 @@ def budgets_page(request):
         else:
             messages.error(request, 'Please fill all required fields.')
 
-    budgets = Budget.objects.filter(user=request.user, month=now.month, year=now.year)
-    return render(request, 'budgets.html', {'budgets': budgets})
+    current, *history = budget_status(request.user, recent_months(now.year, now.month, 6))
+    history = [entry for entry in history if entry['budgets']]  # months with nothing budgeted are left out
+    return render(request, 'budgets.html', {'current': current, 'history': history})
 
 
 @login_required
+@use_replica
 def goals_page(request):
     if request.method == 'POST':
         title = request.POST.get('title')
         target_amount = request.POST.get('target_amount')
+        saved_amount = request.POST.get('saved_amount') or 0
         deadline = request.POST.get('deadline')
 
         if title and target_amount and deadline:
@@ -231,6 +473,8 @@ def goals_page(request):
                 user=request.user,
                 title=title,
                 target_amount=target_amount,
+                initial_amount=saved_amount,
+                saved_amount=saved_amount,
                 deadline=deadline
             )
             messages.success(request, 'Goal added successfully! 🎯')
@@ -238,7 +482,7 @@ def goals_page(request):
         else:
             messages.error(request, 'Please fill all required fields.')
 
-    goals = Goal.objects.filter(user=request.user).order_by('-id')
+    goals = goals_with_projection(Goal.objects.filter(user=request.user).order_by('-id'), timezone.localdate())
     return render(request, 'goals.html', {'goals': goals})
 
 
@@ -275,3 +519,26 @@ def generate_upi_page(request):
         return render(request, 'generate_upi.html', {'upi_link': link})
 
     return render(request, 'generate_upi.html')
+
+
+# ──────── Thumbnails ──────── #
+
+@require_safe
+def thumbnail(request, name):
+    match = thumbnails.NAME.match(name)
+    if match is None:
+        raise Http404
+    # Names are content hashes, so the name itself is a strong ETag.
+    etag = quote_etag(name)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            data = thumbnails.read(name)
+        except FileNotFoundError:
+            raise Http404
+        _, content_type = thumbnails.FORMATS[match['extension']]
+        response = HttpResponse(data, content_type=content_type)
+    # On the 304 too, so revalidated copies stay immutable.
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=thumbnails.get_setting('MAX_AGE'), immutable=True)
+    return response
@@ -29,6 +29,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.InstrumentationMiddleware",
+    "core.middleware.ReplicaStickinessMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -44,8 +46,14 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # Templates are compiled once per process, not on every render.
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -58,15 +66,75 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "finance_tracker.wsgi.application"
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'finance_tracker_db',
-        'USER': 'vvdn',
-        'PASSWORD': 'vvdn2025',
-        'HOST': 'localhost',
-        'PORT': '3306',
+# Databases come from the environment. DB_ENGINE=mysql (the default) reads
+# DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT; DB_ENGINE=sqlite is the
+# development profile: one file (DB_NAME, default db.sqlite3) in WAL mode, so
+# readers don't block the writer, with IMMEDIATE transactions so concurrent
+# writers queue on busy_timeout instead of failing with "database is locked".
+#
+# Connections are kept open for DB_CONN_MAX_AGE seconds (0 closes them after
+# every request, None never does) and health-checked before reuse.
+#
+# A read replica is added as the 'replica' alias by DB_REPLICA_HOST (MySQL;
+# DB_REPLICA_PORT/USER/PASSWORD default to the primary's) or DB_REPLICA_NAME
+# (SQLite, opened read-only; point it at the primary's own file to exercise
+# the routing locally, or at a copy to see replication lag). List and
+# dashboard reads go there, see core/routers.py.
+DB_ENGINE = os.getenv('DB_ENGINE', 'mysql')
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '60')
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+        }
     }
+    if os.getenv('DB_REPLICA_NAME'):
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': f"file:{os.getenv('DB_REPLICA_NAME')}?mode=ro",
+            'OPTIONS': {'uri': True, 'timeout': 20},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.getenv('DB_NAME', 'finance_tracker_db'),
+            'USER': os.getenv('DB_USER', 'vvdn'),
+            'PASSWORD': os.getenv('DB_PASSWORD', 'vvdn2025'),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '3306'),
+        }
+    }
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+            'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        }
+
+for _database in DATABASES.values():
+    _database['CONN_MAX_AGE'] = None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE)
+    _database['CONN_HEALTH_CHECKS'] = True
+if 'replica' in DATABASES:
+    # Tests read their own writes: the replica alias uses the test database.
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write, so they see
+# their own change even if the replica lags (keep above the replication lag).
+# Needs a cache shared by all processes to hold across them.
+DATABASE_REPLICA = {
+    'STICKY_SECONDS': 10,
 }
 
 LANGUAGE_CODE = "en-us"
@@ -82,7 +150,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -98,3 +166,132 @@ if DEBUG:
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Profile image renditions (core/thumbnails.py): SIZE px squares, served with
+# Cache-Control max-age=MAX_AGE, immutable; their bytes are kept in the cache
+# for CACHE_TIMEOUT seconds.
+PROFILE_THUMBNAILS = {
+    'SIZE': 144,
+    'WEBP_QUALITY': 80,
+    'JPEG_QUALITY': 85,
+    'MAX_AGE': 365 * 24 * 60 * 60,
+    'CACHE_TIMEOUT': 24 * 60 * 60,
+}
+
+# Rows validated and inserted per bulk_create batch by /transactions/import/
+TRANSACTION_IMPORT_CHUNK_SIZE = 1000
+
+# Most rows one /transactions/bulk-update/ or bulk-delete/ request may touch
+TRANSACTION_BULK_LIMIT = 5000
+
+# Matching window for /transactions/reconcile/ (core/reconciliation.py): a
+# confirmation settles a Pending UPI payment made up to WINDOW_HOURS before it.
+UPI_RECONCILIATION = {
+    'WINDOW_HOURS': 72,
+    'EARLY_MINUTES': 10,
+    'MAX_CONFIRMATIONS': 10000,
+}
+
+# Transactions older than HORIZON_DAYS are moved to the archive table nightly
+# (core/archive.py); lists, exports and totals still include them.
+TRANSACTION_ARCHIVE = {
+    'HORIZON_DAYS': 730,
+    'BATCH_SIZE': 1000,
+}
+
+# Any Django cache backend works for the per-user caches in core/caching.py;
+# set CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache and
+# CACHE_LOCATION=/path/to/dir to share entries between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'finance-tracker'),
+    }
+}
+
+# Seconds a cached dashboard context may be served before it is rebuilt even
+# without a data change
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Seconds a cached page of the transactions table may be kept. Entries are
+# keyed by the user's transactions version, so any change invalidates them
+# and this only bounds how long unvisited pages occupy the cache.
+TRANSACTIONS_PAGE_CACHE_TIMEOUT = 3600
+
+# Spending series and month-end forecast (core/analytics.py), shown on the
+# dashboard and served by /analytics/
+ANALYTICS = {
+    'DAILY_DAYS': 30,
+    'WEEKS': 12,
+    'MOVING_AVERAGE_DAYS': 7,
+    'FORECAST_MONTHS': 3,
+    'CACHE_TIMEOUT': 600,
+}
+
+# Worker threads (each with its own DB connection) that core/async_views.py
+# runs independent queries on concurrently
+ASYNC_QUERY_WORKERS = 16
+
+# Token -> user lookups cached per process by core.authentication. Revoked
+# tokens and deactivated users stop working at once in the process that made
+# the change and within TTL seconds everywhere else.
+TOKEN_AUTH_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 60,
+}
+
+# Background jobs (core/jobs.py), run by `manage.py run_jobs`. Failed jobs are
+# retried after BACKOFF_BASE * 2^(attempt - 1) seconds (at most BACKOFF_MAX);
+# workers renew the lease of their running jobs every LEASE / 3 seconds, and a
+# job whose worker has been silent for LEASE seconds is requeued.
+# SCHEDULE entries are cron expressions in TIME_ZONE.
+JOBS = {
+    'WORKERS': 4,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'LEASE': 1800,
+    'KEEP_FINISHED_DAYS': 7,
+    'SCHEDULE': {
+        'recurring-incremental': {'job': 'recurring.detect', 'cron': '*/15 * * * *'},
+        'recurring-full': {'job': 'recurring.detect', 'cron': '30 2 * * *', 'kwargs': {'full': True}},
+        'goals-reconcile': {'job': 'goals.reconcile', 'cron': '0 3 * * *'},
+        'jobs-cleanup': {'job': 'jobs.cleanup', 'cron': '0 4 * * 0'},
+        'sync-tombstones': {'job': 'sync.prune_tombstones', 'cron': '15 4 * * 0'},
+        'transactions-archive': {'job': 'archive.run', 'cron': '45 3 * * *'},
+    },
+}
+
+# /sync/ change feed (core/sync.py). Changes are served once they are
+# SETTLE_SECONDS old, so writes committing late aren't skipped; tombstones of
+# deleted rows are kept TOMBSTONE_DAYS, the oldest cursor still accepted.
+SYNC = {
+    'PAGE_SIZE': 500,
+    'SETTLE_SECONDS': 5,
+    'TOMBSTONE_DAYS': 90,
+}
+
+# Per-request query/DB/template/total timings (core/middleware.py). Snapshots of
+# the per-URL histograms are written to DUMP_DIR every FLUSH_INTERVAL seconds
+# for `manage.py dump_timings`; INSTRUMENTATION_LOG=1 also logs a JSON line
+# per request.
+INSTRUMENTATION = {
+    'ENABLED': os.getenv('INSTRUMENTATION_ENABLED', '1') == '1',
+    'SERVER_TIMING': True,
+    'LOG': os.getenv('INSTRUMENTATION_LOG', '0') == '1',
+    'DUMP_DIR': os.getenv('INSTRUMENTATION_DUMP_DIR', str(BASE_DIR / 'var' / 'timings')),
+    'FLUSH_INTERVAL': 30,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.instrumentation': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'core.jobs': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -0,0 +1,23 @@
+# Settings for `manage.py bench_views` and `manage.py seed_data` on a machine
+# without MySQL:
+#   python manage.py bench_views --settings=finance_tracker.settings_bench
+from .settings import *  # noqa: F401,F403
+
+(BASE_DIR / 'var').mkdir(exist_ok=True)
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'var' / 'bench.sqlite3',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'finance-tracker-bench',
+    }
+}
+
+# Keep per-request logging out of the measurements; Server-Timing stays on.
+INSTRUMENTATION = {**INSTRUMENTATION, 'LOG': False, 'DUMP_DIR': None}